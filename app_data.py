@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Emplacement des données persistantes de l'application
+Auteur: Zx
+Description: Dossier de données utilisateur (caches, index) selon la plateforme
+"""
+
+import os
+import platform
+from pathlib import Path
+
+APP_NAME = "XTri"
+
+
+def get_data_dir():
+    """Retourne (et crée si besoin) le dossier de données de l'application"""
+    system = platform.system()
+    if system == "Windows":
+        base = os.environ.get('LOCALAPPDATA') or str(Path.home() / "AppData" / "Local")
+    elif system == "Darwin":
+        base = str(Path.home() / "Library" / "Application Support")
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or str(Path.home() / ".local" / "share")
+
+    data_dir = os.path.join(base, APP_NAME)
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
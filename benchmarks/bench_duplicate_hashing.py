@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du calcul des hash de la recherche de doublons
+Auteur: Zx
+Description: Compare le chemin séquentiel (workers=1) aux pools de threads et de processus
+
+Utilisation:
+    python benchmarks/bench_duplicate_hashing.py                  # arborescence générée
+    python benchmarks/bench_duplicate_hashing.py D:\\Photos -w 16   # dossier existant
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duplicate_finder import DuplicateFinder, HASH_ALGORITHMS, DEFAULT_ALGORITHM, default_workers
+
+
+def create_sample_tree(folder, file_count, file_size):
+    """Crée des paires de fichiers identiques de même taille (tous candidats au hash complet)"""
+    for i in range(file_count // 2):
+        data = os.urandom(file_size)
+        for copy in range(2):
+            with open(os.path.join(folder, f"file_{i}_{copy}.bin"), 'wb') as f:
+                f.write(data)
+
+
+def run(folder, workers, executor, algorithm):
+    """Exécute une recherche complète et retourne (durée, octets lus, groupes)"""
+    finder = DuplicateFinder(algorithm, workers=workers, executor=executor)
+    start = time.perf_counter()
+    duplicates = finder.find(folder)
+    elapsed = time.perf_counter() - start
+    bytes_read = sum(stats['bytes_read'] for stats in finder.stats.values())
+    return elapsed, bytes_read, len(duplicates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark séquentiel vs pool pour le hash des doublons")
+    parser.add_argument('folder', nargs='?', help="Dossier à analyser (par défaut: arborescence générée)")
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help="Nombre de workers (0: valeur par défaut selon la machine)")
+    parser.add_argument('-n', '--files', type=int, default=200, help="Nombre de fichiers générés")
+    parser.add_argument('-s', '--size', type=int, default=4 * 1024 * 1024, help="Taille des fichiers générés")
+    parser.add_argument('-a', '--algorithm', choices=HASH_ALGORITHMS, default=DEFAULT_ALGORITHM)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        folder = args.folder
+        if folder is None:
+            folder = tmp_dir
+            print(f"Génération de {args.files} fichiers de {args.size // 1024} KB...")
+            create_sample_tree(folder, args.files, args.size)
+
+        workers = args.workers or default_workers(folder)
+        print(f"Dossier: {folder} | workers: {workers} | CPU: {os.cpu_count()}\n")
+
+        # Première passe non mesurée pour que toutes les variantes partent du même état de cache
+        run(folder, 1, 'thread', args.algorithm)
+
+        baseline = None
+        for label, count, executor in (("Séquentiel", 1, 'thread'),
+                                       ("Pool de threads", workers, 'thread'),
+                                       ("Pool de processus", workers, 'process')):
+            elapsed, bytes_read, groups = run(folder, count, executor, args.algorithm)
+            baseline = baseline or elapsed
+            rate = bytes_read / elapsed / (1024 ** 2) if elapsed else 0
+            print(f"{label:<18} {elapsed:8.2f} s  {rate:8.1f} MB/s  "
+                  f"x{baseline / elapsed:.2f}  ({groups} groupes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark du rangement d'une sélection de fichiers
+Auteur: Zx
+Description: Compare la recherche de chaque fichier sélectionné par parcours de la liste
+             (ancienne méthode, O(n²)) à l'index élément -> enregistrement, puis mesure le
+             rangement réel de fichiers vides pour vérifier une progression quasi linéaire,
+             à plat ou depuis une arborescence parcourue au fil de l'eau (--recursive)
+
+Utilisation:
+    python benchmarks/bench_organize.py                         # 1 000 à 100 000 fichiers
+    python benchmarks/bench_organize.py -n 1000 10000 1000000   # jusqu'à 1 million
+    python benchmarks/bench_organize.py --recursive -w 1 8      # arborescence, 1 puis 8 threads
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from organize_engine import organize_records, walk_tree_files
+
+EXTENSIONS = ('.jpg', '.mp4', '.pdf', '.mp3', '.zip', '.bin')
+CATEGORIES = ('Images', 'Vidéos', 'Documents', 'Musique', 'Archives', 'Autres')
+
+# Au-delà, la recherche linéaire est extrapolée (quadratique) au lieu d'être mesurée
+MAX_LINEAR_LOOKUP = 20000
+
+# Arborescence du mode récursif: fichiers par dossier et sous-dossiers par dossier
+FILES_PER_DIR = 100
+DIRS_PER_DIR = 10
+
+
+def make_records(folder, count):
+    """Enregistrements comme ceux de scan_folder, avec un identifiant d'élément par fichier"""
+    records = []
+    for i in range(count):
+        filename = f"file_{i}{EXTENSIONS[i % len(EXTENSIONS)]}"
+        category = CATEGORIES[i % len(CATEGORIES)]
+        records.append({
+            'filename': filename,
+            'path': os.path.join(folder, filename),
+            'size': 0,
+            'category': category,
+            'destination': os.path.join(folder, category),
+            'item': f"I{i:06X}"
+        })
+    return records
+
+
+def linear_lookup(records, items):
+    """Ancienne méthode: chaque élément est cherché par son nom dans toute la liste"""
+    names = {record['item']: record['filename'] for record in records}
+    start = time.perf_counter()
+    for item in items:
+        filename = names[item]
+        next((f for f in records if f['filename'] == filename), None)
+    return time.perf_counter() - start
+
+
+def indexed_lookup(records, items):
+    """Index élément -> enregistrement construit au scan"""
+    index = {record['item']: record for record in records}
+    start = time.perf_counter()
+    [index[item] for item in items if item in index]
+    return time.perf_counter() - start
+
+
+def run_organize(count, workers):
+    """Range count fichiers vides et retourne les statistiques du moteur"""
+    with tempfile.TemporaryDirectory() as folder:
+        records = make_records(folder, count)
+        for record in records:
+            os.close(os.open(record['path'], os.O_CREAT | os.O_WRONLY))
+        return organize_records(records, workers=workers)
+
+
+def make_tree(folder, count):
+    """Répartit count fichiers de 1 Ko dans une arborescence (FILES_PER_DIR par dossier)"""
+    data = b'\0' * 1024
+    for i in range(count):
+        directory = folder
+        index = i // FILES_PER_DIR
+        while index:
+            directory = os.path.join(directory, f"d{index % DIRS_PER_DIR}")
+            index //= DIRS_PER_DIR
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file_{i}{EXTENSIONS[i % len(EXTENSIONS)]}"), 'wb') as f:
+            f.write(data)
+
+
+def run_recursive_organize(count, workers):
+    """Range à plat une arborescence lue au fil de l'eau et retourne les statistiques"""
+    with tempfile.TemporaryDirectory() as folder:
+        make_tree(folder, count)
+        by_extension = dict(zip(EXTENSIONS, CATEGORIES))
+
+        def records():
+            for path, file_stat in walk_tree_files(folder, set(CATEGORIES)):
+                filename = os.path.basename(path)
+                category = by_extension[os.path.splitext(filename)[1]]
+                yield {'filename': filename, 'path': path, 'size': file_stat.st_size,
+                       'category': category, 'destination': os.path.join(folder, category)}
+
+        return organize_records(records(), workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche et du rangement des fichiers sélectionnés")
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Nombres de fichiers sélectionnés")
+    parser.add_argument('--no-move', action='store_true', help="Mesurer seulement la recherche des fichiers")
+    parser.add_argument('--recursive', action='store_true',
+                        help="Ranger une arborescence parcourue au fil de l'eau")
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 8],
+                        help="Nombres de déplacements en parallèle")
+    args = parser.parse_args()
+
+    if args.recursive:
+        print(f"{'Fichiers':>10} {'Threads':>8} {'Rangement':>11} {'fichiers/s':>11} {'Mo/s':>8}")
+        for count in args.sizes:
+            for workers in args.workers:
+                stats = run_recursive_organize(count, workers)
+                print(f"{count:>10} {workers:>8} {stats['elapsed']:>9.2f} s {stats['rate']:>11.0f} "
+                      f"{stats['byte_rate'] / 1024 ** 2:>8.1f}")
+        return
+
+    print(f"{'Fichiers':>10} {'Recherche linéaire':>20} {'Index':>10} {'Rangement':>11} {'fichiers/s':>11}")
+    for count in args.sizes:
+        records = make_records("", count)
+        items = [record['item'] for record in reversed(records)]
+
+        if count <= MAX_LINEAR_LOOKUP:
+            linear = f"{linear_lookup(records, items):.3f} s"
+        else:
+            # Mesure sur un échantillon, extrapolée au carré du nombre de fichiers
+            sample = MAX_LINEAR_LOOKUP
+            sample_records = records[:sample]
+            elapsed = linear_lookup(sample_records, [r['item'] for r in reversed(sample_records)])
+            linear = f"~{elapsed * (count / sample) ** 2:.0f} s"
+        indexed = indexed_lookup(records, items)
+
+        if args.no_move:
+            print(f"{count:>10} {linear:>20} {indexed:>8.3f} s")
+            continue
+        stats = run_organize(count, args.workers[-1])
+        print(f"{count:>10} {linear:>20} {indexed:>8.3f} s {stats['elapsed']:>9.2f} s {stats['rate']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
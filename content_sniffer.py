@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection du type des fichiers par leur contenu
+Auteur: Zx
+Description: Lecture des premiers octets (os.pread par lots dans un pool de threads) et
+             comparaison à une table de signatures pour classer les fichiers sans
+             extension ou mal nommés; résultats mis en cache par identité de fichier
+"""
+
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre d'octets lus au début de chaque fichier (l'en-tête tar est à l'offset 257)
+SNIFF_SIZE = 512
+
+# Nombre de fichiers lus par tâche du pool
+BATCH_SIZE = 64
+
+# Lectures en parallèle par défaut (appels système courts et bloquants)
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+# Signatures: (offset, octets attendus, extension), testées dans l'ordre; les formats
+# conteneurs (RIFF, ftyp, Matroska, ZIP) sont précisés par _refine
+SIGNATURES = (
+    (0, b'\xff\xd8\xff', '.jpg'),
+    (0, b'\x89PNG\r\n\x1a\n', '.png'),
+    (0, b'GIF87a', '.gif'),
+    (0, b'GIF89a', '.gif'),
+    (0, b'II*\x00', '.tiff'),
+    (0, b'MM\x00*', '.tiff'),
+    (0, b'RIFF', '.riff'),
+    (4, b'ftyp', '.ftyp'),
+    (0, b'\x1a\x45\xdf\xa3', '.mkv'),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', '.wmv'),
+    (0, b'FLV\x01', '.flv'),
+    (0, b'%PDF-', '.pdf'),
+    (0, b'{\\rtf', '.rtf'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', '.doc'),
+    (0, b'PK\x03\x04', '.zip'),
+    (0, b'PK\x05\x06', '.zip'),
+    (0, b'ID3', '.mp3'),
+    (0, b'fLaC', '.flac'),
+    (0, b'OggS', '.ogg'),
+    (0, b'Rar!\x1a\x07', '.rar'),
+    (0, b'7z\xbc\xaf\x27\x1c', '.7z'),
+    (257, b'ustar', '.tar'),
+    (0, b'\x1f\x8b', '.gz'),
+    (0, b'BZh', '.bz2'),
+    (0, b'\xfd7zXZ\x00', '.xz'),
+    (0, b'BM', '.bmp'),
+)
+
+# Marques « ftyp » (ISO BMFF) qui ne sont pas des vidéos MP4 génériques
+_FTYP_BRANDS = {b'qt  ': '.mov', b'M4V ': '.m4v', b'M4VH': '.m4v', b'M4A ': '.m4a', b'M4B ': '.m4a'}
+
+# Formes RIFF connues (octets 8 à 12)
+_RIFF_FORMS = {b'WAVE': '.wav', b'AVI ': '.avi', b'WEBP': '.webp'}
+
+_OOXML = {'.docx', '.xlsx', '.pptx', '.docm', '.xlsm', '.pptm', '.dotx', '.xltx', '.potx', '.vsdx'}
+_ISO_BMFF = {'.mp4', '.m4v', '.m4a', '.m4b', '.mov', '.3gp', '.3g2', '.heic', '.avif'}
+
+# Type détecté -> extensions dont il n'est que le conteneur: la signature ne les contredit
+# pas (un .xlsx est une archive zip, un .m4a un fichier ISO BMFF comme un .mp4)
+CONTAINER_EXTENSIONS = {
+    '.zip': _OOXML | {'.odt', '.ods', '.odp', '.odg', '.epub', '.jar', '.apk', '.xpi', '.cbz', '.whl', '.kmz'},
+    '.docx': _OOXML,
+    '.xlsx': _OOXML,
+    '.pptx': _OOXML,
+    '.doc': {'.xls', '.ppt', '.msg', '.msi', '.pub', '.dot', '.xlt', '.pot'},
+    '.mp4': _ISO_BMFF,
+    '.m4v': _ISO_BMFF,
+    '.m4a': _ISO_BMFF,
+    '.mov': _ISO_BMFF,
+    '.mkv': {'.webm', '.mka', '.mk3d'},
+    '.webm': {'.mkv', '.mka'},
+    '.ogg': {'.oga', '.ogv', '.opus', '.spx'},
+    '.wmv': {'.wma', '.asf'},
+    '.jpg': {'.jpeg', '.jpe', '.jfif'},
+    '.tiff': {'.tif', '.dng', '.nef', '.cr2', '.arw'},
+    '.svg': {'.svgz', '.html', '.htm', '.xhtml', '.xml'},
+    '.gz': {'.tgz'},
+    '.bz2': {'.tbz', '.tbz2'},
+    '.xz': {'.txz'},
+}
+
+
+def _refine(extension, header):
+    """Précise le type des formats conteneurs, ou None si le contenu n'est pas reconnu"""
+    if extension == '.riff':
+        return _RIFF_FORMS.get(header[8:12])
+    if extension == '.ftyp':
+        return _FTYP_BRANDS.get(header[8:12], '.mp4')
+    if extension == '.mkv':
+        return '.webm' if b'webm' in header[:64] else '.mkv'
+    if extension == '.zip':
+        # Documents bureautiques: le nom de la première entrée suit l'en-tête local (30 octets)
+        if header[30:38] == b'mimetype':
+            # Conteneur OpenDocument ou EPUB: seul le texte correspond à une catégorie
+            return '.odt' if b'opendocument.text' in header else None
+        if header[30:49] == b'[Content_Types].xml' or header[30:35] in (b'word/', b'ppt/s', b'xl/wo'):
+            if b'word/' in header:
+                return '.docx'
+            if b'ppt/' in header:
+                return '.pptx'
+            return '.xlsx'
+        return '.zip'
+    if extension == '.bmp':
+        # « BM » est court: la taille du fichier déclarée doit suivre
+        return '.bmp' if len(header) >= 14 and header[6:10] == b'\x00\x00\x00\x00' else None
+    return extension
+
+
+def sniff_header(header):
+    """Extension correspondant aux premiers octets d'un fichier, ou None"""
+    for offset, magic, extension in SIGNATURES:
+        if header[offset:offset + len(magic)] == magic:
+            return _refine(extension, header)
+    # Trames MPEG audio sans étiquette ID3, flux AAC (ADTS)
+    if len(header) >= 2 and header[0] == 0xff:
+        if header[1] in (0xfb, 0xf3, 0xf2):
+            return '.mp3'
+        if header[1] in (0xf1, 0xf9):
+            return '.aac'
+    # SVG: document XML texte dont l'élément racine est <svg
+    if b'<svg' in header[:SNIFF_SIZE] and header.lstrip()[:1] == b'<':
+        return '.svg'
+    return None
+
+
+def content_overrides(extension, detected):
+    """Le type détecté d'après le contenu doit-il remplacer l'extension du fichier
+
+    Oui si le fichier n'a pas d'extension ou si la signature la contredit; non si elle
+    désigne seulement le conteneur de ce format (zip pour un .xlsx ou un .epub...).
+    """
+    if detected is None or detected == extension:
+        return False
+    if not extension:
+        return True
+    return extension not in CONTAINER_EXTENSIONS.get(detected, ())
+
+
+def _read_header(path):
+    """Premiers SNIFF_SIZE octets d'un fichier"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if hasattr(os, 'pread'):
+            return os.pread(fd, SNIFF_SIZE, 0)
+        return os.read(fd, SNIFF_SIZE)
+    finally:
+        os.close(fd)
+
+
+def _sniff_batch(paths):
+    """Tâche du pool: [(chemin, extension ou None, lecture réussie)] pour un lot de fichiers"""
+    results = []
+    for path in paths:
+        try:
+            results.append((path, sniff_header(_read_header(path)), True))
+        except OSError:
+            results.append((path, None, False))
+    return results
+
+
+class ContentSniffer:
+    """Détecte le type de fichiers par leur contenu, avec un cache par identité de fichier
+
+    Le cache est indexé par (chemin, device, inode, taille, mtime_ns): un fichier
+    inchangé n'est jamais relu lors d'une nouvelle analyse du dossier. Le chemin fait
+    partie de la clé car le stat d'un listing Windows (DirEntry.stat) a un inode et un
+    device nuls: deux fichiers de même taille et même date ne doivent pas se confondre.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or DEFAULT_WORKERS
+        self.cache = {}
+        self.hits = 0
+        self.reads = 0
+
+    @staticmethod
+    def _key(path, file_stat):
+        return (path, file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+
+    def sniff_many(self, files):
+        """Retourne {chemin: extension ou None} pour une liste de (chemin, stat)
+
+        Seuls les fichiers ordinaires absents du cache sont lus, par lots de BATCH_SIZE.
+        """
+        results = {}
+        to_read = []
+        keys = {}
+        for path, file_stat in files:
+            if not stat.S_ISREG(file_stat.st_mode):
+                results[path] = None
+                continue
+            key = self._key(path, file_stat)
+            if key in self.cache:
+                results[path] = self.cache[key]
+                self.hits += 1
+            else:
+                to_read.append(path)
+                keys[path] = key
+
+        if to_read:
+            batches = [to_read[i:i + BATCH_SIZE] for i in range(0, len(to_read), BATCH_SIZE)]
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+                for batch_results in pool.map(_sniff_batch, batches):
+                    for path, extension, read in batch_results:
+                        results[path] = extension
+                        # Une lecture en échec (verrou, droits) sera retentée au prochain scan
+                        if read:
+                            self.cache[keys[path]] = extension
+            self.reads += len(to_read)
+        return results
+
+    def sniff(self, path):
+        """Extension détectée pour un seul fichier, ou None"""
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            return None
+        return self.sniff_many([(path, file_stat)])[path]
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arbre des tailles de dossiers
+Auteur: Zx
+Description: Un seul parcours du disque construit un arbre compact (dossier → taille totale,
+             nombre de fichiers) agrégé de bas en haut: tout sous-dossier peut ensuite être
+             exploré sans nouveau parcours. L'arbre est conservé dans un index persistant
+             et les analyses suivantes ne relistent que les dossiers modifiés
+"""
+
+import os
+import heapq
+import sqlite3
+import time
+
+from app_data import get_data_dir
+from fs_walker import scan_tree, scan_directory, allocated_size
+
+INDEX_FILENAME = "disk_index.sqlite3"
+
+# Version du schéma de l'index: un index d'une autre version est reconstruit
+INDEX_VERSION = 2
+
+# Nombre de dossiers parcourus entre deux notifications de progression
+PROGRESS_EVERY = 1000
+
+# Nombre de plus gros fichiers affichés, globalement et par catégorie
+DEFAULT_TOP_K = 100
+
+# Réserve conservée au-delà des K premiers: une analyse incrémentale qui fait disparaître
+# de gros fichiers peut ainsi compléter la liste sans relister les dossiers inchangés
+TOP_K_RESERVE = 4
+
+# Clé de la liste globale (toutes catégories) et catégorie des extensions inconnues
+ALL_FILES = ''
+OTHER_CATEGORY = 'Autres'
+
+# Séparateur des noms de sous-dossiers dans l'index (interdit dans les noms de fichiers)
+_NAME_SEPARATOR = '\0'
+
+
+class DirNode:
+    """Nœud de l'arbre: totaux du dossier et de tout son contenu"""
+    __slots__ = ('size', 'allocated', 'files', 'own_size', 'own_allocated', 'own_files', 'links',
+                 'linked_size', 'linked_allocated', 'subdirs', 'parent', 'mtime_ns', 'ctime_ns')
+
+    def __init__(self, parent=None, dir_stat=None):
+        # Totaux récursifs (remplis par l'agrégation) et contenu direct du dossier:
+        # taille apparente (st_size) et espace alloué (st_blocks * 512, dossier compris)
+        self.size = 0
+        self.allocated = allocated_size(dir_stat) if dir_stat is not None else 0
+        self.files = 0
+        self.own_size = 0
+        self.own_allocated = 0
+        self.own_files = 0
+        # Fichiers à liens physiques multiples: (device, inode, taille, alloué), comptés
+        # une seule fois pour tout l'arbre lors de l'agrégation (None s'il n'y en a pas)
+        self.links = None
+        # Part de ces fichiers attribuée à ce dossier par l'agrégation (première occurrence
+        # de chaque inode)
+        self.linked_size = 0
+        self.linked_allocated = 0
+        self.subdirs = []
+        self.parent = parent
+        # Dates du dossier lui-même: elles changent dès qu'une entrée y est ajoutée,
+        # supprimée ou renommée
+        self.mtime_ns = dir_stat.st_mtime_ns if dir_stat is not None else 0
+        self.ctime_ns = dir_stat.st_ctime_ns if dir_stat is not None else 0
+
+    @property
+    def files_size(self):
+        """Taille des fichiers placés directement dans le dossier, liens physiques compris"""
+        return self.own_size + self.linked_size
+
+    @property
+    def files_allocated(self):
+        """Espace alloué aux fichiers placés directement dans le dossier, liens physiques compris"""
+        return self.own_allocated + self.linked_allocated
+
+
+class LargestFiles:
+    """Plus gros fichiers rencontrés pendant un parcours, globalement et par catégorie
+
+    Chaque liste est un tas minimum borné: un fichier plus petit que le plus petit
+    conservé est écarté en O(1), sinon il le remplace en O(log K).
+    """
+
+    def __init__(self, limit=DEFAULT_TOP_K, categories=None):
+        self.limit = limit
+        self.capacity = limit * TOP_K_RESERVE
+        # Extension -> catégorie (dictionnaire de catégories de l'application)
+        self._category_of = {extension: category
+                             for category, extensions in (categories or {}).items()
+                             for extension in extensions}
+        # Catégorie (ALL_FILES pour la liste globale) -> tas de (taille, chemin)
+        self.heaps = {ALL_FILES: []}
+
+    def category(self, name):
+        """Catégorie d'un fichier selon son extension"""
+        return self._category_of.get(os.path.splitext(name)[1].lower(), OTHER_CATEGORY)
+
+    def _push(self, category, size, directory, name):
+        heap = self.heaps.get(category)
+        if heap is None:
+            heap = self.heaps[category] = []
+        if len(heap) < self.capacity:
+            heapq.heappush(heap, (size, os.path.join(directory, name)))
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, (size, os.path.join(directory, name)))
+
+    def offer(self, directory, name, size):
+        """Propose un fichier aux listes globale et de sa catégorie"""
+        self._push(ALL_FILES, size, directory, name)
+        if self._category_of:
+            self._push(self.category(name), size, directory, name)
+
+    def merge(self, other, keep):
+        """Reprend les fichiers d'une autre liste pour lesquels keep(chemin) est vrai"""
+        for category, heap in other.heaps.items():
+            for size, path in heap:
+                if keep(path):
+                    directory, name = os.path.split(path)
+                    self._push(category, size, directory, name)
+
+    def categories(self):
+        """Catégories ayant au moins un fichier (hors liste globale)"""
+        return sorted(category for category, heap in self.heaps.items() if category != ALL_FILES and heap)
+
+    def results(self, category=ALL_FILES):
+        """Les K plus gros fichiers d'une catégorie: liste de (chemin, taille) décroissante"""
+        largest = heapq.nlargest(self.limit, self.heaps.get(category, []))
+        return [(path, size) for size, path in largest]
+
+
+class SizeTree:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        # Chemin absolu du dossier -> DirNode
+        self.nodes = {}
+        self.errors = 0
+        # Bilan de la dernière analyse
+        self.duration = 0.0
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        # Fichiers à liens physiques multiples rencontrés plusieurs fois (non recomptés)
+        self.hardlinks_skipped = 0
+        # Plus gros fichiers (LargestFiles), si demandés lors de l'analyse
+        self.largest = None
+
+    def scan(self, workers=None, cancel_event=None, on_progress=None, previous=None, largest=None):
+        """Parcourt le dossier racine et agrège les tailles de bas en haut
+
+        previous (SizeTree d'une analyse précédente, par exemple chargé depuis
+        DiskIndex) permet de ne relister que les dossiers dont mtime ou ctime a changé:
+        les autres reprennent leurs totaux de l'index, seuls leurs sous-dossiers sont
+        examinés. on_progress, si fourni, reçoit (dossiers parcourus, fichiers, octets)
+        tous les PROGRESS_EVERY dossiers. largest (LargestFiles) est rempli avec les
+        fichiers vus pendant ce même parcours, sans appel système supplémentaire.
+        """
+        start = time.perf_counter()
+        try:
+            root_stat = os.stat(self.root)
+        except OSError:
+            root_stat = None
+        self.nodes = {self.root: DirNode(dir_stat=root_stat)}
+        self.errors = 0
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        self.largest = largest
+        previous_nodes = previous.nodes if previous is not None else {}
+        # Dossiers inchangés depuis l'analyse précédente (remplis avant leur soumission)
+        unchanged = set()
+
+        def is_unchanged(path, node):
+            old = previous_nodes.get(path)
+            return (old is not None and node.mtime_ns and
+                    (old.mtime_ns, old.ctime_ns) == (node.mtime_ns, node.ctime_ns))
+
+        def scan_incremental(path):
+            if path not in unchanged:
+                return scan_directory(path)
+            # Dossier inchangé: seuls ses sous-dossiers connus sont examinés (un stat chacun)
+            dirs = []
+            for name in previous_nodes[path].subdirs:
+                try:
+                    dirs.append((name, os.stat(os.path.join(path, name), follow_symlinks=False)))
+                except OSError:
+                    continue
+            return path, dirs, None, None
+
+        def count_error(error):
+            self.errors += 1
+
+        if is_unchanged(self.root, self.nodes[self.root]):
+            unchanged.add(self.root)
+
+        # Un dossier est toujours produit après son parent: l'ordre inverse est ascendant
+        order = []
+        listed = set()
+        total_files = 0
+        total_size = 0
+        for path, dirs, files in scan_tree(self.root, workers, count_error, cancel_event, scan_incremental):
+            node = self.nodes[path]
+            listed.add(path)
+            if files is None:
+                old = previous_nodes[path]
+                node.own_files = old.own_files
+                node.own_size = old.own_size
+                node.own_allocated = old.own_allocated
+                node.links = old.links
+                self.dirs_skipped += 1
+            else:
+                node.own_files = len(files)
+                for name, file_stat in files:
+                    if file_stat.st_nlink > 1:
+                        # Compté à l'agrégation, une seule fois quel que soit le nombre de chemins
+                        if node.links is None:
+                            node.links = []
+                        node.links.append((file_stat.st_dev, file_stat.st_ino,
+                                           file_stat.st_size, allocated_size(file_stat)))
+                    else:
+                        node.own_size += file_stat.st_size
+                        node.own_allocated += allocated_size(file_stat)
+                self.dirs_listed += 1
+                if largest is not None:
+                    for name, file_stat in files:
+                        largest.offer(path, name, file_stat.st_size)
+            for name, dir_stat in dirs:
+                child_path = os.path.join(path, name)
+                child = DirNode(node, dir_stat)
+                node.subdirs.append(name)
+                self.nodes[child_path] = child
+                if is_unchanged(child_path, child):
+                    unchanged.add(child_path)
+            order.append(node)
+
+            total_files += node.own_files
+            total_size += node.own_size
+            if on_progress is not None and len(order) % PROGRESS_EVERY == 0:
+                on_progress(len(order), total_files, total_size)
+
+        # Dossiers illisibles (ou non atteints après une annulation): leurs totaux sont
+        # inconnus, leurs dates sont effacées pour qu'ils soient relistés à la prochaine analyse
+        for path, node in self.nodes.items():
+            if path not in listed:
+                node.mtime_ns = node.ctime_ns = 0
+
+        # Les gros fichiers des dossiers non relistés sont repris de l'analyse précédente
+        if largest is not None and previous is not None and previous.largest is not None:
+            largest.merge(previous.largest, lambda file_path: os.path.dirname(file_path) in unchanged)
+
+        # Chaque inode à liens multiples est attribué à un seul dossier (le premier dans
+        # l'ordre des chemins, pour un résultat stable d'une analyse à l'autre)
+        self.hardlinks_skipped = 0
+        seen_inodes = set()
+        linked = sorted((path, node) for path, node in self.nodes.items() if node.links)
+        for path, node in linked:
+            for dev, ino, size, allocated in node.links:
+                if (dev, ino) in seen_inodes:
+                    self.hardlinks_skipped += 1
+                    continue
+                seen_inodes.add((dev, ino))
+                node.linked_size += size
+                node.linked_allocated += allocated
+
+        for node in reversed(order):
+            node.size += node.files_size
+            node.allocated += node.files_allocated
+            node.files += node.own_files
+            if node.parent is not None:
+                node.parent.size += node.size
+                node.parent.allocated += node.allocated
+                node.parent.files += node.files
+
+        self.duration = time.perf_counter() - start
+        return self
+
+    def node(self, path):
+        """Nœud d'un dossier de l'arbre, ou None s'il n'a pas été parcouru"""
+        return self.nodes.get(os.path.abspath(path))
+
+    def children(self, path):
+        """Sous-dossiers directs d'un dossier: liste de (nom, nœud) par taille décroissante"""
+        path = os.path.abspath(path)
+        node = self.nodes.get(path)
+        if node is None:
+            return []
+        prefix = os.path.join(path, '')
+        children = []
+        for name in node.subdirs:
+            child = self.nodes.get(prefix + name)
+            if child is not None:
+                children.append((name, child))
+        children.sort(key=lambda child: child[1].size, reverse=True)
+        return children
+
+    @property
+    def total_size(self):
+        return self.nodes[self.root].size if self.root in self.nodes else 0
+
+    @property
+    def total_allocated(self):
+        return self.nodes[self.root].allocated if self.root in self.nodes else 0
+
+    @property
+    def total_files(self):
+        return self.nodes[self.root].files if self.root in self.nodes else 0
+
+
+class DiskIndex:
+    """Index persistant (SQLite) des arbres de tailles, un par dossier racine analysé"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_dir(), INDEX_FILENAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            # L'index n'est qu'un cache: un ancien schéma est simplement reconstruit
+            self.conn.execute("DROP TABLE IF EXISTS dirs")
+            self.conn.execute("DROP TABLE IF EXISTS scans")
+            self.conn.execute("DROP TABLE IF EXISTS largest_files")
+            self.conn.execute(f"PRAGMA user_version={INDEX_VERSION}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                root TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ctime_ns INTEGER NOT NULL,
+                own_size INTEGER NOT NULL,
+                own_allocated INTEGER NOT NULL,
+                own_files INTEGER NOT NULL,
+                links TEXT NOT NULL,
+                subdirs TEXT NOT NULL,
+                PRIMARY KEY (root, path)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS largest_files (
+                root TEXT NOT NULL,
+                category TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_largest_files_root ON largest_files (root)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS scans (
+                root TEXT PRIMARY KEY,
+                scanned_at REAL NOT NULL,
+                duration REAL NOT NULL,
+                dirs_listed INTEGER NOT NULL,
+                dirs_skipped INTEGER NOT NULL,
+                total_size INTEGER NOT NULL,
+                total_allocated INTEGER NOT NULL,
+                total_files INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def load(self, root):
+        """Reconstruit l'arbre enregistré pour ce dossier racine, ou None s'il n'existe pas"""
+        root = os.path.abspath(root)
+        tree = SizeTree(root)
+        rows = self.conn.execute(
+            "SELECT path, mtime_ns, ctime_ns, own_size, own_allocated, own_files, links, subdirs "
+            "FROM dirs WHERE root=?",
+            (root,)
+        )
+        for path, mtime_ns, ctime_ns, own_size, own_allocated, own_files, links, subdirs in rows:
+            node = DirNode()
+            node.mtime_ns = mtime_ns
+            node.ctime_ns = ctime_ns
+            node.own_size = own_size
+            node.own_allocated = own_allocated
+            node.own_files = own_files
+            if links:
+                node.links = [tuple(int(value) for value in link.split(':')) for link in links.split(';')]
+            node.subdirs = subdirs.split(_NAME_SEPARATOR) if subdirs else []
+            tree.nodes[path] = node
+        if root not in tree.nodes:
+            return None
+
+        largest = LargestFiles()
+        rows = self.conn.execute("SELECT category, path, size FROM largest_files WHERE root=?", (root,))
+        for category, path, size in rows:
+            largest.heaps.setdefault(category, []).append((size, path))
+        for heap in largest.heaps.values():
+            heapq.heapify(heap)
+        tree.largest = largest
+        return tree
+
+    def save(self, tree):
+        """Remplace l'arbre enregistré pour ce dossier racine et le bilan de son analyse"""
+        with self.conn:
+            self.conn.execute("DELETE FROM dirs WHERE root=?", (tree.root,))
+            self.conn.executemany(
+                "INSERT INTO dirs (root, path, mtime_ns, ctime_ns, own_size, own_allocated, own_files, "
+                "links, subdirs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((tree.root, path, node.mtime_ns, node.ctime_ns, node.own_size, node.own_allocated,
+                  node.own_files, ';'.join(':'.join(map(str, link)) for link in node.links or ()),
+                  _NAME_SEPARATOR.join(node.subdirs))
+                 for path, node in tree.nodes.items())
+            )
+            self.conn.execute("DELETE FROM largest_files WHERE root=?", (tree.root,))
+            if tree.largest is not None:
+                self.conn.executemany(
+                    "INSERT INTO largest_files (root, category, path, size) VALUES (?, ?, ?, ?)",
+                    ((tree.root, category, path, size)
+                     for category, heap in tree.largest.heaps.items() for size, path in heap)
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scans "
+                "(root, scanned_at, duration, dirs_listed, dirs_skipped, total_size, total_allocated, "
+                "total_files) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (tree.root, time.time(), tree.duration, tree.dirs_listed, tree.dirs_skipped,
+                 tree.total_size, tree.total_allocated, tree.total_files)
+            )
+
+    def last_scan(self, root):
+        """Bilan de la dernière analyse enregistrée pour ce dossier racine (dict) ou None"""
+        row = self.conn.execute(
+            "SELECT scanned_at, duration, dirs_listed, dirs_skipped, total_size, total_allocated, "
+            "total_files FROM scans WHERE root=?",
+            (os.path.abspath(root),)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('scanned_at', 'duration', 'dirs_listed', 'dirs_skipped', 'total_size', 'total_allocated',
+                'total_files')
+        return dict(zip(keys, row))
+
+    def close(self):
+        self.conn.close()
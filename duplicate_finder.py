@@ -0,0 +1,809 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de recherche de fichiers doublons
+Auteur: Zx
+Description: Détection des doublons en plusieurs étapes (taille → hash partiel → hash complet)
+             pour ne lire entièrement que les fichiers qui sont réellement candidats
+"""
+
+import contextlib
+import os
+import sys
+import stat
+import json
+import errno
+import mmap
+import time
+import fnmatch
+import argparse
+import signal
+import hashlib
+import itertools
+import platform
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from hash_cache import file_identity
+from fs_walker import allocated_size
+
+# Nombre d'octets lus au début et à la fin de chaque fichier pour le hash partiel
+PARTIAL_HASH_SIZE = 4 * 1024
+
+# Taille des blocs lus lors du hash complet (mémoire constante quelle que soit la taille du fichier)
+CHUNK_SIZE = 1024 * 1024
+
+# Algorithmes de hash disponibles
+HASH_ALGORITHMS = ('md5', 'sha1', 'blake2b')
+DEFAULT_ALGORITHM = 'md5'
+
+# Étapes du pipeline, dans l'ordre d'exécution ('verify' est optionnelle)
+STAGES = ('size', 'partial', 'full', 'verify')
+
+# Intervalle minimal entre deux notifications de progression (secondes)
+PROGRESS_INTERVAL = 0.25
+
+# Lissage du débit instantané (moyenne mobile exponentielle)
+RATE_SMOOTHING = 0.3
+
+# Taille des régions comparées lors de la vérification octet par octet (multiple de la page mémoire)
+VERIFY_REGION_SIZE = 256 * mmap.PAGESIZE
+
+# Types de pool pour le calcul des hash
+EXECUTORS = ('thread', 'process')
+DEFAULT_EXECUTOR = 'thread'
+
+# Hash soumis d'avance par worker: au-delà, les tâches attendent que le pool se libère
+MAX_PENDING_PER_WORKER = 4
+
+# Tampon de lecture propre à chaque thread (ou processus) de travail
+_worker_state = threading.local()
+
+# Modes de remplacement des doublons par des liens
+RECLAIM_MODES = ('hardlink', 'reflink')
+
+# ioctl Linux de clonage de fichier (partage des blocs, copie à l'écriture)
+FICLONE = 0x40049409
+
+
+def _read_into(f, view):
+    """Remplit la vue autant que possible, retourne le nombre d'octets lus"""
+    total = 0
+    while total < len(view):
+        count = f.readinto(view[total:])
+        if not count:
+            break
+        total += count
+    return total
+
+
+def hash_file(file_path, algorithm=DEFAULT_ALGORITHM, buffer=None, cancel_event=None):
+    """Hash complet d'un fichier lu par blocs dans un tampon réutilisable
+
+    Retourne le digest hexadécimal et le nombre d'octets lus. Le digest vaut None
+    si cancel_event est levé pendant la lecture.
+    """
+    if buffer is None:
+        buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    digest = hashlib.new(algorithm)
+    bytes_read = 0
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(view)
+            if not count:
+                break
+            digest.update(view[:count])
+            bytes_read += count
+            if cancel_event is not None and cancel_event.is_set():
+                return None, bytes_read
+    return digest.hexdigest(), bytes_read
+
+
+def hash_partial(file_path, size, partial_size=PARTIAL_HASH_SIZE,
+                 algorithm=DEFAULT_ALGORITHM, buffer=None):
+    """Hash du début et de la fin d'un fichier
+
+    Si le fichier est plus petit que deux blocs partiels, tout son contenu est haché.
+    Retourne le digest hexadécimal et le nombre d'octets lus.
+    """
+    if buffer is None or len(buffer) < partial_size:
+        buffer = bytearray(partial_size)
+    view = memoryview(buffer)[:partial_size]
+    digest = hashlib.new(algorithm)
+    bytes_read = 0
+    with open(file_path, 'rb', buffering=0) as f:
+        count = _read_into(f, view)
+        digest.update(view[:count])
+        bytes_read += count
+        if size > 2 * partial_size:
+            f.seek(-partial_size, os.SEEK_END)
+        # Le reste du fichier (ou la fin) est lu avec le même tampon
+        while True:
+            count = _read_into(f, view)
+            if not count:
+                break
+            digest.update(view[:count])
+            bytes_read += count
+    return digest.hexdigest(), bytes_read
+
+
+def _hash_job(stage, file_path, size, partial_size, algorithm, cancel_event=None):
+    """Tâche exécutée dans le pool: retourne (chemin, hash, octets lus)"""
+    buffer = getattr(_worker_state, 'buffer', None)
+    if buffer is None:
+        buffer = _worker_state.buffer = bytearray(max(CHUNK_SIZE, partial_size))
+    if stage == 'partial':
+        file_hash, bytes_read = hash_partial(file_path, size, partial_size, algorithm, buffer)
+    else:
+        file_hash, bytes_read = hash_file(file_path, algorithm, buffer, cancel_event)
+    return file_path, file_hash, bytes_read
+
+
+def detect_storage_type(path):
+    """Retourne 'ssd', 'hdd' ou 'unknown' pour le périphérique contenant le chemin"""
+    if platform.system() != "Linux":
+        return 'unknown'
+    try:
+        device = os.stat(path).st_dev
+        sys_path = os.path.realpath(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}")
+        # Une partition n'a pas de dossier queue, il faut remonter au disque parent
+        for candidate in (sys_path, os.path.dirname(sys_path)):
+            rotational_file = os.path.join(candidate, 'queue', 'rotational')
+            if os.path.exists(rotational_file):
+                with open(rotational_file) as f:
+                    return 'hdd' if f.read().strip() == '1' else 'ssd'
+    except (OSError, ValueError):
+        pass
+    return 'unknown'
+
+
+def default_workers(path):
+    """Nombre de workers par défaut selon le nombre de cœurs et le type de stockage"""
+    cpu_count = os.cpu_count() or 1
+    storage = detect_storage_type(path)
+    if storage == 'hdd':
+        # Sur un disque rotatif, les lectures concurrentes multiplient les déplacements de tête
+        return 2
+    if storage == 'ssd':
+        # Les SSD/NVMe ont besoin de plusieurs lectures en vol pour atteindre leur débit
+        return min(32, cpu_count * 4)
+    return min(8, cpu_count + 2)
+
+
+def _temporary_path(path):
+    """Chemin temporaire dans le même dossier, pour un remplacement atomique"""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.xtri-{os.getpid()}.tmp")
+
+
+def _replace_with_hardlink(source, target):
+    """Remplace target par un lien physique vers source"""
+    temp_path = _temporary_path(target)
+    os.link(source, temp_path)
+    try:
+        os.replace(temp_path, target)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def _replace_with_reflink(source, target):
+    """Remplace target par un clone (reflink) de source, en gardant les métadonnées de target"""
+    if platform.system() != "Linux":
+        raise OSError(errno.EOPNOTSUPP, "Les clones reflink ne sont disponibles que sous Linux")
+    import fcntl
+    import shutil
+
+    temp_path = _temporary_path(target)
+    src_fd = os.open(source, os.O_RDONLY)
+    try:
+        dst_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        finally:
+            os.close(dst_fd)
+        shutil.copystat(target, temp_path)
+        os.replace(temp_path, target)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    finally:
+        os.close(src_fd)
+
+
+def _regions_equal(reference_view, candidate_view, size, region_size):
+    """Compare deux vues mémoire région par région, s'arrête à la première différence
+
+    Retourne (identiques, octets comparés dans chaque vue).
+    """
+    # Comparaison par mots de 8 octets (bien plus rapide que octet par octet), puis la fin
+    aligned = size - size % 8
+    reference_words = reference_view[:aligned].cast('Q')
+    candidate_words = candidate_view[:aligned].cast('Q')
+    words_per_region = region_size // 8
+    try:
+        for start in range(0, aligned // 8, words_per_region):
+            end = start + words_per_region
+            if reference_words[start:end] != candidate_words[start:end]:
+                return False, min(end * 8, aligned)
+        return reference_view[aligned:size].tobytes() == candidate_view[aligned:size].tobytes(), size
+    finally:
+        reference_words.release()
+        candidate_words.release()
+
+
+def _compare_mapped(reference_view, candidate_path, size, region_size):
+    """Compare un fichier projeté en mémoire à la référence déjà projetée
+
+    Retourne (identiques, octets comparés dans chaque fichier).
+    """
+    with open(candidate_path, 'rb') as candidate_file:
+        with mmap.mmap(candidate_file.fileno(), 0, access=mmap.ACCESS_READ) as candidate_map:
+            if len(candidate_map) != size:
+                return False, 0
+            with memoryview(candidate_map) as candidate_view:
+                return _regions_equal(reference_view, candidate_view, size, region_size)
+
+
+def verify_group(paths, size, region_size=VERIFY_REGION_SIZE):
+    """Vérifie octet par octet qu'un groupe de fichiers est identique (projection mmap)
+
+    Retourne les sous-groupes réellement identiques (au moins deux fichiers),
+    le nombre d'octets comparés et la liste des fichiers illisibles. Une référence
+    illisible est écartée et le fichier suivant prend sa place.
+    """
+    if size == 0:
+        return [list(paths)], 0, []
+
+    groups = []
+    unreadable = []
+    bytes_compared = 0
+    remaining = list(paths)
+    while len(remaining) > 1:
+        reference = remaining.pop(0)
+        same = [reference]
+        different = []
+        with contextlib.ExitStack() as stack:
+            # La référence est projetée une fois pour toutes les comparaisons du tour
+            try:
+                reference_file = stack.enter_context(open(reference, 'rb'))
+                reference_map = stack.enter_context(
+                    mmap.mmap(reference_file.fileno(), 0, access=mmap.ACCESS_READ))
+            except (OSError, ValueError):
+                unreadable.append(reference)
+                continue
+            if len(reference_map) != size:
+                # Modifiée depuis le hash: ne peut être identique à aucun autre fichier
+                continue
+            reference_view = stack.enter_context(memoryview(reference_map))
+            for candidate in remaining:
+                try:
+                    equal, compared = _compare_mapped(reference_view, candidate, size, region_size)
+                except (OSError, ValueError):
+                    unreadable.append(candidate)
+                    continue
+                bytes_compared += 2 * compared
+                (same if equal else different).append(candidate)
+        if len(same) > 1:
+            groups.append(same)
+        # Les fichiers différents de la référence peuvent être identiques entre eux
+        remaining = different
+    return groups, bytes_compared, unreadable
+
+
+class DuplicateFinder:
+    def __init__(self, algorithm=DEFAULT_ALGORITHM, partial_size=PARTIAL_HASH_SIZE,
+                 chunk_size=CHUNK_SIZE, cache=None, workers=None, executor=DEFAULT_EXECUTOR,
+                 min_size=0, include=None, exclude=None, verify=False):
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Algorithme de hash non supporté: {algorithm}")
+        if executor not in EXECUTORS:
+            raise ValueError(f"Type de pool non supporté: {executor}")
+        # workers=None: choisi selon la machine, workers=1: calcul séquentiel sans pool
+        self.workers = workers
+        self.executor = executor
+        # Taille du pool de la recherche en cours (borne des hash soumis d'avance)
+        self._pool_workers = 1
+        # Filtres: taille minimale, motifs de noms à inclure, motifs de noms ou chemins à exclure
+        self.min_size = min_size
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        # Vérification octet par octet des groupes avant de les confirmer
+        self.verify = verify
+        self.verify_elapsed = 0.0
+        self.algorithm = algorithm
+        self.partial_size = partial_size
+        # Tampon unique réutilisé pour toutes les lectures
+        self._buffer = bytearray(max(chunk_size, partial_size))
+        # Cache persistant optionnel (HashCache) et identités des fichiers du scan en cours
+        self.cache = cache
+        self._identities = {}
+        # Liens physiques regroupés avant le hash: premier chemin -> autres chemins du même inode
+        self.hardlinks = {}
+        # Annulation coopérative (cancel() depuis un autre thread) et progression
+        self._cancel_event = threading.Event()
+        self.cancelled = False
+        self.on_progress = None
+        self.progress = {}
+        self._start_time = 0.0
+        self._last_report = 0.0
+        self._last_report_bytes = 0
+        self.stats = {}
+        self._reset_stats()
+        self._reset_progress()
+
+    def _reset_stats(self):
+        """Réinitialise les compteurs de chaque étape"""
+        self.stats = {
+            stage: {'candidates': 0, 'eliminated': 0, 'bytes_read': 0}
+            for stage in STAGES
+        }
+        self.verify_elapsed = 0.0
+
+    def cancel(self):
+        """Demande l'arrêt de la recherche en cours (appelable depuis n'importe quel thread)"""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        """Vérifie si l'arrêt de la recherche a été demandé"""
+        return self._cancel_event.is_set()
+
+    def _reset_progress(self):
+        """Réinitialise l'état de progression au début d'une recherche"""
+        now = time.monotonic()
+        self.progress = {
+            'phase': 'discover',
+            'files_discovered': 0,
+            'bytes_total': 0,
+            'bytes_hashed': 0,
+            'groups': 0,
+            'elapsed': 0.0,
+            'rate': 0.0,
+            'eta': None
+        }
+        self._start_time = now
+        self._last_report = now
+        self._last_report_bytes = 0
+
+    def _report_progress(self, force=False):
+        """Notifie la progression, au plus une fois par PROGRESS_INTERVAL"""
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        elapsed = now - self._last_report
+        if not force and elapsed < PROGRESS_INTERVAL:
+            return
+
+        progress = self.progress
+        if elapsed > 0:
+            instant_rate = (progress['bytes_hashed'] - self._last_report_bytes) / elapsed
+            if progress['rate']:
+                instant_rate = RATE_SMOOTHING * instant_rate + (1 - RATE_SMOOTHING) * progress['rate']
+            progress['rate'] = instant_rate
+        remaining = progress['bytes_total'] - progress['bytes_hashed']
+        progress['eta'] = remaining / progress['rate'] if progress['rate'] > 0 and remaining > 0 else None
+        progress['elapsed'] = now - self._start_time
+
+        self._last_report = now
+        self._last_report_bytes = progress['bytes_hashed']
+        self.on_progress(dict(progress))
+
+    def _verify(self, size, paths):
+        """Vérifie un groupe octet par octet et retourne ses sous-groupes identiques"""
+        start = time.perf_counter()
+        groups, bytes_compared, unreadable = verify_group(paths, size)
+        self.verify_elapsed += time.perf_counter() - start
+
+        stats = self.stats['verify']
+        stats['candidates'] += len(paths)
+        stats['bytes_read'] += bytes_compared
+        stats['eliminated'] += len(paths) - sum(len(group) for group in groups)
+        return groups
+
+    def verify_throughput(self):
+        """Débit de la vérification octet par octet, en octets par seconde"""
+        if not self.verify_elapsed:
+            return 0
+        return self.stats['verify']['bytes_read'] / self.verify_elapsed
+
+    def _is_excluded(self, name, path):
+        """Vérifie si un nom ou un chemin correspond à un motif d'exclusion"""
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern)
+                   for pattern in self.exclude)
+
+    def _is_included(self, name):
+        """Vérifie si un nom de fichier correspond aux motifs d'inclusion"""
+        return not self.include or any(fnmatch.fnmatch(name, pattern) for pattern in self.include)
+
+    def collect_files(self, folders):
+        """Parcourt les dossiers et regroupe les fichiers par taille
+
+        Les chemins qui pointent vers un même inode (liens physiques) ne sont comptés
+        qu'une fois: ce ne sont pas des doublons et il est inutile de les relire.
+        """
+        files_by_size = defaultdict(list)
+        inodes = {}
+        for folder in folders:
+            for root, dirs, files in os.walk(folder):
+                if self.is_cancelled():
+                    return files_by_size
+                if self.exclude:
+                    dirs[:] = [d for d in dirs if not self._is_excluded(d, os.path.join(root, d))]
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    if not self._is_included(file) or (self.exclude and self._is_excluded(file, file_path)):
+                        continue
+                    try:
+                        file_stat = os.lstat(file_path)
+                    except OSError:
+                        continue
+                    # Les liens symboliques et fichiers spéciaux sont ignorés
+                    if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size < self.min_size:
+                        continue
+                    inode_key = (file_stat.st_dev, file_stat.st_ino)
+                    if file_stat.st_ino and inode_key in inodes:
+                        self.hardlinks.setdefault(inodes[inode_key], []).append(file_path)
+                        continue
+                    inodes[inode_key] = file_path
+                    self._identities[file_path] = file_identity(file_stat)
+                    files_by_size[file_stat.st_size].append(file_path)
+                    self.progress['files_discovered'] += 1
+                self._report_progress()
+        return files_by_size
+
+    def _hash_inline(self, stage, file_path, size):
+        """Calcul séquentiel d'un hash dans le thread courant"""
+        if stage == 'partial':
+            file_hash, bytes_read = hash_partial(file_path, size, self.partial_size,
+                                                 self.algorithm, self._buffer)
+        else:
+            file_hash, bytes_read = hash_file(file_path, self.algorithm, self._buffer, self._cancel_event)
+        return file_path, file_hash, bytes_read
+
+    def _compute_hashes(self, stage, jobs, pool):
+        """Calcule les hash des fichiers (chemin, taille) et les produit dans l'ordre de fin"""
+        if pool is None:
+            for file_path, size in jobs:
+                if self.is_cancelled():
+                    return
+                try:
+                    yield self._hash_inline(stage, file_path, size)
+                except OSError:
+                    yield file_path, None, 0
+            return
+
+        # L'événement d'annulation ne peut pas être transmis à un autre processus
+        cancel_event = self._cancel_event if isinstance(pool, ThreadPoolExecutor) else None
+        jobs = iter(jobs)
+        futures = {}
+        max_pending = self._pool_workers * MAX_PENDING_PER_WORKER
+        try:
+            while True:
+                # File bornée: une nouvelle tâche est soumise pour chaque tâche terminée
+                for file_path, size in itertools.islice(jobs, max_pending - len(futures)):
+                    future = pool.submit(_hash_job, stage, file_path, size, self.partial_size,
+                                         self.algorithm, cancel_event)
+                    futures[future] = file_path
+                if not futures:
+                    return
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = futures.pop(future)
+                    if self.is_cancelled():
+                        return
+                    try:
+                        yield future.result()
+                    except OSError:
+                        yield file_path, None, 0
+        finally:
+            # Les tâches pas encore démarrées sont abandonnées (annulation ou arrêt du générateur)
+            for future in futures:
+                future.cancel()
+
+    def _split_group(self, stage, size, paths, file_hashes):
+        """Subdivise un groupe selon les hash connus et écarte les fichiers uniques"""
+        by_hash = defaultdict(list)
+        for file_path in paths:
+            if file_path in file_hashes:
+                by_hash[file_hashes.pop(file_path)].append(file_path)
+            else:
+                # Fichier illisible
+                self.stats[stage]['eliminated'] += 1
+        for file_hash, group in by_hash.items():
+            if len(group) > 1:
+                yield size, file_hash, group
+            else:
+                self.stats[stage]['eliminated'] += 1
+
+    def _refine(self, stage, groups, pool):
+        """Subdivise chaque groupe (taille, chemins) selon le hash de l'étape
+
+        Les sous-groupes sont produits dès que tous les fichiers de leur groupe
+        ont été hachés, sans attendre la fin de l'étape.
+        """
+        file_hashes = {}
+        jobs = []
+        pending = []
+        group_of = {}
+        self.progress['phase'] = stage
+        for index, (size, paths) in enumerate(groups):
+            self.stats[stage]['candidates'] += len(paths)
+            pending.append(0)
+            for file_path in paths:
+                identity = self._identities.get(file_path)
+                cached = None
+                if self.cache is not None and identity is not None:
+                    cached = self.cache.get(identity, stage)
+                if cached is not None:
+                    file_hashes[file_path] = cached
+                else:
+                    jobs.append((file_path, size))
+                    group_of[file_path] = index
+                    pending[index] += 1
+                    self.progress['bytes_total'] += (
+                        min(size, 2 * self.partial_size) if stage == 'partial' else size
+                    )
+        self._report_progress(force=True)
+
+        # Groupes entièrement servis par le cache
+        for index, (size, paths) in enumerate(groups):
+            if pending[index] == 0:
+                yield from self._split_group(stage, size, paths, file_hashes)
+
+        # Les résultats reviennent dans l'ordre de fin et sont enregistrés au fil de l'eau
+        for file_path, file_hash, bytes_read in self._compute_hashes(stage, jobs, pool):
+            self.progress['bytes_hashed'] += bytes_read
+            self._report_progress()
+            if self.is_cancelled():
+                # Un hash interrompu ne doit ni confirmer un groupe ni entrer dans le cache
+                return
+            if file_hash is not None:
+                file_hashes[file_path] = file_hash
+                self.stats[stage]['bytes_read'] += bytes_read
+                identity = self._identities.get(file_path)
+                if self.cache is not None and identity is not None:
+                    self.cache.put(identity, file_path, stage, file_hash)
+
+            index = group_of[file_path]
+            pending[index] -= 1
+            if pending[index] == 0:
+                size, paths = groups[index]
+                yield from self._split_group(stage, size, paths, file_hashes)
+
+    def _create_pool(self, folder):
+        """Crée le pool de calcul des hash, ou None pour le mode séquentiel"""
+        workers = self.workers or default_workers(folder)
+        if workers <= 1:
+            return None
+        self._pool_workers = workers
+        if self.executor == 'process':
+            return ProcessPoolExecutor(max_workers=workers)
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def find(self, folders, on_group=None, on_progress=None):
+        """Retourne la liste des groupes de doublons trouvés dans un ou plusieurs dossiers
+
+        on_group, si fourni, est appelé avec chaque groupe dès qu'il est confirmé.
+        on_progress est appelé au plus toutes les PROGRESS_INTERVAL secondes avec un
+        dictionnaire (phase, fichiers trouvés, octets à lire et lus, débit, ETA).
+        Après cancel(), la recherche s'arrête au plus tôt et retourne les groupes déjà
+        confirmés; self.cancelled vaut alors True.
+        """
+        self._reset_stats()
+        self._identities = {}
+        self.hardlinks = {}
+        self.cancelled = False
+        self.on_progress = on_progress
+        self._reset_progress()
+        if isinstance(folders, str):
+            folders = [folders]
+        folders = [os.path.abspath(folder) for folder in folders]
+        duplicates = []
+
+        def confirm(size, file_hash, paths):
+            verified_groups = self._verify(size, paths) if self.verify else [paths]
+            for verified_paths in verified_groups:
+                group = {'size': size, 'hash': file_hash, 'paths': verified_paths,
+                         'verified': self.verify}
+                duplicates.append(group)
+                self.progress['groups'] += 1
+                if on_group is not None:
+                    on_group(group)
+
+        # Étape 1: regroupement par taille, les tailles uniques sont écartées
+        files_by_size = self.collect_files(folders)
+        size_groups = []
+        for size, paths in files_by_size.items():
+            self.stats['size']['candidates'] += len(paths)
+            if len(paths) < 2:
+                self.stats['size']['eliminated'] += len(paths)
+            elif size == 0:
+                # Les fichiers vides sont identiques sans avoir à les lire
+                confirm(0, None, paths)
+            else:
+                size_groups.append((size, paths))
+
+        pool = self._create_pool(folders[0])
+        try:
+            # Étape 2: hash partiel (début + fin) des candidats restants
+            partial_groups = []
+            for size, partial_hash, group in self._refine('partial', size_groups, pool):
+                if size <= 2 * self.partial_size:
+                    # Le hash partiel couvre déjà tout le contenu
+                    confirm(size, partial_hash, group)
+                else:
+                    partial_groups.append((size, group))
+
+            # Étape 3: hash complet uniquement pour les fichiers encore en collision
+            if not self.is_cancelled():
+                for size, full_hash, group in self._refine('full', partial_groups, pool):
+                    confirm(size, full_hash, group)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.cancelled = self.is_cancelled()
+        # L'annulation ne vaut que pour cette recherche
+        self._cancel_event.clear()
+        self.progress['phase'] = 'cancelled' if self.cancelled else 'done'
+        self._report_progress(force=True)
+
+        # Les entrées des fichiers disparus ou modifiés sont retirées du cache (pas après une
+        # annulation ni avec des filtres: les fichiers non parcourus seraient pris pour disparus)
+        if self.cache is not None and not self.cancelled:
+            filtered = self.min_size > 0 or self.include or self.exclude
+            self.cache.prune(folders, None if filtered else set(self._identities.values()))
+
+        return duplicates
+
+    def reclaim(self, group, mode='hardlink'):
+        """Remplace les doublons d'un groupe par des liens vers le premier fichier
+
+        Chaque fichier est revérifié (même identité qu'au moment du hash) avant d'être
+        remplacé. Retourne (octets récupérés, fichiers remplacés, erreurs).
+        """
+        if mode not in RECLAIM_MODES:
+            raise ValueError(f"Mode de récupération non supporté: {mode}")
+        replace = _replace_with_hardlink if mode == 'hardlink' else _replace_with_reflink
+
+        paths = group['paths']
+        if not group.get('verified'):
+            # Aucune suppression sans preuve que le contenu est identique octet par octet
+            verified_groups = self._verify(group['size'], paths)
+            if not verified_groups:
+                return 0, 0, [(paths[0], "Contenu différent à la vérification")]
+            paths = max(verified_groups, key=len)
+        reference = paths[0]
+        reclaimed = 0
+        replaced = 0
+        errors = []
+
+        try:
+            reference_stat = os.lstat(reference)
+        except OSError as e:
+            return 0, 0, [(reference, str(e))]
+        if file_identity(reference_stat) != self._identities.get(reference):
+            return 0, 0, [(reference, "Fichier modifié depuis l'analyse")]
+
+        for path in paths[1:]:
+            try:
+                target_stat = os.lstat(path)
+                if file_identity(target_stat) != self._identities.get(path):
+                    errors.append((path, "Fichier modifié depuis l'analyse"))
+                    continue
+                if target_stat.st_dev != reference_stat.st_dev:
+                    errors.append((path, "Fichier sur un autre volume"))
+                    continue
+                if target_stat.st_ino == reference_stat.st_ino:
+                    continue
+
+                replace(reference, path)
+                replaced += 1
+                # L'espace n'est libéré que si c'était le dernier lien vers ces données
+                if target_stat.st_nlink <= 1:
+                    reclaimed += allocated_size(target_stat)
+            except OSError as e:
+                errors.append((path, e.strerror or str(e)))
+
+        return reclaimed, replaced, errors
+
+
+def parse_size(text):
+    """Convertit une taille lisible (ex: 512K, 10M, 1G) en octets"""
+    units = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    text = text.strip().upper().rstrip('B')
+    unit = text[-1:] if text[-1:] in units else ''
+    number = text[:-1] if unit else text
+    try:
+        return int(float(number) * units[unit])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Taille invalide: {text}")
+
+
+def main():
+    """Recherche de doublons en ligne de commande, sans interface graphique"""
+    parser = argparse.ArgumentParser(
+        description="Recherche les fichiers doublons et écrit les groupes sur la sortie standard")
+    parser.add_argument('roots', nargs='+', help="Dossiers à analyser")
+    parser.add_argument('--min-size', type=parse_size, default=1,
+                        help="Taille minimale des fichiers (ex: 1M), 1 octet par défaut")
+    parser.add_argument('--include', action='append', default=[], metavar='MOTIF',
+                        help="Motif de noms de fichiers à inclure (répétable), ex: '*.jpg'")
+    parser.add_argument('--exclude', action='append', default=[], metavar='MOTIF',
+                        help="Motif de noms ou chemins à exclure (répétable), ex: '.git'")
+    parser.add_argument('--algorithm', choices=HASH_ALGORITHMS, default=DEFAULT_ALGORITHM)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Nombre de workers (par défaut: selon la machine)")
+    parser.add_argument('--executor', choices=EXECUTORS, default=DEFAULT_EXECUTOR)
+    parser.add_argument('--no-cache', action='store_true', help="Ne pas utiliser le cache de hash")
+    parser.add_argument('--verify', action='store_true',
+                        help="Vérifier chaque groupe octet par octet (mmap) avant de l'écrire")
+    parser.add_argument('--format', choices=('ndjson', 'json'), default='ndjson',
+                        help="ndjson: un groupe par ligne dès sa confirmation; json: un document final")
+    parser.add_argument('--progress', action='store_true',
+                        help="Afficher la progression (fichiers, octets, débit, ETA) sur la sortie d'erreur")
+    args = parser.parse_args()
+
+    for root in args.roots:
+        if not os.path.isdir(root):
+            parser.error(f"Le dossier {root} n'existe pas")
+
+    cache = None
+    if not args.no_cache:
+        from hash_cache import HashCache
+        cache = HashCache(args.algorithm, PARTIAL_HASH_SIZE)
+
+    def write_group(group):
+        record = dict(group, reclaimable=group['size'] * (len(group['paths']) - 1))
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    def write_progress(progress):
+        eta = f"{progress['eta']:.0f} s" if progress['eta'] is not None else "?"
+        sys.stderr.write(f"\r[{progress['phase']}] {progress['files_discovered']} fichiers, "
+                         f"{progress['bytes_hashed'] / 1024 ** 2:.1f}/{progress['bytes_total'] / 1024 ** 2:.1f} MB, "
+                         f"{progress['rate'] / 1024 ** 2:.1f} MB/s, ETA {eta}   ")
+        sys.stderr.flush()
+
+    finder = DuplicateFinder(args.algorithm, cache=cache, workers=args.workers,
+                             executor=args.executor, min_size=args.min_size,
+                             include=args.include, exclude=args.exclude, verify=args.verify)
+
+    # Ctrl+C arrête proprement l'analyse: les groupes déjà confirmés restent écrits
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: finder.cancel())
+    try:
+        duplicates = finder.find(args.roots, on_group=write_group if args.format == 'ndjson' else None,
+                                 on_progress=write_progress if args.progress else None)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        if cache is not None:
+            cache.close()
+    if args.progress:
+        sys.stderr.write("\n")
+
+    if args.format == 'json':
+        json.dump({
+            'roots': [os.path.abspath(root) for root in args.roots],
+            'cancelled': finder.cancelled,
+            'stats': finder.stats,
+            'groups': [dict(group, reclaimable=group['size'] * (len(group['paths']) - 1))
+                       for group in duplicates]
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    else:
+        # Le résumé va sur la sortie d'erreur pour ne pas mélanger les formats
+        reclaimable = sum(group['size'] * (len(group['paths']) - 1) for group in duplicates)
+        sys.stderr.write(f"{len(duplicates)} groupes de doublons, {reclaimable} octets récupérables\n")
+        if args.verify:
+            sys.stderr.write(f"Vérification: {finder.stats['verify']['bytes_read']} octets comparés, "
+                             f"{finder.verify_throughput() / 1024 ** 2:.1f} MB/s\n")
+        if finder.cancelled:
+            sys.stderr.write("Analyse interrompue: résultats partiels\n")
+    return 130 if finder.cancelled else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,10 +8,10 @@ Description: Range automatiquement les fichiers d'un dossier dans des sous-dossi
 """
 
 import os
-import shutil
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from pathlib import Path
+from organize_engine import DestinationNames, move_to_folder
 
 class FileOrganizer:
     def __init__(self):
@@ -27,6 +27,9 @@ class FileOrganizer:
         # Dossier par défaut (Téléchargements)
         self.default_folder = str(Path.home() / "Downloads")
         
+        # Noms déjà présents dans les dossiers de destination (un listing par dossier)
+        self.destination_names = DestinationNames()
+        
         # Interface Tkinter
         self.root = tk.Tk()
         self.root.withdraw()  # Cacher la fenêtre principale
@@ -63,17 +66,9 @@ class FileOrganizer:
         """Déplace un fichier vers le dossier de destination"""
         try:
             file_name = os.path.basename(source_path)
-            destination_path = os.path.join(destination_folder, file_name)
-            
-            # Gérer les conflits de noms
-            counter = 1
-            original_destination = destination_path
-            while os.path.exists(destination_path):
-                name, ext = os.path.splitext(original_destination)
-                destination_path = f"{name}_{counter}{ext}"
-                counter += 1
             
-            shutil.move(source_path, destination_path)
+            # Conflits de noms résolus sans stat par suffixe, destination jamais écrasée
+            move_to_folder(source_path, destination_folder, file_name, self.destination_names)
             print(f"Fichier déplacé: {file_name} -> {destination_folder}")
             return True
             
@@ -7,12 +7,20 @@ Description: Interface graphique moderne pour ranger automatiquement les fichier
 """
 
 import os
-import shutil
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from pathlib import Path
 import threading
 from datetime import datetime
+from folder_watcher import FolderWatcher
+from organize_engine import organize_records, move_to_folder, walk_tree_files
+from content_sniffer import ContentSniffer, content_overrides
+from move_journal import MoveJournal, read_journal, resume_moves, undo_moves, unfinished_journal
+from app_data import get_data_dir
+
+# Journal des déplacements du dernier rangement (dossier de données de l'application),
+# distinct de celui de la suite pour que les deux applications ne se l'écrasent pas
+ORGANIZE_JOURNAL_FILENAME = "file_organizer_journal.jsonl"
 
 class FileOrganizerGUI:
     def __init__(self):
@@ -28,7 +36,19 @@ class FileOrganizerGUI:
         # Variables
         self.current_folder = str(Path.home() / "Downloads")
         self.files_data = []
+        # Élément de la liste -> enregistrement du fichier
+        self.file_index = {}
         self.selected_files = set()
+        self.watcher = None
+        # Reprise ou annulation d'un rangement en cours (surveillance suspendue)
+        self.replaying_journal = False
+        # Rangement de la sélection en cours (un seul à la fois: ils partagent le journal)
+        self.organizing = False
+        # Types détectés d'après le contenu, conservés d'un scan à l'autre
+        self.sniffer = ContentSniffer()
+        self.sniff_content = False
+        # Numéro du dernier scan lancé: les résultats d'un scan dépassé sont ignorés
+        self.scan_generation = 0
         
         # Interface principale
         self.root = tk.Tk()
@@ -76,6 +96,21 @@ class FileOrganizerGUI:
         ttk.Button(folder_frame, text="Scanner", 
                   command=self.scan_folder).grid(row=0, column=3, padx=(5, 0))
         
+        # Rangement automatique des nouveaux fichiers
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Surveiller", variable=self.watch_var,
+                       command=self.toggle_watch).grid(row=0, column=4, padx=(10, 0))
+        
+        # Classement d'après le contenu (fichiers sans extension ou mal nommés)
+        self.sniff_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Analyser le contenu", variable=self.sniff_var,
+                       command=self.toggle_sniff).grid(row=0, column=5, padx=(10, 0))
+        
+        # Sous-dossiers inclus: l'arborescence est rangée à plat dans les dossiers de catégorie
+        self.recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Récursif", variable=self.recursive_var,
+                       command=self.scan_folder).grid(row=0, column=6, padx=(10, 0))
+        
         # Section liste des fichiers
         files_frame = ttk.LabelFrame(main_frame, text="Fichiers trouvés", padding="10")
         files_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -147,6 +182,9 @@ class FileOrganizerGUI:
         ttk.Button(control_frame, text="Organiser les fichiers sélectionnés", 
                   command=self.organize_files).pack(side=tk.RIGHT, padx=(5, 0))
         
+        ttk.Button(control_frame, text="Annuler le dernier rangement", 
+                  command=self.undo_last_organize).pack(side=tk.RIGHT, padx=(5, 0))
+        
         # Section résultats
         self.results_frame = ttk.LabelFrame(main_frame, text="Résultats", padding="10")
         self.results_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E))
@@ -162,12 +200,21 @@ class FileOrganizerGUI:
         # Scanner le dossier par défaut
         self.scan_folder()
         
-    def get_file_category(self, file_path):
-        """Détermine la catégorie d'un fichier"""
+        # Rangement interrompu lors de la dernière session
+        self.root.after(500, self.check_interrupted_organize)
+        
+    def get_file_category(self, file_path, detected_extension=None):
+        """Détermine la catégorie d'un fichier (detected_extension: type reconnu d'après son contenu)"""
         extension = Path(file_path).suffix.lower()
-        for category, extensions in self.categories.items():
-            if extension in extensions:
-                return category
+        candidates = [extension]
+        # Le type détecté ne l'emporte que si l'extension manque ou est contredite par le
+        # contenu (pas quand il n'en est que le conteneur: zip pour un .xlsx...)
+        if content_overrides(extension, detected_extension):
+            candidates.insert(0, detected_extension)
+        for candidate in candidates:
+            for category, extensions in self.categories.items():
+                if candidate in extensions:
+                    return category
         return 'Autres'
     
     def format_file_size(self, size_bytes):
@@ -191,6 +238,10 @@ class FileOrganizerGUI:
             self.current_folder = folder
             self.folder_var.set(folder)
             self.scan_folder()
+            if self.watch_var.get():
+                # La surveillance suit le dossier sélectionné
+                self.stop_watch()
+                self.start_watch()
     
     def scan_folder(self):
         """Scanne le dossier sélectionné"""
@@ -203,42 +254,136 @@ class FileOrganizerGUI:
             self.tree.delete(item)
         
         self.files_data = []
+        self.file_index = {}
         self.selected_files = set()
         
+        # Parcours et lecture des en-têtes hors du thread de l'interface; seul le
+        # dernier scan lancé est affiché
+        self.scan_generation += 1
+        thread = threading.Thread(target=self._scan_folder_thread,
+                                  args=(self.scan_generation, self.current_folder,
+                                        self.recursive_var.get(), self.sniff_content))
+        thread.daemon = True
+        thread.start()
+    
+    def _scan_folder_thread(self, generation, folder, recursive, sniff_content):
+        """Thread du scan: liste les fichiers et détecte leur type"""
         try:
-            files = [f for f in os.listdir(self.current_folder) 
-                    if os.path.isfile(os.path.join(self.current_folder, f))]
+            if recursive:
+                # Dossiers de catégorie exclus: les fichiers déjà rangés ne sont pas repris
+                files = list(walk_tree_files(folder, set(self.categories) | {'Autres'}))
+            else:
+                with os.scandir(folder) as entries:
+                    files = [(entry.path, entry.stat()) for entry in entries if entry.is_file()]
+            # Lecture des premiers octets seulement, en parallèle et jamais deux fois par fichier
+            detected = self.sniffer.sniff_many(files) if sniff_content else {}
+            self.root.after(0, self._show_scan_results, generation, folder, files, detected)
+        except Exception as e:
+            error_msg = f"Erreur lors du scan: {str(e)}"
+            self.root.after(0, self._show_scan_error, generation, error_msg)
+    
+    def _show_scan_error(self, generation, error_msg):
+        """Signale l'échec du scan s'il est encore le dernier lancé"""
+        if generation == self.scan_generation:
+            messagebox.showerror("Erreur", error_msg)
+    
+    def _show_scan_results(self, generation, folder, files, detected):
+        """Affiche les fichiers trouvés par le scan (thread principal)"""
+        if generation != self.scan_generation:
+            return
+        
+        for file_path, file_stat in files:
+            filename = os.path.basename(file_path)
+            file_size = file_stat.st_size
+            category = self.get_file_category(file_path, detected.get(file_path))
+            destination = os.path.join(folder, category)
             
-            for filename in files:
-                file_path = os.path.join(self.current_folder, filename)
-                file_size = os.path.getsize(file_path)
-                category = self.get_file_category(file_path)
-                destination = os.path.join(self.current_folder, category)
-                
-                file_data = {
-                    'filename': filename,
-                    'path': file_path,
-                    'size': file_size,
-                    'category': category,
-                    'destination': destination
-                }
-                
-                self.files_data.append(file_data)
-                
-                # Ajouter à la treeview
-                item_id = self.tree.insert('', 'end', values=(
-                    '☐',  # Non sélectionné par défaut
-                    filename,
-                    self.format_file_size(file_size),
-                    category,
-                    category
-                ))
-                
-            self.update_count_label()
-            self.log_message(f"Scan terminé: {len(files)} fichiers trouvés dans {self.current_folder}")
+            file_data = {
+                'filename': filename,
+                'path': file_path,
+                'size': file_size,
+                'mtime_ns': file_stat.st_mtime_ns,
+                'category': category,
+                'destination': destination
+            }
             
-        except Exception as e:
-            messagebox.showerror("Erreur", f"Erreur lors du scan: {str(e)}")
+            self.files_data.append(file_data)
+            
+            # Ajouter à la treeview
+            item_id = self.tree.insert('', 'end', values=(
+                '☐',  # Non sélectionné par défaut
+                os.path.relpath(file_path, folder),
+                self.format_file_size(file_size),
+                category,
+                category
+            ))
+            file_data['item'] = item_id
+            self.file_index[item_id] = file_data
+            
+        self.update_count_label()
+        message = f"Scan terminé: {len(files)} fichiers trouvés dans {folder}"
+        if self.sniff_content:
+            reclassified = sum(1 for path, extension in detected.items()
+                               if extension and self.get_file_category(path, extension) != self.get_file_category(path))
+            message += f" ({reclassified} classés d'après leur contenu)"
+        self.log_message(message)
+    
+    def toggle_sniff(self):
+        """Active ou désactive le classement d'après le contenu des fichiers"""
+        # Copie lue aussi par le thread de surveillance (pas d'accès Tk hors du thread principal)
+        self.sniff_content = self.sniff_var.get()
+        self.scan_folder()
+    
+    def toggle_watch(self):
+        """Active ou désactive le rangement automatique du dossier"""
+        if self.watch_var.get():
+            self.start_watch()
+        else:
+            self.stop_watch()
+    
+    def start_watch(self):
+        """Range automatiquement les nouveaux fichiers du dossier courant"""
+        if self.replaying_journal:
+            # Démarrée à la fin de la reprise ou de l'annulation en cours
+            return
+        try:
+            self.watcher = FolderWatcher(self.current_folder, self._organize_watched_file,
+                                         on_error=self._on_watch_error)
+            self.watcher.start()
+        except OSError as e:
+            self.watcher = None
+            self.watch_var.set(False)
+            messagebox.showerror("Erreur", f"Impossible de surveiller le dossier: {str(e)}")
+            return
+        self.log_message(f"Surveillance active ({self.watcher.backend}): {self.current_folder}")
+    
+    def stop_watch(self):
+        """Arrête le rangement automatique"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.log_message("Surveillance arrêtée")
+    
+    def _on_watch_error(self, error):
+        """Erreur de surveillance (thread de surveillance)"""
+        if self.watcher is not None and self.watcher.stopped:
+            # Dossier supprimé: la surveillance est arrêtée depuis le thread de l'interface
+            self.root.after(0, self.watch_var.set, False)
+            self.root.after(0, self.stop_watch)
+        message = f"Surveillance: {str(error)}"
+        self.root.after(0, self.log_message, message)
+    
+    def _organize_watched_file(self, file_path):
+        """Range un nouveau fichier selon sa catégorie (thread de surveillance)"""
+        filename = os.path.basename(file_path)
+        detected = self.sniffer.sniff(file_path) if self.sniff_content else None
+        category = self.get_file_category(file_path, detected)
+        destination = os.path.join(os.path.dirname(file_path), category)
+        os.makedirs(destination, exist_ok=True)
+        
+        move_to_folder(file_path, destination, filename)
+        message = f"✓ {filename} → {category} (automatique)"
+        self.root.after(0, self.log_message, message)
     
     def on_tree_click(self, event):
         """Gère les clics sur la treeview"""
@@ -302,6 +447,22 @@ class FileOrganizerGUI:
             messagebox.showwarning("Attention", "Aucun fichier sélectionné.")
             return
         
+        if self.organizing or self.replaying_journal:
+            messagebox.showwarning("Attention", "Un rangement est déjà en cours.")
+            return
+        
+        # Un rangement interrompu doit d'abord être terminé ou annulé: son journal serait écrasé
+        journal = unfinished_journal(self._organize_journal_path())
+        if journal is not None:
+            if messagebox.askyesno(
+                "Rangement interrompu",
+                f"Le rangement de {journal['folder']} n'a été ni terminé ni annulé.\n\n"
+                "Voulez-vous le terminer maintenant?\n"
+                "(Sinon, annulez-le avec « Annuler le dernier rangement » avant d'en commencer un autre.)"
+            ):
+                self._start_journal_replay(resume_moves, "Reprise")
+            return
+        
         # Confirmation
         result = messagebox.askyesno(
             "Confirmation",
@@ -312,6 +473,7 @@ class FileOrganizerGUI:
             return
         
         # Lancer l'organisation dans un thread séparé
+        self.organizing = True
         thread = threading.Thread(target=self._organize_files_thread)
         thread.daemon = True
         thread.start()
@@ -319,71 +481,174 @@ class FileOrganizerGUI:
     def _organize_files_thread(self):
         """Thread pour organiser les fichiers"""
         try:
-            selected_items = list(self.selected_files)
-            total_files = len(selected_items)
-            moved_count = 0
-            error_count = 0
+            # Enregistrements pris dans l'index des éléments: aucune recherche dans la liste
+            records = [self.file_index[item] for item in list(self.selected_files) if item in self.file_index]
+            total_files = len(records)
+            moved_items = []
+            log_lines = []
+            
+            self.root.after(0, self._show_organize_progress, 0, total_files, ["Organisation en cours..."])
+            
+            def on_moved(record, destination_path):
+                moved_items.append(record['item'])
+                log_lines.append(f"✓ {record['filename']} → {record['category']}")
+            
+            def on_error(record, error):
+                log_lines.append(f"✗ Erreur avec {record['filename']}: {str(error)}")
             
-            self.progress_var.set(0)
-            self.progress_label.config(text="Organisation en cours...")
+            def on_progress(progress):
+                # Journal et progression transmis par lots à l'interface
+                lines = log_lines[:]
+                del log_lines[:]
+                self.root.after(0, self._show_organize_progress,
+                                progress['moved'] + progress['errors'], total_files, lines,
+                                self._format_organize_rate(progress))
             
-            for i, item in enumerate(selected_items):
-                # Trouver les données du fichier
-                filename = self.tree.set(item, 'filename')
-                file_data = next((f for f in self.files_data if f['filename'] == filename), None)
-                
-                if file_data:
-                    try:
-                        # Créer le dossier de destination
-                        self.create_folder_if_not_exists(file_data['destination'])
-                        
-                        # Déplacer le fichier
-                        destination_path = os.path.join(file_data['destination'], filename)
-                        
-                        # Gérer les conflits de noms
-                        counter = 1
-                        original_destination = destination_path
-                        while os.path.exists(destination_path):
-                            name, ext = os.path.splitext(original_destination)
-                            destination_path = f"{name}_{counter}{ext}"
-                            counter += 1
-                        
-                        shutil.move(file_data['path'], destination_path)
-                        moved_count += 1
-                        
-                        self.log_message(f"✓ {filename} → {file_data['category']}")
-                        
-                        # Supprimer de la liste
-                        self.tree.delete(item)
-                        self.selected_files.remove(item)
-                        
-                    except Exception as e:
-                        error_count += 1
-                        self.log_message(f"✗ Erreur avec {filename}: {str(e)}")
-                
-                # Mettre à jour la progression
-                progress = ((i + 1) / total_files) * 100
-                self.progress_var.set(progress)
-                self.progress_label.config(text=f"Traitement: {i + 1}/{total_files}")
+            # Chaque lot de déplacements est inscrit au journal avant d'être exécuté
+            journal = MoveJournal(self._organize_journal_path())
+            journal.start(self.current_folder)
+            try:
+                stats = organize_records(records, on_moved, on_error, on_progress, journal=journal)
+                journal.finish(stats)
+            finally:
+                journal.close()
             
-            # Résumé final
-            self.progress_var.set(100)
-            self.progress_label.config(text="Terminé")
-            self.log_message(f"\n=== RÉSUMÉ ===")
-            self.log_message(f"Fichiers déplacés: {moved_count}")
-            self.log_message(f"Erreurs: {error_count}")
+            summary = ["", "=== RÉSUMÉ ===",
+                       f"Fichiers déplacés: {stats['moved']}",
+                       f"Erreurs: {stats['errors']}",
+                       f"Dossiers créés: {stats['folders_created']}",
+                       f"Durée: {stats['elapsed']:.1f} s ({self._format_organize_rate(stats)})"]
+            self.root.after(0, self._finish_organize, moved_items, summary)
+            
+        except Exception as e:
+            self.root.after(0, self.log_message, f"Erreur générale: {str(e)}")
+        finally:
+            self.root.after(0, self._end_organize)
+    
+    def _end_organize(self):
+        """Fin du rangement: un autre peut être lancé"""
+        self.organizing = False
+    
+    def _format_organize_rate(self, stats):
+        """Débit d'un rangement en fichiers/s et octets/s"""
+        return f"{stats['rate']:.0f} fichiers/s, {self.format_file_size(int(stats['byte_rate']))}/s"
+    
+    def _organize_journal_path(self):
+        return os.path.join(get_data_dir(), ORGANIZE_JOURNAL_FILENAME)
+    
+    def check_interrupted_organize(self):
+        """Propose de terminer un rangement interrompu (arrêt brutal, fermeture)"""
+        journal = read_journal(self._organize_journal_path())
+        if journal is None or journal['complete'] or journal['undone']:
+            return
+        
+        resume = messagebox.askyesno(
+            "Rangement interrompu",
+            f"Le rangement de {journal['folder']} a été interrompu "
+            f"({len(journal['entries'])} déplacements inscrits au journal).\n\n"
+            "Voulez-vous le terminer?\n"
+            "(Il peut aussi être annulé avec « Annuler le dernier rangement ».)"
+        )
+        if resume:
+            self._start_journal_replay(resume_moves, "Reprise")
+    
+    def undo_last_organize(self):
+        """Remet les fichiers du dernier rangement à leur place d'origine"""
+        if self.organizing or self.replaying_journal:
+            messagebox.showwarning("Attention", "Attendez la fin du rangement en cours.")
+            return
+        journal = read_journal(self._organize_journal_path())
+        if journal is None or not journal['entries']:
+            messagebox.showinfo("Information", "Aucun rangement à annuler.")
+            return
+        if journal['undone']:
+            messagebox.showinfo("Information", "Le dernier rangement a déjà été annulé.")
+            return
+        
+        result = messagebox.askyesno(
+            "Confirmation",
+            f"Voulez-vous annuler le rangement de {journal['folder']} "
+            f"({len(journal['entries'])} fichiers déplacés)?"
+        )
+        if result:
+            self._start_journal_replay(undo_moves, "Annulation")
+    
+    def _start_journal_replay(self, replay, label):
+        """Lance la reprise ou l'annulation, surveillance suspendue jusqu'à la fin
+
+        Sinon la surveillance rangerait aussitôt les fichiers remis dans le dossier, sans
+        journal, et l'annulation serait défaite.
+        """
+        self.replaying_journal = True
+        self.stop_watch()
+        thread = threading.Thread(target=self._replay_journal_thread, args=(replay, label))
+        thread.daemon = True
+        thread.start()
+    
+    def _end_journal_replay(self):
+        """Fin de la reprise ou de l'annulation: la surveillance reprend si elle est cochée"""
+        self.replaying_journal = False
+        if self.watch_var.get():
+            # Les fichiers déjà présents au démarrage ne sont pas rangés
+            self.start_watch()
+    
+    def _replay_journal_thread(self, replay, label):
+        """Thread de reprise ou d'annulation d'un rangement à partir du journal"""
+        try:
+            def on_progress(progress):
+                done = progress['restored'] + progress['moved'] + progress['skipped'] + progress['errors']
+                self.root.after(0, self._show_organize_progress, done, progress['total'], [],
+                                f"{progress['rate']:.0f} fichiers/s")
             
-            # Mettre à jour le compteur
-            self.root.after(0, self.update_count_label)
+            stats = replay(self._organize_journal_path(), on_progress)
+            if stats is None:
+                self.root.after(0, self.log_message, f"{label}: journal illisible")
+                return
             
-            # Réinitialiser la progression après 3 secondes
-            self.root.after(3000, lambda: [
-                self.progress_var.set(0),
-                self.progress_label.config(text="Prêt")
-            ])
+            summary = ["", f"=== {label.upper()} DU RANGEMENT ===",
+                       f"Fichiers remis en place: {stats['restored']}" if replay is undo_moves
+                       else f"Fichiers déplacés: {stats['moved']}",
+                       f"Fichiers ignorés (absents ou modifiés): {stats['skipped']}",
+                       f"Erreurs: {stats['errors']}",
+                       f"Durée: {stats['elapsed']:.1f} s ({stats['rate']:.0f} fichiers/s)"]
+            self.root.after(0, self._finish_organize, [], summary)
+            self.root.after(0, self.scan_folder)
             
         except Exception as e:
-            self.log_message(f"Erreur générale: {str(e)}")
+            self.root.after(0, self.log_message, f"Erreur générale: {str(e)}")
+        finally:
+            self.root.after(0, self._end_journal_replay)
+    
+    def _show_organize_progress(self, done, total, lines, rate=""):
+        """Met à jour la progression et ajoute un lot de lignes au journal"""
+        self.progress_var.set(done / total * 100 if total else 100)
+        self.progress_label.config(text=f"Traitement: {done}/{total}" + (f" ({rate})" if rate else ""))
+        if lines:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            self.results_text.insert(tk.END, "".join(f"[{timestamp}] {line}\n" for line in lines))
+            self.results_text.see(tk.END)
+    
+    def _finish_organize(self, moved_items, summary):
+        """Retire les fichiers rangés de la liste en une fois"""
+        if moved_items:
+            self.tree.delete(*moved_items)
+        moved = set(moved_items)
+        self.selected_files -= moved
+        for item in moved_items:
+            self.file_index.pop(item, None)
+        self.files_data = [record for record in self.files_data if record['item'] not in moved]
+        
+        self.progress_var.set(100)
+        self.progress_label.config(text="Terminé")
+        for line in summary:
+            self.log_message(line)
+        self.update_count_label()
+        
+        # Réinitialiser la progression après 3 secondes
+        self.root.after(3000, lambda: [
+            self.progress_var.set(0),
+            self.progress_label.config(text="Prêt")
+        ])
     
     def run(self):
         """Lance l'application"""
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Surveillance d'un dossier pour le rangement automatique
+Auteur: Zx
+Description: Détection des nouveaux fichiers d'un dossier par inotify (Linux, via ctypes)
+             ou par scrutation périodique ailleurs; un fichier n'est signalé qu'une fois
+             son écriture terminée (aucune modification pendant le délai d'attente)
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import stat
+import struct
+import threading
+import time
+
+# Délai sans modification (secondes) avant de considérer un fichier comme terminé
+DEFAULT_DEBOUNCE = 2.0
+
+# Intervalle de scrutation (secondes) quand inotify n'est pas disponible
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Fichiers temporaires des téléchargements en cours: renommés à la fin, jamais rangés
+PARTIAL_SUFFIXES = ('.part', '.partial', '.crdownload', '.download', '.tmp', '.!qb')
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# En-tête de struct inotify_event: wd, mask, cookie, len (suivi du nom, complété par des \0)
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Taille du tampon de lecture des événements
+_READ_SIZE = 64 * 1024
+
+
+def _load_inotify():
+    """Fonctions inotify de la libc, ou None si indisponibles"""
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    init.argtypes = [ctypes.c_int]
+    init.restype = ctypes.c_int
+    add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    add_watch.restype = ctypes.c_int
+    return init, add_watch
+
+
+_INOTIFY = _load_inotify()
+
+
+def inotify_available():
+    """Indique si la surveillance par événements (inotify) est disponible"""
+    return _INOTIFY is not None
+
+
+def is_partial_download(name):
+    """Nom d'un fichier temporaire ou caché qui ne doit pas être rangé"""
+    return name.startswith('.') or name.lower().endswith(PARTIAL_SUFFIXES)
+
+
+def _file_signature(path):
+    """(taille, mtime_ns) d'un fichier ordinaire, ou None (dossier, lien, fichier disparu)"""
+    try:
+        file_stat = os.lstat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return file_stat.st_size, file_stat.st_mtime_ns
+
+
+class FolderWatcher:
+    """Signale les nouveaux fichiers d'un dossier (non récursif) une fois leur écriture terminée
+
+    on_file(chemin) est appelé depuis le thread de surveillance pour chaque fichier prêt;
+    on_error(exception) reçoit les erreurs (dossier supprimé, callback en échec). Les
+    fichiers présents au démarrage ne sont pas signalés, même s'ils sont modifiés
+    ensuite: seul un nom créé ou déplacé dans le dossier après start() est surveillé.
+    """
+
+    def __init__(self, folder, on_file, on_error=None, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=None):
+        self.folder = folder
+        self.on_file = on_file
+        self.on_error = on_error
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        if use_inotify is None:
+            use_inotify = inotify_available()
+        self.backend = 'inotify' if use_inotify and inotify_available() else 'polling'
+
+        # Fichiers en attente: nom -> (échéance, signature au moment du dernier changement)
+        self.pending = {}
+        # Noms des fichiers présents au démarrage (retirés dès que le fichier disparaît)
+        self.existing = set()
+        self._initial = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._wake_read = None
+        self._wake_write = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopped(self):
+        """Arrêt demandé ou dossier disparu"""
+        return self._stop_event.is_set()
+
+    def start(self):
+        """Démarre la surveillance dans un thread dédié"""
+        if self.running:
+            return
+        if not os.path.isdir(self.folder):
+            raise NotADirectoryError(self.folder)
+        self._stop_event.clear()
+        self.pending = {}
+        if self.backend == 'inotify':
+            self._open_inotify()
+            target = self._inotify_loop
+        else:
+            target = self._polling_loop
+        # Listing pris après l'ouverture d'inotify: un fichier créé entre les deux est
+        # à la fois listé et signalé par IN_CREATE, qui le compte comme nouveau
+        try:
+            self._initial = self._listing()
+        except OSError:
+            for fd in (self._fd, self._wake_read, self._wake_write):
+                if fd is not None:
+                    os.close(fd)
+            self._fd = self._wake_read = self._wake_write = None
+            raise
+        self.existing = set(self._initial)
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête la surveillance (les fichiers encore en attente sont abandonnés)"""
+        self._stop_event.set()
+        if self._wake_write is not None:
+            try:
+                os.write(self._wake_write, b'\0')
+            except OSError:
+                pass
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        # Le tube n'est fermé qu'une fois le thread terminé (il peut encore l'attendre)
+        for fd in (self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._wake_read = self._wake_write = None
+
+    def _open_inotify(self):
+        init, add_watch = _INOTIFY
+        fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if add_watch(fd, os.fsencode(self.folder), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno), self.folder)
+        self._fd = fd
+        # Tube de réveil: stop() interrompt l'attente bloquante de select
+        self._wake_read, self._wake_write = os.pipe()
+
+    def _touch(self, name, now):
+        """(Ré)arme l'attente d'un fichier qui vient d'apparaître ou de changer"""
+        if is_partial_download(name) or name in self.existing:
+            return
+        signature = _file_signature(os.path.join(self.folder, name))
+        if signature is None:
+            self.pending.pop(name, None)
+            return
+        self.pending[name] = (now + self.debounce, signature)
+
+    def _timeout(self, now):
+        """Temps avant la prochaine échéance, None si rien n'est en attente (attente infinie)"""
+        if not self.pending:
+            return None
+        return max(0.0, min(deadline for deadline, _ in self.pending.values()) - now)
+
+    def _flush(self, now):
+        """Signale les fichiers dont l'échéance est passée et qui n'ont pas changé depuis"""
+        for name, (deadline, signature) in list(self.pending.items()):
+            if deadline > now or self._stop_event.is_set():
+                continue
+            current = _file_signature(os.path.join(self.folder, name))
+            if current is None:
+                del self.pending[name]
+            elif current != signature:
+                # Écrit sans événement visible (scrutation, ou mtime ajusté): nouvelle attente
+                self.pending[name] = (now + self.debounce, current)
+            else:
+                del self.pending[name]
+                self._dispatch(os.path.join(self.folder, name))
+
+    def _dispatch(self, path):
+        try:
+            self.on_file(path)
+        except Exception as e:
+            self._report(e)
+
+    def _report(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _folder_lost(self):
+        """Le dossier surveillé a disparu: la surveillance s'arrête d'elle-même"""
+        self._stop_event.set()
+        self._report(FileNotFoundError(f"Dossier surveillé supprimé ou déplacé: {self.folder}"))
+
+    def _rescan(self, now):
+        """Après un débordement de la file d'événements: reprend les fichiers apparus depuis le démarrage"""
+        try:
+            listing = self._listing()
+        except OSError as e:
+            self._report(e)
+            return
+        self.existing &= listing.keys()
+        for name in listing:
+            self._touch(name, now)
+
+    def _inotify_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                # Aucun réveil tant que rien ne se passe: pas de consommation CPU au repos
+                readable, _, _ = select.select([self._fd, self._wake_read], [], [],
+                                               self._timeout(time.monotonic()))
+                if self._stop_event.is_set():
+                    break
+                now = time.monotonic()
+                if self._fd in readable:
+                    if not self._read_events(now):
+                        break
+                self._flush(now)
+        except Exception as e:
+            self._report(e)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read_events(self, now):
+        """Traite les événements disponibles; retourne False si le dossier a disparu"""
+        try:
+            buffer = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return True
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self._rescan(now)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self._folder_lost()
+                return False
+            elif not name or mask & IN_ISDIR:
+                continue
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.pending.pop(name, None)
+                self.existing.discard(name)
+            else:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Nouveau fichier, y compris sous le nom d'un fichier présent au démarrage
+                    self.existing.discard(name)
+                self._touch(name, now)
+        return True
+
+    def _listing(self):
+        """{nom: (taille, mtime_ns)} des fichiers ordinaires du dossier"""
+        listing = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        listing[entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return listing
+
+    def _polling_loop(self):
+        try:
+            previous = self._initial
+            while True:
+                now = time.monotonic()
+                timeout = self._timeout(now)
+                if timeout is None or timeout > self.poll_interval:
+                    timeout = self.poll_interval
+                if self._stop_event.wait(timeout):
+                    break
+                now = time.monotonic()
+                try:
+                    listing = self._listing()
+                except FileNotFoundError:
+                    self._folder_lost()
+                    break
+                # Un fichier présent au démarrage qui disparaît libère son nom
+                self.existing &= listing.keys()
+                for name, signature in listing.items():
+                    if previous.get(name) != signature:
+                        self._touch(name, now)
+                for name in list(self.pending):
+                    if name not in listing:
+                        del self.pending[name]
+                previous = listing
+                self._flush(now)
+        except Exception as e:
+            self._report(e)
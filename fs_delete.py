@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suppression parallèle d'arborescences
+Auteur: Zx
+Description: Moteur de suppression des nettoyeurs: unlink/rmdir relatifs au descripteur
+             du dossier parent (dir_fd), fichiers d'un même dossier supprimés par lots en
+             parallèle et dossiers vidés retirés de bas en haut sans nouveau listing
+"""
+
+import gzip
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fs_walker import DEFAULT_WORKERS, scan_tree
+
+# Nombre de fichiers d'un même dossier supprimés par tâche
+BATCH_SIZE = 512
+
+# Nombre maximal de descripteurs de dossiers ouverts en même temps; au-delà les
+# opérations se font par chemin complet
+MAX_OPEN_DIRS = 256
+
+# Intervalle minimal (secondes) entre deux notifications de progression
+PROGRESS_INTERVAL = 0.25
+
+# Version du format des plans de nettoyage enregistrés
+PLAN_VERSION = 1
+
+# Champs de date utilisables par les règles de conservation
+AGE_FIELDS = ('mtime', 'atime')
+
+# Opérations relatives à un descripteur de dossier (absentes sous Windows)
+DIR_FD_SUPPORTED = (os.open in os.supports_dir_fd and os.unlink in os.supports_dir_fd and
+                    os.rmdir in os.supports_dir_fd and os.scandir in os.supports_fd)
+
+# O_NOFOLLOW: un sous-dossier remplacé par un lien symbolique n'est jamais suivi; les
+# racines, qui peuvent être des liens (cache ou profil déplacé), sont résolues avant
+_OPEN_FLAGS = (os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0) |
+               getattr(os, 'O_CLOEXEC', 0))
+
+
+class RetentionPolicy:
+    """Règles de conservation d'un nettoyage, évaluées dossier par dossier pendant le parcours
+
+    Un fichier est supprimé s'il remplit toutes les règles actives: plus ancien que
+    min_age_days (selon age_field: 'mtime' ou 'atime'), au moins min_size octets, et
+    hors des keep_newest fichiers les plus récents de son dossier. Avec une règle d'âge,
+    un dossier modifié récemment est vidé selon les mêmes règles mais jamais retiré.
+    """
+
+    def __init__(self, min_age_days=0, age_field='mtime', min_size=0, keep_newest=0):
+        if age_field not in AGE_FIELDS:
+            raise ValueError(f"Champ de date non supporté: {age_field}")
+        self.min_age_days = min_age_days
+        self.age_field = age_field
+        self.min_size = min_size
+        self.keep_newest = keep_newest
+        self.cutoff_ns = None
+
+    def options(self):
+        """Paramètres des règles (enregistrés avec un plan de nettoyage)"""
+        return {
+            'min_age_days': self.min_age_days,
+            'age_field': self.age_field,
+            'min_size': self.min_size,
+            'keep_newest': self.keep_newest
+        }
+
+    def start(self, now=None):
+        """Fixe la date limite au début du nettoyage (même référence pour tout le parcours)"""
+        now = time.time() if now is None else now
+        self.cutoff_ns = int((now - self.min_age_days * 86400) * 1e9)
+
+    def _age_ns(self, file_stat):
+        return file_stat.st_atime_ns if self.age_field == 'atime' else file_stat.st_mtime_ns
+
+    def select(self, files):
+        """Sépare les fichiers d'un dossier: retourne (à supprimer, conservés)
+
+        files est une liste de (nom, stat), comme produite par fs_walker.scan_directory.
+        """
+        if self.cutoff_ns is None:
+            self.start()
+        candidates = files
+        kept = []
+        if self.keep_newest > 0:
+            # Les plus récents selon la date de modification, quelle que soit la règle d'âge
+            ordered = sorted(files, key=lambda item: item[1].st_mtime_ns, reverse=True)
+            kept = ordered[:self.keep_newest]
+            candidates = ordered[self.keep_newest:]
+        selected = []
+        for item in candidates:
+            file_stat = item[1]
+            if (self.min_age_days and self._age_ns(file_stat) > self.cutoff_ns) or \
+                    file_stat.st_size < self.min_size:
+                kept.append(item)
+            else:
+                selected.append(item)
+        return selected, kept
+
+    def dir_expired(self, dir_stat):
+        """Un dossier vidé peut être retiré (pas de modification récente)"""
+        if self.cutoff_ns is None:
+            self.start()
+        return not self.min_age_days or dir_stat.st_mtime_ns <= self.cutoff_ns
+
+
+class _DeleteNode:
+    """Dossier en cours de suppression"""
+    __slots__ = ('path', 'name', 'parent', 'fd', 'use_fd', 'pending', 'keep')
+
+    def __init__(self, path, name, parent, use_fd):
+        self.path = path
+        self.name = name
+        self.parent = parent
+        self.fd = None
+        self.use_fd = use_fd
+        # Lots de fichiers et sous-dossiers pas encore traités
+        self.pending = 0
+        # Le dossier ne peut pas être retiré (fichier ou sous-dossier restant, listing impossible)
+        self.keep = False
+
+
+def _new_stats():
+    """Statistiques d'une suppression"""
+    return {
+        'files_deleted': 0,
+        'dirs_removed': 0,
+        'bytes_freed': 0,
+        'files_kept': 0,
+        'bytes_kept': 0,
+        'skipped': 0,
+        'failed': 0,
+        'errors': 0,
+        'elapsed': 0.0,
+        'rate': 0.0,
+        'byte_rate': 0.0
+    }
+
+
+def _update_rates(stats, start):
+    elapsed = time.monotonic() - start
+    stats['elapsed'] = elapsed
+    if elapsed > 0:
+        stats['rate'] = stats['files_deleted'] / elapsed
+        stats['byte_rate'] = stats['bytes_freed'] / elapsed
+
+
+def _list_node(node, policy):
+    """Ouvre (si possible) et liste un dossier
+
+    Retourne (nœud, dossiers, fichiers, conservés, erreur): dossiers est une liste de
+    (nom, stat), fichiers la liste des (nom, taille) à supprimer selon policy et conservés
+    la liste des (nom, stat) épargnés. Les liens symboliques sont des fichiers.
+    """
+    dirs = []
+    files = []
+    kept = []
+    try:
+        if node.use_fd:
+            parent = node.parent
+            if parent is not None and parent.fd is not None:
+                node.fd = os.open(node.name, _OPEN_FLAGS, dir_fd=parent.fd)
+            else:
+                node.fd = os.open(node.path, _OPEN_FLAGS)
+        with os.scandir(node.fd if node.fd is not None else node.path) as entries:
+            for entry in entries:
+                try:
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append((entry.name, entry_stat))
+                    else:
+                        files.append((entry.name, entry_stat))
+                except OSError:
+                    continue
+    except OSError as e:
+        return node, dirs, [], kept, e
+    if policy is not None:
+        # Règles évaluées sur le stat du listing: aucun parcours supplémentaire
+        files, kept = policy.select(files)
+    return node, dirs, [(name, file_stat.st_size) for name, file_stat in files], kept, None
+
+
+def _unlink_batch(node, batch):
+    """Supprime un lot de fichiers d'un dossier: retourne (nœud, supprimés, octets, échecs)"""
+    deleted = 0
+    freed = 0
+    failed = 0
+    for name, size in batch:
+        try:
+            if node.fd is not None:
+                os.unlink(name, dir_fd=node.fd)
+            else:
+                os.unlink(os.path.join(node.path, name))
+            deleted += 1
+            freed += size
+        except FileNotFoundError:
+            # Déjà supprimé par un autre programme
+            continue
+        except OSError:
+            failed += 1
+    return node, deleted, freed, failed
+
+
+def _remove_node(node):
+    """Retire un dossier vidé: retourne (nœud, succès)"""
+    parent = node.parent
+    try:
+        if parent.fd is not None:
+            os.rmdir(node.name, dir_fd=parent.fd)
+        else:
+            os.rmdir(node.path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return node, False
+    return node, True
+
+
+def delete_tree(roots, workers=None, cancel_event=None, on_progress=None, policy=None):
+    """Vide un ou plusieurs dossiers (les dossiers donnés eux-mêmes sont conservés)
+
+    Les fichiers de chaque dossier sont supprimés par lots de BATCH_SIZE dans un pool de
+    threads; un dossier est retiré dès que ses lots et ses sous-dossiers sont terminés
+    sans échec (aucun listing pour vérifier qu'il est vide). policy (RetentionPolicy)
+    choisit les fichiers supprimés à partir du listing de chaque dossier. on_progress
+    reçoit le dict des statistiques au plus toutes les PROGRESS_INTERVAL secondes;
+    cancel_event arrête la suppression au plus tôt.
+    Retourne les statistiques: files_deleted, dirs_removed, bytes_freed, files_kept et
+    bytes_kept (épargnés par policy), skipped (modifiés depuis le plan, voir apply_plan),
+    failed (entrées non supprimées), errors (dossiers illisibles), elapsed, rate
+    (fichiers/s) et byte_rate (octets/s).
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    workers = workers or DEFAULT_WORKERS
+    stats = _new_stats()
+    start = time.monotonic()
+    last_report = start
+    open_dirs = []
+    if policy is not None:
+        policy.start()
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    # Les tâches terminées arrivent dans une file avec la fonction qui traite leur résultat
+    # dans ce thread (aucun verrou, coût constant par tâche quel que soit le nombre en cours)
+    completed = queue.SimpleQueue()
+    pending = set()
+
+    def submit(handler, function, *args):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        future = pool.submit(function, *args)
+        pending.add(future)
+        future.add_done_callback(lambda done: completed.put((done, handler)))
+
+    def list_dir(path, name, parent, dir_stat=None):
+        # Le descripteur est réservé ici, avant son ouverture par le thread
+        use_fd = DIR_FD_SUPPORTED and len(open_dirs) < MAX_OPEN_DIRS
+        node = _DeleteNode(path, name, parent, use_fd)
+        if policy is not None and dir_stat is not None and not policy.dir_expired(dir_stat):
+            node.keep = True
+        if use_fd:
+            open_dirs.append(node)
+        if parent is not None:
+            parent.pending += 1
+        submit(on_listed, _list_node, node, policy)
+
+    def on_listed(result):
+        node, dirs, files, kept, error = result
+        if error is not None:
+            stats['errors'] += 1
+            node.keep = True
+        if kept:
+            node.keep = True
+            stats['files_kept'] += len(kept)
+            stats['bytes_kept'] += sum(file_stat.st_size for _, file_stat in kept)
+        for index in range(0, len(files), BATCH_SIZE):
+            node.pending += 1
+            submit(on_unlinked, _unlink_batch, node, files[index:index + BATCH_SIZE])
+        for name, dir_stat in dirs:
+            list_dir(os.path.join(node.path, name), name, node, dir_stat)
+        if node.pending == 0:
+            finish(node)
+
+    def on_unlinked(result):
+        node, deleted, freed, failed = result
+        stats['files_deleted'] += deleted
+        stats['bytes_freed'] += freed
+        stats['failed'] += failed
+        release(node, removed=failed == 0)
+
+    def on_removed(result):
+        node, removed = result
+        if removed:
+            stats['dirs_removed'] += 1
+        else:
+            stats['failed'] += 1
+        release(node.parent, removed)
+
+    def finish(node):
+        """Toutes les tâches du dossier sont terminées: il est retiré ou conservé"""
+        if node.use_fd:
+            if node.fd is not None:
+                os.close(node.fd)
+                node.fd = None
+            open_dirs.remove(node)
+            node.use_fd = False
+        if node.parent is None:
+            return
+        if node.keep:
+            release(node.parent, removed=False)
+        else:
+            submit(on_removed, _remove_node, node)
+
+    def release(node, removed):
+        """Une tâche du dossier (lot ou sous-dossier) est terminée"""
+        if not removed:
+            node.keep = True
+        node.pending -= 1
+        if node.pending == 0:
+            finish(node)
+
+    try:
+        for root in roots:
+            list_dir(os.path.realpath(root), os.path.basename(root), None)
+
+        while pending:
+            try:
+                future, handler = completed.get(timeout=PROGRESS_INTERVAL)
+            except queue.Empty:
+                future = None
+            if future is not None:
+                pending.discard(future)
+                handler(future.result())
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+            now = time.monotonic()
+            if on_progress is not None and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                _update_rates(stats, start)
+                on_progress(dict(stats))
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        # Tâches terminées après l'annulation: leurs suppressions sont comptées
+        while cancel_event is not None and cancel_event.is_set():
+            try:
+                future, handler = completed.get_nowait()
+            except queue.Empty:
+                break
+            if not future.cancelled() and future.exception() is None:
+                handler(future.result())
+        # Descripteurs encore ouverts après une annulation ou une erreur
+        for node in open_dirs:
+            if node.fd is not None:
+                os.close(node.fd)
+                node.fd = None
+
+    _update_rates(stats, start)
+    if on_progress is not None:
+        on_progress(dict(stats))
+    return stats
+
+
+class CleanupPlan:
+    """Plan de nettoyage produit par l'analyse et exécuté tel quel par apply_plan
+
+    Pour chaque racine: la liste des dossiers (chemin, device, inode, fichiers) où chaque
+    fichier est (nom, taille, inode, mtime_ns), et les dossiers à retirer une fois vidés.
+    Les totaux par racine (trouvés et prévus) servent au compte rendu de l'analyse.
+    """
+
+    def __init__(self, roots, options=None, created=None):
+        self.roots = list(roots)
+        self.options = options or {}
+        self.created = created if created is not None else time.time()
+        self.dirs = {root: [] for root in self.roots}
+        self.remove_dirs = {root: [] for root in self.roots}
+        self.totals = {root: {'files': 0, 'size': 0, 'planned_files': 0, 'planned_size': 0}
+                       for root in self.roots}
+
+    @property
+    def file_count(self):
+        return sum(totals['planned_files'] for totals in self.totals.values())
+
+    @property
+    def total_size(self):
+        return sum(totals['planned_size'] for totals in self.totals.values())
+
+    def age(self):
+        """Ancienneté du plan en secondes"""
+        return time.time() - self.created
+
+    def save(self, path):
+        """Enregistre le plan (JSON compressé)"""
+        data = {
+            'version': PLAN_VERSION,
+            'created': self.created,
+            'options': self.options,
+            'roots': self.roots,
+            'dirs': self.dirs,
+            'remove_dirs': self.remove_dirs,
+            'totals': self.totals
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """Relit un plan enregistré, ou None s'il est absent, illisible ou d'un autre format"""
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != PLAN_VERSION:
+            return None
+        plan = cls(data['roots'], data['options'], data['created'])
+        plan.dirs = data['dirs']
+        plan.remove_dirs = data['remove_dirs']
+        plan.totals = data['totals']
+        return plan
+
+
+def build_plan(roots, policy=None, options=None, workers=None, cancel_event=None):
+    """Analyse les dossiers en un seul parcours et retourne le CleanupPlan de leur nettoyage
+
+    Les fichiers retenus par policy (tous sans règle) sont inscrits avec leur identité.
+    Les sous-dossiers sont prévus au retrait (s'ils sont vides au moment d'appliquer le
+    plan), sauf ceux qu'une règle d'âge protège.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    plan = CleanupPlan(roots, options)
+    if policy is not None:
+        policy.start()
+
+    for root in roots:
+        totals = plan.totals[root]
+        # Chemins du plan sous la racine résolue: ils sont rouverts sans suivre les liens
+        real_root = os.path.realpath(root)
+        try:
+            root_stat = os.stat(real_root)
+        except OSError:
+            continue
+        # Identité de chaque dossier, connue par le listing de son parent (produit avant lui)
+        identities = {real_root: (root_stat.st_dev, root_stat.st_ino)}
+        for path, dirs, files in scan_tree(real_root, workers, cancel_event=cancel_event):
+            dev, ino = identities.pop(path)
+            for name, dir_stat in dirs:
+                child = os.path.join(path, name)
+                identities[child] = (dir_stat.st_dev, dir_stat.st_ino)
+                if policy is None or policy.dir_expired(dir_stat):
+                    plan.remove_dirs[root].append(child)
+
+            totals['files'] += len(files)
+            totals['size'] += sum(file_stat.st_size for _, file_stat in files)
+            selected = policy.select(files)[0] if policy is not None else files
+            if selected:
+                plan.dirs[root].append([path, dev, ino, [
+                    [name, file_stat.st_size, file_stat.st_ino, file_stat.st_mtime_ns]
+                    for name, file_stat in selected
+                ]])
+                totals['planned_files'] += len(selected)
+                totals['planned_size'] += sum(file_stat.st_size for _, file_stat in selected)
+    return plan
+
+
+def _apply_batch(path, dev, ino, entries):
+    """Supprime les fichiers d'un dossier prévus au plan dont l'identité n'a pas changé
+
+    Retourne (supprimés, octets, ignorés, échecs). Un inode nul (listing Windows, qui ne
+    le fournit pas) n'est pas comparé: la taille et mtime_ns suffisent alors.
+    """
+    deleted = 0
+    freed = 0
+    skipped = 0
+    failed = 0
+    fd = None
+    try:
+        if DIR_FD_SUPPORTED:
+            fd = os.open(path, _OPEN_FLAGS)
+            dir_stat = os.fstat(fd)
+        else:
+            dir_stat = os.lstat(path)
+        if ino and (dir_stat.st_dev, dir_stat.st_ino) != (dev, ino):
+            # Dossier remplacé depuis l'analyse: rien n'y est supprimé
+            return 0, 0, len(entries), 0
+    except FileNotFoundError:
+        if fd is not None:
+            os.close(fd)
+        return 0, 0, len(entries), 0
+    except OSError:
+        if fd is not None:
+            os.close(fd)
+        return 0, 0, 0, len(entries)
+
+    try:
+        for name, size, file_ino, mtime_ns in entries:
+            try:
+                if fd is not None:
+                    file_stat = os.stat(name, dir_fd=fd, follow_symlinks=False)
+                else:
+                    file_stat = os.lstat(os.path.join(path, name))
+            except FileNotFoundError:
+                skipped += 1
+                continue
+            except OSError:
+                failed += 1
+                continue
+            if file_stat.st_size != size or file_stat.st_mtime_ns != mtime_ns or \
+                    (file_ino and file_stat.st_ino != file_ino):
+                # Modifié ou remplacé depuis l'analyse: conservé
+                skipped += 1
+                continue
+            try:
+                if fd is not None:
+                    os.unlink(name, dir_fd=fd)
+                else:
+                    os.unlink(os.path.join(path, name))
+                deleted += 1
+                freed += size
+            except FileNotFoundError:
+                skipped += 1
+            except OSError:
+                failed += 1
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return deleted, freed, skipped, failed
+
+
+def apply_plan(plan, roots=None, workers=None, cancel_event=None, on_progress=None):
+    """Exécute un CleanupPlan (toutes ses racines ou seulement roots)
+
+    Chaque fichier est supprimé seulement si son identité (inode, taille, mtime_ns) est
+    celle de l'analyse; les autres sont comptés dans skipped. Les lots de fichiers sont
+    traités en parallèle, puis les dossiers prévus sont retirés du plus profond au moins
+    profond (un dossier encore occupé est simplement conservé). Retourne les mêmes
+    statistiques que delete_tree.
+    """
+    roots = plan.roots if roots is None else [root for root in roots if root in plan.dirs]
+    workers = workers or DEFAULT_WORKERS
+    stats = _new_stats()
+    start = time.monotonic()
+    last_report = start
+
+    def collect(future):
+        deleted, freed, skipped, failed = future.result()
+        stats['files_deleted'] += deleted
+        stats['bytes_freed'] += freed
+        stats['skipped'] += skipped
+        stats['failed'] += failed
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        remaining = set()
+        for root in roots:
+            for path, dev, ino, entries in plan.dirs[root]:
+                for index in range(0, len(entries), BATCH_SIZE):
+                    remaining.add(pool.submit(_apply_batch, path, dev, ino, entries[index:index + BATCH_SIZE]))
+        try:
+            for future in as_completed(list(remaining)):
+                remaining.discard(future)
+                collect(future)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                now = time.monotonic()
+                if on_progress is not None and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    _update_rates(stats, start)
+                    on_progress(dict(stats))
+        finally:
+            for future in remaining:
+                future.cancel()
+    # Lots déjà en cours au moment de l'annulation: leurs suppressions sont comptées
+    for future in remaining:
+        if not future.cancelled() and future.exception() is None:
+            collect(future)
+
+    if cancel_event is None or not cancel_event.is_set():
+        remove_dirs = [path for root in roots for path in plan.remove_dirs[root]]
+        # Les plus profonds d'abord: un parent n'est retiré qu'après ses sous-dossiers
+        remove_dirs.sort(key=lambda path: path.count(os.sep), reverse=True)
+        for path in remove_dirs:
+            try:
+                os.rmdir(path)
+                stats['dirs_removed'] += 1
+            except OSError:
+                # Non vide (fichier conservé ou nouveau), déjà supprimé ou inaccessible
+                continue
+
+    _update_rates(stats, start)
+    if on_progress is not None:
+        on_progress(dict(stats))
+    return stats
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parcours parallèle de l'arborescence de fichiers
+Auteur: Zx
+Description: Moteur de parcours commun aux outils d'analyse et de nettoyage, basé sur
+             os.scandir: les informations de DirEntry sont réutilisées (un seul stat par
+             entrée) et les dossiers sont listés en parallèle dans un pool de threads
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Nombre de dossiers listés en parallèle par défaut (appels système bloquants: plus que de cœurs)
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def allocated_size(stat_result):
+    """Espace disque réellement occupé par un fichier (blocs alloués)
+
+    Sans st_blocks (Windows), la taille apparente est retournée.
+    """
+    blocks = getattr(stat_result, 'st_blocks', None)
+    if blocks is None:
+        return stat_result.st_size
+    return blocks * 512
+
+
+def scan_directory(path):
+    """Liste un dossier et récupère le stat de chacune de ses entrées
+
+    Retourne (chemin, dossiers, fichiers, erreur) où dossiers et fichiers sont des
+    listes de (nom, stat). Les liens symboliques ne sont jamais suivis: un lien vers
+    un dossier est traité comme un fichier.
+    """
+    dirs = []
+    files = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    # Sous Windows le stat vient du listing lui-même, sans appel supplémentaire
+                    entry_stat = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append((entry.name, entry_stat))
+                    else:
+                        files.append((entry.name, entry_stat))
+                except OSError:
+                    # Entrée supprimée entre le listing et le stat
+                    continue
+    except OSError as e:
+        return path, dirs, files, e
+    return path, dirs, files, None
+
+
+def scan_tree(roots, workers=None, on_error=None, cancel_event=None, scanner=scan_directory):
+    """Parcourt un ou plusieurs dossiers et produit (dossier, dossiers, fichiers) au fil de l'eau
+
+    dossiers et fichiers sont des listes de (nom, stat). Comme avec os.walk, retirer
+    des éléments de la liste des dossiers (modification en place) évite de les parcourir.
+    L'ordre des dossiers produits dépend de la fin des listings, pas de l'arborescence.
+    on_error reçoit l'OSError des dossiers illisibles; cancel_event (threading.Event)
+    arrête le parcours au plus tôt. scanner remplace scan_directory pour lister un
+    dossier (même valeur de retour), par exemple pour réutiliser un index existant.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    workers = workers or DEFAULT_WORKERS
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        for root in roots:
+            pending.add(pool.submit(scanner, root))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                path, dirs, files, error = future.result()
+                if error is not None:
+                    if on_error is not None:
+                        on_error(error)
+                    continue
+
+                yield path, dirs, files
+
+                # Les sous-dossiers restants (après élagage éventuel) sont listés à leur tour
+                for name, _ in dirs:
+                    pending.add(pool.submit(scanner, os.path.join(path, name)))
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def walk_files(roots, workers=None, on_error=None, cancel_event=None):
+    """Produit (chemin, stat) pour chaque fichier sous les dossiers donnés"""
+    for path, dirs, files in scan_tree(roots, workers, on_error, cancel_event):
+        for name, file_stat in files:
+            yield os.path.join(path, name), file_stat
+
+
+def tree_size(roots, workers=None, cancel_event=None):
+    """Retourne (taille totale, nombre de fichiers) sous les dossiers donnés"""
+    total_size = 0
+    file_count = 0
+    for file_path, file_stat in walk_files(roots, workers, cancel_event=cancel_event):
+        total_size += file_stat.st_size
+        file_count += 1
+    return total_size, file_count
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache persistant des hash de fichiers
+Auteur: Zx
+Description: Base SQLite indexée par identité de fichier (device, inode, taille, mtime_ns)
+             pour ne jamais relire un fichier inchangé entre deux recherches de doublons
+"""
+
+import os
+import sqlite3
+import time
+
+from app_data import get_data_dir
+
+CACHE_FILENAME = "hash_cache.sqlite3"
+
+# Nombre maximal d'entrées conservées dans le cache
+DEFAULT_MAX_ENTRIES = 1000000
+
+# Nombre d'écritures regroupées dans une même transaction
+COMMIT_INTERVAL = 1000
+
+
+def file_identity(stat_result):
+    """Identité d'un fichier: change dès que son contenu est susceptible d'avoir changé"""
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+
+class HashCache:
+    def __init__(self, algorithm, partial_size, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.algorithm = algorithm
+        self.partial_size = partial_size
+        self.max_entries = max_entries
+        self.path = path or os.path.join(get_data_dir(), CACHE_FILENAME)
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._pending_writes = 0
+        self._touched = []
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                algorithm TEXT NOT NULL,
+                partial_size INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                partial_hash TEXT,
+                full_hash TEXT,
+                last_seen REAL NOT NULL,
+                PRIMARY KEY (dev, inode, size, mtime_ns, algorithm, partial_size)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_hashes_last_seen ON hashes (last_seen)")
+        self.conn.commit()
+
+    def _key(self, identity):
+        return tuple(identity) + (self.algorithm, self.partial_size)
+
+    def get(self, identity, kind):
+        """Retourne le hash en cache ('partial' ou 'full') ou None"""
+        column = 'partial_hash' if kind == 'partial' else 'full_hash'
+        row = self.conn.execute(
+            f"SELECT {column} FROM hashes WHERE dev=? AND inode=? AND size=? AND mtime_ns=? "
+            "AND algorithm=? AND partial_size=?",
+            self._key(identity)
+        ).fetchone()
+        if row and row[0]:
+            self.hits += 1
+            self._touched.append(self._key(identity))
+            return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, identity, path, kind, file_hash):
+        """Enregistre un hash partiel ou complet pour cette identité de fichier"""
+        column = 'partial_hash' if kind == 'partial' else 'full_hash'
+        self.conn.execute(
+            "INSERT OR IGNORE INTO hashes "
+            "(dev, inode, size, mtime_ns, algorithm, partial_size, path, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._key(identity) + (path, time.time())
+        )
+        self.conn.execute(
+            f"UPDATE hashes SET {column}=?, path=?, last_seen=? WHERE dev=? AND inode=? AND size=? "
+            "AND mtime_ns=? AND algorithm=? AND partial_size=?",
+            (file_hash, path, time.time()) + self._key(identity)
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Valide les écritures en attente"""
+        # Les entrées lues pendant l'analyse sont marquées comme récemment utilisées
+        if self._touched:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE hashes SET last_seen=? WHERE dev=? AND inode=? AND size=? AND mtime_ns=? "
+                "AND algorithm=? AND partial_size=?",
+                [(now,) + key for key in self._touched]
+            )
+            self._touched = []
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def prune(self, roots, seen_identities):
+        """Supprime les entrées des fichiers disparus ou modifiés sous les dossiers analysés,
+        puis les plus anciennes si le cache dépasse sa taille maximale
+
+        seen_identities=None (parcours filtré, qui n'a pas vu tous les fichiers): seule la
+        taille maximale est appliquée.
+        """
+        stale = []
+        for root in roots if seen_identities is not None else ():
+            prefix = os.path.join(os.path.abspath(root), '')
+            rows = self.conn.execute(
+                "SELECT dev, inode, size, mtime_ns, partial_size FROM hashes "
+                "WHERE algorithm=? AND substr(path, 1, ?)=?",
+                (self.algorithm, len(prefix), prefix)
+            )
+            for dev, inode, size, mtime_ns, partial_size in rows:
+                if (dev, inode, size, mtime_ns) not in seen_identities:
+                    stale.append((dev, inode, size, mtime_ns, partial_size))
+
+        self.conn.executemany(
+            "DELETE FROM hashes WHERE dev=? AND inode=? AND size=? AND mtime_ns=? "
+            "AND partial_size=? AND algorithm=?",
+            [row + (self.algorithm,) for row in stale]
+        )
+        self.evicted += len(stale)
+
+        count = self.conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries
+            self.conn.execute(
+                "DELETE FROM hashes WHERE rowid IN (SELECT rowid FROM hashes ORDER BY last_seen LIMIT ?)",
+                (excess,)
+            )
+            self.evicted += excess
+        self.commit()
+
+    def close(self):
+        """Valide les écritures en attente et ferme la base"""
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection des images quasi identiques
+Auteur: Zx
+Description: Hash perceptuels (aHash, dHash, pHash) calculés dans un pool de processus
+             et recherche vectorisée (NumPy) des hash proches en distance de Hamming,
+             par indexation multiple pour éviter les comparaisons en O(n²)
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Méthodes de hash perceptuel disponibles
+HASH_METHODS = ('ahash', 'dhash', 'phash')
+DEFAULT_METHOD = 'dhash'
+
+# Côté de la grille de hash: 8x8 = 64 bits
+HASH_SIZE = 8
+
+# Distance de Hamming maximale (sur 64 bits) pour considérer deux images comme similaires
+DEFAULT_THRESHOLD = 6
+
+# Extensions que Pillow ne sait pas lire comme images matricielles
+UNSUPPORTED_EXTENSIONS = ('.svg',)
+
+# Nombre de bits à 1 pour chaque valeur d'octet
+_POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# Nombre de paires vérifiées à la fois (limite la mémoire des calculs vectorisés)
+_VERIFY_BATCH = 1 << 20
+
+
+def _dct_matrix(size):
+    """Matrice de la DCT-II orthonormée"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0, :] = np.sqrt(1.0 / size)
+    return matrix
+
+
+_PHASH_SIZE = HASH_SIZE * 4
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _bits_to_int(bits):
+    """Convertit une grille de booléens 8x8 en entier 64 bits"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def image_hash(file_path, method=DEFAULT_METHOD):
+    """Calcule le hash perceptuel 64 bits d'une image"""
+    with Image.open(file_path) as image:
+        image.draft('L', (_PHASH_SIZE * 2, _PHASH_SIZE * 2))
+        grayscale = image.convert('L')
+
+    if method == 'ahash':
+        pixels = np.asarray(grayscale.resize((HASH_SIZE, HASH_SIZE), Image.BILINEAR), dtype=np.float32)
+        return _bits_to_int(pixels > pixels.mean())
+
+    if method == 'dhash':
+        pixels = np.asarray(grayscale.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.float32)
+        return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+    if method == 'phash':
+        pixels = np.asarray(grayscale.resize((_PHASH_SIZE, _PHASH_SIZE), Image.BILINEAR), dtype=np.float32)
+        coefficients = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+        # La composante continue est exclue du calcul de la médiane
+        median = np.median(coefficients.ravel()[1:])
+        return _bits_to_int(coefficients > median)
+
+    raise ValueError(f"Méthode de hash perceptuel non supportée: {method}")
+
+
+def _hash_job(args):
+    """Tâche exécutée dans le pool: retourne (chemin, hash) ou (chemin, None)"""
+    file_path, method = args
+    try:
+        return file_path, image_hash(file_path, method)
+    except Exception:
+        # Image corrompue, format non reconnu ou fichier illisible
+        return file_path, None
+
+
+def collect_images(folder, extensions, cancel_event=None):
+    """Liste les images du dossier (récursivement) selon leurs extensions"""
+    extensions = tuple(ext for ext in extensions if ext not in UNSUPPORTED_EXTENSIONS)
+    images = []
+    for root, dirs, files in os.walk(folder):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        for file in files:
+            if file.lower().endswith(extensions):
+                images.append(os.path.join(root, file))
+    return images
+
+
+def compute_hashes(paths, method=DEFAULT_METHOD, workers=None, cancel_event=None):
+    """Calcule les hash perceptuels dans un pool de processus
+
+    Retourne la liste des chemins lisibles et le tableau uint64 de leurs hash. Après
+    cancel_event, les images pas encore traitées sont abandonnées.
+    """
+    workers = workers or os.cpu_count() or 1
+    valid_paths = []
+    hashes = []
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        jobs = ((path, method) for path in paths)
+        for file_path, value in pool.map(_hash_job, jobs, chunksize=64):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if value is not None:
+                valid_paths.append(file_path)
+                hashes.append(value)
+    finally:
+        # Les images pas encore traitées sont abandonnées (cancel_futures: Python 3.9+)
+        if sys.version_info >= (3, 9):
+            pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            pool.shutdown(wait=True)
+    return valid_paths, np.array(hashes, dtype=np.uint64)
+
+
+def hamming_distance(a, b):
+    """Distance de Hamming vectorisée entre deux tableaux uint64"""
+    xor = np.bitwise_xor(a, b)
+    return _POPCOUNT_TABLE[xor.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def _segments(threshold):
+    """Découpe des 64 bits en segments pour l'indexation multiple
+
+    Avec m segments, deux hash à distance <= threshold ont au moins un segment
+    à distance <= threshold // m (principe des tiroirs).
+    """
+    count = max(1, min(threshold + 1, 4))
+    widths = [64 // count + (1 if i < 64 % count else 0) for i in range(count)]
+    segments = []
+    shift = 0
+    for width in widths:
+        segments.append((shift, width))
+        shift += width
+    return segments
+
+
+def _flip_masks(width, radius):
+    """Masques de tous les voisins d'un segment à distance <= radius (hors identité)"""
+    masks = [0]
+    for _ in range(radius):
+        masks = sorted(set(mask | (1 << bit) for mask in masks for bit in range(width)))
+    return [mask for mask in masks if mask]
+
+
+def _bucket_pairs(order, starts, counts, first, second, same):
+    """Produit par lots de _VERIFY_BATCH les paires (membre de first[k], membre de second[k])
+
+    Les paires de tous les couples de seaux sont numérotées à la suite; chaque lot est
+    décodé d'un bloc (seau, rang dans chaque seau) sans boucle Python par seau. Avec
+    same (first == second), seules les paires i < j d'un même seau sont gardées.
+    """
+    first_counts = counts[first]
+    second_counts = counts[second]
+    sizes = first_counts * second_counts
+    ends = np.cumsum(sizes)
+    total = int(ends[-1]) if len(ends) else 0
+    for low in range(0, total, _VERIFY_BATCH):
+        number = np.arange(low, min(low + _VERIFY_BATCH, total), dtype=np.int64)
+        pair = np.searchsorted(ends, number, side='right')
+        offset = number - (ends[pair] - sizes[pair])
+        i = offset // second_counts[pair]
+        j = offset % second_counts[pair]
+        if same:
+            keep = i < j
+            pair, i, j = pair[keep], i[keep], j[keep]
+        yield order[starts[first[pair]] + i], order[starts[second[pair]] + j]
+
+
+def _candidate_pairs(hashes, threshold):
+    """Paires candidates partageant un segment proche, produites par lots bornés
+
+    Une même paire peut apparaître dans plusieurs lots (plusieurs segments proches).
+    """
+    segments = _segments(threshold)
+    radius = threshold // len(segments)
+
+    for shift, width in segments:
+        keys = (hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        unique_keys, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+        # Paires à l'intérieur d'un même seau
+        shared = np.flatnonzero(counts > 1)
+        yield from _bucket_pairs(order, starts, counts, shared, shared, same=True)
+
+        # Paires entre seaux voisins (segments différant de quelques bits)
+        for mask in _flip_masks(width, radius):
+            neighbor_keys = unique_keys ^ np.uint64(mask)
+            positions = np.searchsorted(unique_keys, neighbor_keys)
+            positions = np.minimum(positions, len(unique_keys) - 1)
+            found = (unique_keys[positions] == neighbor_keys) & (neighbor_keys > unique_keys)
+            yield from _bucket_pairs(order, starts, counts, np.flatnonzero(found), positions[found],
+                                     same=False)
+
+
+def _connected_components(count, left, right):
+    """Étiquette les composantes connexes du graphe des paires (propagation vectorisée)"""
+    labels = np.arange(count)
+    if len(left) == 0:
+        return labels
+    while True:
+        minimum = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, minimum)
+        np.minimum.at(updated, right, minimum)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def find_similar_groups(hashes, threshold=DEFAULT_THRESHOLD, cancel_event=None):
+    """Regroupe les indices des hash proches (distance de Hamming <= threshold)
+
+    Les paires candidates sont vérifiées lot par lot dès leur production: seules les
+    paires proches sont conservées. Retourne [] si cancel_event est levé entre deux lots.
+    """
+    if len(hashes) < 2:
+        return []
+
+    # Les hash strictement identiques sont fusionnés avant la recherche
+    unique_hashes, inverse = np.unique(hashes, return_inverse=True)
+    inverse = inverse.ravel()
+
+    close_pairs = []
+    for batch_left, batch_right in _candidate_pairs(unique_hashes, threshold):
+        if cancel_event is not None and cancel_event.is_set():
+            return []
+        close = hamming_distance(unique_hashes[batch_left], unique_hashes[batch_right]) <= threshold
+        low = np.minimum(batch_left[close], batch_right[close])
+        high = np.maximum(batch_left[close], batch_right[close])
+        close_pairs.append(low * len(unique_hashes) + high)
+    # Une même paire peut être trouvée par plusieurs segments
+    pairs = np.unique(np.concatenate(close_pairs)) if close_pairs else np.empty(0, dtype=np.int64)
+    left = pairs // len(unique_hashes)
+    right = pairs % len(unique_hashes)
+
+    labels = _connected_components(len(unique_hashes), left, right)[inverse]
+    order = np.argsort(labels, kind='stable')
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    return [group.tolist() for group in np.split(order, boundaries) if len(group) > 1]
+
+
+def find_similar_images(folder, extensions, method=DEFAULT_METHOD, threshold=DEFAULT_THRESHOLD,
+                        workers=None, cancel_event=None):
+    """Retourne les groupes de chemins d'images visuellement similaires
+
+    cancel_event (threading.Event) arrête la recherche au plus tôt; elle retourne alors [].
+    """
+    images = collect_images(folder, extensions, cancel_event)
+    paths, hashes = compute_hashes(images, method, workers, cancel_event)
+    if cancel_event is not None and cancel_event.is_set():
+        return []
+    groups = find_similar_groups(hashes, threshold, cancel_event)
+    return [[paths[index] for index in group] for group in groups]
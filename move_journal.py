@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Journal des déplacements du rangement
+Auteur: Zx
+Description: Journal en ajout seul (une ligne JSON par déplacement: source, destination,
+             taille et mtime du fichier) écrit par lots et synchronisé sur disque avant
+             les déplacements correspondants; permet de reprendre un rangement
+             interrompu et d'annuler d'un coup le dernier rangement
+"""
+
+import json
+import os
+import threading
+import time
+
+from organize_engine import move_file
+
+JOURNAL_VERSION = 1
+
+# Déplacements inscrits (et synchronisés sur disque par un seul fsync) à la fois
+BATCH_SIZE = 512
+
+# Intervalle minimal (secondes) entre deux notifications de progression
+PROGRESS_INTERVAL = 0.25
+
+# Journaux en cours d'écriture (rangement, reprise ou annulation) dans ce processus
+_busy_paths = set()
+_busy_lock = threading.Lock()
+
+
+def _claim(path):
+    """Réserve le journal pour une seule opération à la fois (RuntimeError s'il est pris)"""
+    path = os.path.abspath(path)
+    with _busy_lock:
+        if path in _busy_paths:
+            raise RuntimeError(f"Journal déjà utilisé par un autre rangement en cours: {path}")
+        _busy_paths.add(path)
+    return path
+
+
+def _release(path):
+    with _busy_lock:
+        _busy_paths.discard(path)
+
+
+class MoveJournal:
+    """Écriture du journal d'un rangement
+
+    start() remplace le journal précédent, sauf s'il décrit un rangement interrompu
+    ni terminé ni annulé (voir unfinished_journal); record() inscrit un lot de
+    déplacements et ne rend la main qu'une fois le lot sur disque, avant que les
+    fichiers ne bougent: après un arrêt brutal, tout fichier déplacé figure au journal.
+    finish() marque le rangement comme terminé.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_size = BATCH_SIZE
+        self._file = None
+        self._claimed = None
+
+    def _write(self, lines):
+        self._file.write(''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start(self, folder):
+        """Ouvre le journal d'un nouveau rangement
+
+        RuntimeError si un autre rangement de ce processus écrit déjà ce journal, ou si
+        le rangement précédent est inachevé: l'écraser rendrait ses fichiers impossibles
+        à remettre en place. Il doit d'abord être terminé (resume_moves) ou annulé.
+        """
+        self._claimed = _claim(self.path)
+        try:
+            journal = unfinished_journal(self.path)
+            if journal is not None:
+                raise RuntimeError(f"Le rangement de {journal['folder']} est inachevé: "
+                                   "terminez-le ou annulez-le avant d'en commencer un autre")
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write([{'version': JOURNAL_VERSION, 'folder': folder, 'started': time.time()}])
+        except BaseException:
+            self.close()
+            raise
+
+    def record(self, entries):
+        """Inscrit des déplacements [(source, destination, (taille, mtime_ns))]"""
+        self._write([{'s': source, 'd': destination, 'i': list(identity)}
+                     for source, destination, identity in entries])
+
+    def finish(self, stats=None):
+        stats = stats or {}
+        self._write([{'end': time.time(), 'moved': stats.get('moved', 0),
+                      'errors': stats.get('errors', 0)}])
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._claimed is not None:
+            _release(self._claimed)
+            self._claimed = None
+
+
+def _append(path, line):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_journal(path):
+    """Contenu du journal, ou None s'il est absent, illisible ou d'une autre version
+
+    Retourne un dict: folder, started, entries [(source, destination, identité)],
+    complete (rangement terminé) et undone (rangement annulé). Une dernière ligne
+    tronquée par un arrêt brutal est ignorée. Quand un fichier a été inscrit plusieurs
+    fois (nouveau nom après un conflit), seule sa dernière entrée est gardée: les
+    précédentes n'ont pas abouti.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not lines:
+        return None
+    try:
+        header = json.loads(lines[0])
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get('version') != JOURNAL_VERSION:
+        return None
+
+    journal = {
+        'folder': header.get('folder'),
+        'started': header.get('started', 0),
+        'entries': [],
+        'complete': False,
+        'undone': False
+    }
+    for text in lines[1:]:
+        try:
+            line = json.loads(text)
+        except ValueError:
+            continue
+        if 's' in line:
+            journal['entries'].append((line['s'], line['d'], tuple(line['i'])))
+        elif 'end' in line:
+            journal['complete'] = True
+        elif 'undone' in line:
+            journal['undone'] = True
+
+    latest = {source: index for index, (source, _, _) in enumerate(journal['entries'])}
+    journal['entries'] = [entry for index, entry in enumerate(journal['entries'])
+                          if latest[entry[0]] == index]
+    return journal
+
+
+def unfinished_journal(path):
+    """Journal d'un rangement interrompu qui a déplacé des fichiers, ni terminé ni annulé, ou None"""
+    journal = read_journal(path)
+    if journal is None or journal['complete'] or journal['undone'] or not journal['entries']:
+        return None
+    return journal
+
+
+def _new_stats(total):
+    return {
+        'restored': 0,
+        'moved': 0,
+        'skipped': 0,
+        'errors': 0,
+        'total': total,
+        'elapsed': 0.0,
+        'rate': 0.0
+    }
+
+
+def _matches(file_stat, identity):
+    """Le fichier est-il celui inscrit au journal (même taille et même mtime)
+
+    Une entrée sans mtime n'est jamais rejouée: la taille seule ne suffit pas à
+    reconnaître le fichier.
+    """
+    size, mtime_ns = identity
+    return mtime_ns is not None and file_stat.st_size == size and file_stat.st_mtime_ns == mtime_ns
+
+
+def _replay(entries, move, on_progress, cancel_event, stats):
+    """Applique move(source, destination, identité) -> clé de statistique à chaque entrée"""
+    start = time.monotonic()
+    last_report = start
+    for index, (source, destination, identity) in enumerate(entries):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        try:
+            stats[move(source, destination, identity)] += 1
+        except OSError:
+            stats['errors'] += 1
+
+        now = time.monotonic()
+        if on_progress is not None and now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            stats['elapsed'] = now - start
+            stats['rate'] = (index + 1) / stats['elapsed']
+            on_progress(dict(stats))
+
+    stats['elapsed'] = time.monotonic() - start
+    if stats['elapsed'] > 0:
+        stats['rate'] = sum(stats[key] for key in ('restored', 'moved', 'skipped', 'errors')) / stats['elapsed']
+    if on_progress is not None:
+        on_progress(dict(stats))
+    return stats
+
+
+def resume_moves(path, on_progress=None, cancel_event=None):
+    """Termine les déplacements inscrits au journal d'un rangement interrompu
+
+    Les fichiers encore à leur place d'origine (et inchangés) sont déplacés; ceux déjà
+    à destination sont comptés comme ignorés. Retourne les statistiques (moved,
+    skipped, errors...), ou None sans journal utilisable. RuntimeError si un rangement
+    écrit déjà ce journal.
+    """
+    claimed = _claim(path)
+    try:
+        return _resume(path, on_progress, cancel_event)
+    finally:
+        _release(claimed)
+
+
+def _resume(path, on_progress, cancel_event):
+    journal = read_journal(path)
+    if journal is None:
+        return None
+
+    def resume(source, destination, identity):
+        try:
+            source_stat = os.lstat(source)
+        except FileNotFoundError:
+            return 'skipped'
+        if not _matches(source_stat, identity):
+            return 'skipped'
+        move_file(source, destination)
+        return 'moved'
+
+    stats = _replay(journal['entries'], resume, on_progress, cancel_event, _new_stats(len(journal['entries'])))
+    if cancel_event is None or not cancel_event.is_set():
+        _append(path, {'end': time.time(), 'moved': stats['moved'], 'errors': stats['errors']})
+    return stats
+
+
+def undo_moves(path, on_progress=None, cancel_event=None):
+    """Annule le rangement du journal en remettant chaque fichier à sa place d'origine
+
+    Le journal est rejoué à l'envers; un fichier absent de sa destination ou modifié
+    depuis (taille, mtime) est laissé en place, et un chemin d'origine de nouveau occupé
+    n'est jamais écrasé. Relancer l'annulation ne déplace que ce qui reste. Retourne
+    les statistiques (restored, skipped, errors...), ou None sans journal utilisable.
+    RuntimeError si un rangement écrit déjà ce journal.
+    """
+    claimed = _claim(path)
+    try:
+        return _undo(path, on_progress, cancel_event)
+    finally:
+        _release(claimed)
+
+
+def _undo(path, on_progress, cancel_event):
+    journal = read_journal(path)
+    if journal is None:
+        return None
+
+    # Dossiers d'origine dont l'existence est connue: un seul makedirs par dossier
+    folders = set()
+
+    def restore(source, destination, identity):
+        try:
+            destination_stat = os.lstat(destination)
+        except FileNotFoundError:
+            return 'skipped'
+        if not _matches(destination_stat, identity):
+            return 'skipped'
+        folder = os.path.dirname(source)
+        if folder not in folders:
+            os.makedirs(folder, exist_ok=True)
+            folders.add(folder)
+        move_file(destination, source)
+        return 'restored'
+
+    entries = journal['entries']
+    stats = _replay(reversed(entries), restore, on_progress, cancel_event, _new_stats(len(entries)))
+    if cancel_event is None or not cancel_event.is_set():
+        _append(path, {'undone': time.time(), 'restored': stats['restored'], 'errors': stats['errors']})
+    return stats
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Moteur de rangement des fichiers par catégorie
+Auteur: Zx
+Description: Déplacement d'une sélection de fichiers vers leurs dossiers de catégorie,
+             commun aux deux interfaces d'organisation: chaque dossier de destination
+             est créé une seule fois par rangement, les fichiers sont pris au fil de
+             l'eau (liste ou parcours récursif) et déplacés en parallèle par un pool
+             de threads borné
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import queue
+import shutil
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fs_walker import scan_tree
+
+# Intervalle minimal (secondes) entre deux notifications de progression
+PROGRESS_INTERVAL = 0.25
+
+# Déplacements en parallèle par défaut (renommages: appels système courts et bloquants)
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Déplacements soumis d'avance par thread: au-delà, la lecture des fichiers attend le pool
+MAX_PENDING_PER_WORKER = 4
+
+# Nouveaux noms essayés quand la destination apparaît entre l'attribution et le déplacement
+MAX_NAME_RETRIES = 100
+
+# Constantes de <fcntl.h> et <linux/fs.h>
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+
+def _load_renameat2():
+    """renameat2 de la libc (Linux, glibc 2.28+), ou None si indisponible"""
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    renameat2.restype = ctypes.c_int
+    return renameat2
+
+
+_RENAMEAT2 = _load_renameat2()
+
+
+class DestinationNames:
+    """Attribution des noms libres dans les dossiers de destination, sans stat par fichier
+
+    Chaque dossier est listé une seule fois, au premier fichier qui y est rangé; les
+    conflits sont ensuite résolus par un compteur par (dossier, nom, extension) qui
+    reprend après le dernier suffixe attribué. Les noms sont comparés après
+    os.path.normcase (Windows ne distingue pas la casse).
+    """
+
+    def __init__(self):
+        self.taken = {}
+        self.counters = {}
+
+    def _names(self, folder):
+        names = self.taken.get(folder)
+        if names is None:
+            try:
+                names = {os.path.normcase(name) for name in os.listdir(folder)}
+            except FileNotFoundError:
+                names = set()
+            self.taken[folder] = names
+        return names
+
+    def reserve(self, folder, filename):
+        """Chemin libre pour filename dans folder (suffixe _1, _2... en cas de conflit)"""
+        names = self._names(folder)
+        candidate = filename
+        if os.path.normcase(candidate) in names:
+            stem, ext = os.path.splitext(filename)
+            key = (folder, os.path.normcase(stem), os.path.normcase(ext))
+            counter = self.counters.get(key, 1)
+            candidate = f"{stem}_{counter}{ext}"
+            while os.path.normcase(candidate) in names:
+                counter += 1
+                candidate = f"{stem}_{counter}{ext}"
+            self.counters[key] = counter + 1
+        names.add(os.path.normcase(candidate))
+        return os.path.join(folder, candidate)
+
+
+def unique_destination(destination_folder, filename, names=None):
+    """Chemin libre pour filename dans destination_folder (suffixe _1, _2... en cas de conflit)
+
+    Avec names (DestinationNames), le nom est attribué sans appel système; sinon les
+    suffixes sont essayés un par un, ce qui convient à un fichier isolé.
+    """
+    if names is not None:
+        return names.reserve(destination_folder, filename)
+    destination_path = os.path.join(destination_folder, filename)
+    counter = 1
+    original_destination = destination_path
+    while os.path.exists(destination_path):
+        name, ext = os.path.splitext(original_destination)
+        destination_path = f"{name}_{counter}{ext}"
+        counter += 1
+    return destination_path
+
+
+def move_file(source, destination):
+    """Déplace un fichier sans jamais écraser la destination (FileExistsError si elle existe)
+
+    Sous Linux un seul renameat2(RENAME_NOREPLACE); ailleurs, ou si le système de
+    fichiers ne le permet pas, le nom est d'abord réservé par une création exclusive
+    (O_EXCL) puis remplacé par le fichier. Entre deux disques, le fichier est copié.
+    """
+    if _RENAMEAT2 is not None:
+        if _RENAMEAT2(AT_FDCWD, os.fsencode(source), AT_FDCWD, os.fsencode(destination),
+                      RENAME_NOREPLACE) == 0:
+            return
+        error = ctypes.get_errno()
+        if error not in (errno.EINVAL, errno.ENOSYS, errno.EXDEV):
+            raise OSError(error, os.strerror(error), destination)
+
+    os.close(os.open(destination, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+    try:
+        try:
+            os.replace(source, destination)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(source, destination)
+    except BaseException:
+        # Le fichier source est intact: la réservation (ou la copie partielle) est retirée
+        try:
+            os.unlink(destination)
+        except OSError:
+            pass
+        raise
+
+
+def move_to_folder(source, destination_folder, filename, names=None):
+    """Déplace source dans destination_folder sous un nom libre et retourne le chemin final
+
+    Si le nom attribué est pris entre-temps (autre programme, casse différente), le
+    suivant est essayé.
+    """
+    for _ in range(MAX_NAME_RETRIES):
+        destination_path = unique_destination(destination_folder, filename, names)
+        try:
+            move_file(source, destination_path)
+            return destination_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(errno.EEXIST, "Aucun nom libre", os.path.join(destination_folder, filename))
+
+
+def walk_tree_files(root, excluded_dirs=(), workers=None, on_error=None, cancel_event=None):
+    """Produit (chemin, stat) pour chaque fichier ordinaire de l'arborescence de root
+
+    Les sous-dossiers de premier niveau nommés dans excluded_dirs (dossiers de catégorie
+    déjà rangés) ne sont pas parcourus; les liens symboliques sont ignorés.
+    """
+    root = os.path.normpath(root)
+    for path, dirs, files in scan_tree(root, workers, on_error, cancel_event):
+        if path == root and excluded_dirs:
+            dirs[:] = [(name, dir_stat) for name, dir_stat in dirs if name not in excluded_dirs]
+        for name, file_stat in files:
+            if stat.S_ISREG(file_stat.st_mode):
+                yield os.path.join(path, name), file_stat
+
+
+def _update_rates(stats, start):
+    stats['elapsed'] = time.monotonic() - start
+    if stats['elapsed'] > 0:
+        stats['rate'] = (stats['moved'] + stats['errors']) / stats['elapsed']
+        stats['byte_rate'] = stats['bytes_moved'] / stats['elapsed']
+
+
+def organize_records(records, on_moved=None, on_error=None, on_progress=None, cancel_event=None,
+                     workers=None, journal=None):
+    """Déplace chaque fichier (dict avec 'path', 'filename', 'destination', 'size') dans son dossier
+
+    records peut être une liste ou un générateur (parcours récursif consommé au fil de
+    l'eau). Les noms de destination sont choisis et les dossiers créés par le thread
+    appelant; seuls les déplacements sont confiés aux workers threads (1: sans pool).
+    on_moved(record, chemin final) et on_error(record, exception) sont appelés depuis le
+    thread appelant pour chaque fichier; on_progress(statistiques) au plus toutes les
+    PROGRESS_INTERVAL secondes. journal (MoveJournal démarré) reçoit chaque lot de
+    déplacements avant qu'il ne soit exécuté. Retourne les statistiques: moved, errors,
+    bytes_moved, folders_created, total, elapsed, rate (fichiers/s) et byte_rate (octets/s).
+    """
+    stats = {
+        'moved': 0,
+        'errors': 0,
+        'bytes_moved': 0,
+        'folders_created': 0,
+        'total': len(records) if hasattr(records, '__len__') else 0,
+        'elapsed': 0.0,
+        'rate': 0.0,
+        'byte_rate': 0.0
+    }
+    counted = hasattr(records, '__len__')
+    workers = workers or DEFAULT_WORKERS
+    start = time.monotonic()
+    last_report = start
+
+    # Dossier de destination -> None (prêt) ou erreur de création; noms libres par dossier
+    folders = {}
+    names = DestinationNames()
+
+    def moved(record, destination_path):
+        stats['moved'] += 1
+        stats['bytes_moved'] += record.get('size', 0)
+        if on_moved is not None:
+            on_moved(record, destination_path)
+
+    def failed(record, error):
+        stats['errors'] += 1
+        if on_error is not None:
+            on_error(record, error)
+
+    def report():
+        nonlocal last_report
+        now = time.monotonic()
+        if on_progress is not None and now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            _update_rates(stats, start)
+            on_progress(dict(stats))
+
+    def check_folder(record):
+        folder = record['destination']
+        if folder not in folders:
+            folders[folder] = None
+            if not os.path.isdir(folder):
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                    stats['folders_created'] += 1
+                except OSError as e:
+                    folders[folder] = e
+        if folders[folder] is not None:
+            raise folders[folder]
+
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    completed = queue.SimpleQueue()
+    in_flight = 0
+    # Déplacements dont le nom est attribué, en attente de leur inscription au journal
+    batch = []
+    batch_size = journal.batch_size if journal is not None else 1
+
+    def identity(record):
+        """(taille, mtime_ns) du fichier pour le journal, lu sur le disque s'il manque au record"""
+        if record.get('mtime_ns') is not None and record.get('size') is not None:
+            return record['size'], record['mtime_ns']
+        try:
+            file_stat = os.lstat(record['path'])
+        except OSError:
+            # Le déplacement échouera aussi; l'entrée ne sera jamais rejouée
+            return record.get('size'), None
+        return file_stat.st_size, file_stat.st_mtime_ns
+
+    def log(moves):
+        if journal is not None:
+            journal.record([(record['path'], destination_path, identity(record))
+                            for record, destination_path in moves])
+
+    def execute(record, destination_path, attempt):
+        nonlocal in_flight
+        if pool is None:
+            try:
+                move_file(record['path'], destination_path)
+                error = None
+            except (OSError, shutil.Error) as e:
+                error = e
+            finish(record, destination_path, attempt, error)
+            return
+        # File bornée: le parcours ne prend pas plus de quelques lots d'avance sur le pool
+        while in_flight >= workers * MAX_PENDING_PER_WORKER:
+            handle(*completed.get())
+        future = pool.submit(move_file, record['path'], destination_path)
+        future.add_done_callback(
+            lambda done: completed.put((done, record, destination_path, attempt)))
+        in_flight += 1
+
+    def handle(future, record, destination_path, attempt):
+        nonlocal in_flight
+        in_flight -= 1
+        try:
+            future.result()
+            error = None
+        except (OSError, shutil.Error) as e:
+            error = e
+        finish(record, destination_path, attempt, error)
+
+    def finish(record, destination_path, attempt, error):
+        if error is None:
+            moved(record, destination_path)
+        elif isinstance(error, FileExistsError) and attempt + 1 < MAX_NAME_RETRIES:
+            # Nom pris entre l'attribution et le déplacement: le suivant est essayé
+            retry_path = names.reserve(record['destination'], record['filename'])
+            log([(record, retry_path)])
+            execute(record, retry_path, attempt + 1)
+            return
+        else:
+            failed(record, error)
+        report()
+
+    def flush():
+        log(batch)
+        for record, destination_path in batch:
+            execute(record, destination_path, 0)
+        del batch[:]
+
+    try:
+        for record in records:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if not counted:
+                stats['total'] += 1
+            try:
+                check_folder(record)
+            except OSError as e:
+                failed(record, e)
+                report()
+                continue
+
+            batch.append((record, names.reserve(record['destination'], record['filename'])))
+            if len(batch) >= batch_size:
+                flush()
+        else:
+            flush()
+
+        # Les déplacements déjà soumis sont menés à terme, même après une annulation
+        while in_flight:
+            handle(*completed.get())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    _update_rates(stats, start)
+    if on_progress is not None:
+        on_progress(dict(stats))
+    return stats
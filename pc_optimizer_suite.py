@@ -7,7 +7,6 @@ Description: Interface complète avec organisation de fichiers et optimisation P
 """
 
 import os
-import shutil
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from pathlib import Path
@@ -15,16 +14,42 @@ import threading
 from datetime import datetime
 import tempfile
 import psutil
-import hashlib
-from collections import defaultdict
 import subprocess
 import platform
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+from matplotlib.collections import PolyCollection
 import matplotlib.animation as animation
 from collections import deque
 import time
+import queue
+import bisect
+import numpy as np
+from duplicate_finder import (DuplicateFinder, HASH_ALGORITHMS, DEFAULT_ALGORITHM, PARTIAL_HASH_SIZE,
+                              EXECUTORS, DEFAULT_EXECUTOR, RECLAIM_MODES)
+from hash_cache import HashCache
+from fs_delete import delete_tree, RetentionPolicy, AGE_FIELDS, CleanupPlan, build_plan, apply_plan
+from app_data import get_data_dir
+from disk_usage import SizeTree, DiskIndex, LargestFiles, DEFAULT_TOP_K, ALL_FILES
+import treemap
+from folder_watcher import FolderWatcher
+from organize_engine import organize_records, move_to_folder, walk_tree_files
+from content_sniffer import ContentSniffer, content_overrides
+from move_journal import MoveJournal, read_journal, resume_moves, undo_moves, unfinished_journal
+
+# Affichage progressif des doublons: nombre de groupes insérés par lot et intervalle (ms)
+DUPLICATE_BATCH_SIZE = 200
+DUPLICATE_POLL_INTERVAL = 100
+
+# Plans de nettoyage produits par l'analyse: fichiers et ancienneté maximale (secondes)
+# au-delà de laquelle le nettoyage refait son propre parcours
+TEMP_PLAN_FILENAME = "temp_cleanup_plan.json.gz"
+BROWSER_PLAN_FILENAME = "browser_cleanup_plan.json.gz"
+CLEANUP_PLAN_MAX_AGE = 3600
+
+# Journal des déplacements du dernier rangement
+ORGANIZE_JOURNAL_FILENAME = "organize_journal.jsonl"
 
 class PCOptimizerSuite:
     def __init__(self):
@@ -40,7 +65,23 @@ class PCOptimizerSuite:
         # Variables
         self.current_folder = str(Path.home() / "Downloads")
         self.files_data = []
+        # Élément de la liste -> enregistrement du fichier
+        self.file_index = {}
         self.selected_files = set()
+        self.watcher = None
+        # Reprise ou annulation d'un rangement en cours (surveillance suspendue)
+        self.replaying_journal = False
+        # Rangement de la sélection en cours (un seul à la fois: ils partagent le journal)
+        self.organizing = False
+        # Types détectés d'après le contenu, conservés d'un scan à l'autre
+        self.sniffer = ContentSniffer()
+        self.sniff_content = False
+        # Numéro du dernier scan lancé: les résultats d'un scan dépassé sont ignorés
+        self.scan_generation = 0
+        
+        # Plans de nettoyage de la dernière analyse
+        self.temp_plan = None
+        self.browser_plan = None
         
         # Variables pour le gestionnaire de services
         self.services_list = []
@@ -58,6 +99,9 @@ class PCOptimizerSuite:
         
         self.setup_ui()
         
+        # Rangement interrompu lors de la dernière session
+        self.root.after(500, self.check_interrupted_organize)
+        
     def setup_ui(self):
         """Configure l'interface utilisateur avec onglets"""
         # Frame principal
@@ -117,6 +161,24 @@ class PCOptimizerSuite:
         ttk.Button(folder_frame, text="Scanner", 
                   command=self.scan_folder).grid(row=0, column=3, padx=(5, 0))
         
+        # Rangement automatique des nouveaux fichiers
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Surveiller", variable=self.watch_var,
+                       command=self.toggle_watch).grid(row=0, column=4, padx=(10, 0))
+        
+        # Classement d'après le contenu (fichiers sans extension ou mal nommés)
+        self.sniff_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Analyser le contenu", variable=self.sniff_var,
+                       command=self.toggle_sniff).grid(row=0, column=5, padx=(10, 0))
+        
+        # Sous-dossiers inclus: l'arborescence est rangée à plat dans les dossiers de catégorie
+        self.recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_frame, text="Récursif", variable=self.recursive_var,
+                       command=self.scan_folder).grid(row=0, column=6, padx=(10, 0))
+        self.watch_status_var = tk.StringVar(value="")
+        ttk.Label(folder_frame, textvariable=self.watch_status_var).grid(
+            row=1, column=0, columnspan=7, sticky=tk.W, pady=(5, 0))
+        
         # Section liste des fichiers
         files_frame = ttk.LabelFrame(tab_frame, text="Fichiers trouvés", padding="10")
         files_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -170,6 +232,10 @@ class PCOptimizerSuite:
         
         ttk.Button(control_frame, text="Organiser les fichiers sélectionnés", 
                   command=self.organize_files).pack(side=tk.RIGHT)
+        ttk.Button(control_frame, text="Annuler le dernier rangement", 
+                  command=self.undo_last_organize).pack(side=tk.RIGHT, padx=(0, 5))
+        self.organize_progress_var = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.organize_progress_var).pack(side=tk.LEFT)
         
     def create_temp_cleaner_tab(self):
         """Onglet de nettoyage des fichiers temporaires"""
@@ -195,6 +261,32 @@ class PCOptimizerSuite:
         ttk.Checkbutton(options_frame, text="Fichiers de logs (attention !)", 
                        variable=self.clean_logs_var).pack(anchor=tk.W)
         
+        # Règles de conservation: les fichiers récents (programmes en cours) sont épargnés
+        retention_frame = ttk.LabelFrame(tab_frame, text="Règles de conservation", padding="10")
+        retention_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.temp_retention_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(retention_frame, text="Appliquer les règles",
+                       variable=self.temp_retention_var).pack(side=tk.LEFT, padx=(0, 20))
+        
+        ttk.Label(retention_frame, text="Plus vieux que (jours):").pack(side=tk.LEFT, padx=(0, 5))
+        self.temp_min_age_var = tk.StringVar(value="7")
+        ttk.Spinbox(retention_frame, from_=0, to=3650, width=5,
+                    textvariable=self.temp_min_age_var).pack(side=tk.LEFT)
+        self.temp_age_field_var = tk.StringVar(value='mtime')
+        ttk.Combobox(retention_frame, textvariable=self.temp_age_field_var,
+                     values=AGE_FIELDS, state="readonly", width=6).pack(side=tk.LEFT, padx=(5, 0))
+        
+        ttk.Label(retention_frame, text="Taille min. (Mo):").pack(side=tk.LEFT, padx=(20, 5))
+        self.temp_min_size_var = tk.StringVar(value="0")
+        ttk.Spinbox(retention_frame, from_=0, to=100000, width=6,
+                    textvariable=self.temp_min_size_var).pack(side=tk.LEFT)
+        
+        ttk.Label(retention_frame, text="Garder les N plus récents par dossier:").pack(side=tk.LEFT, padx=(20, 5))
+        self.temp_keep_newest_var = tk.StringVar(value="0")
+        ttk.Spinbox(retention_frame, from_=0, to=1000, width=5,
+                    textvariable=self.temp_keep_newest_var).pack(side=tk.LEFT)
+        
         # Boutons d'action
         action_frame = ttk.Frame(tab_frame)
         action_frame.pack(fill=tk.X, pady=(0, 10))
@@ -204,6 +296,9 @@ class PCOptimizerSuite:
         ttk.Button(action_frame, text="Nettoyer", 
                   command=self.clean_temp_files).pack(side=tk.LEFT)
         
+        self.temp_progress_var = tk.StringVar(value="")
+        ttk.Label(action_frame, textvariable=self.temp_progress_var).pack(side=tk.LEFT, padx=(20, 0))
+        
         # Résultats
         self.temp_results = tk.Text(tab_frame, height=15, wrap=tk.WORD)
         temp_scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=self.temp_results.yview)
@@ -267,8 +362,106 @@ class PCOptimizerSuite:
         ttk.Button(disk_frame, text="Analyser", 
                   command=self.analyze_disk_space).pack(side=tk.LEFT)
         
+        # Par défaut seuls les dossiers modifiés depuis la dernière analyse sont relistés
+        self.disk_full_scan_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(disk_frame, text="Analyse complète (ignorer l'index)",
+                        variable=self.disk_full_scan_var).pack(side=tk.LEFT, padx=(20, 0))
+        
+        # Arbre des tailles: construit en un seul parcours, les sous-dossiers
+        # sont ajoutés à l'ouverture de leur parent sans nouvelle analyse
+        self.disk_size_tree = None
+        self.disk_unexpanded = {}
+        
+        # Vues de l'arbre des tailles: liste arborescente et treemap
+        self.disk_views = ttk.Notebook(tab_frame)
+        self.disk_views.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        
+        tree_frame = ttk.Frame(self.disk_views)
+        self.disk_views.add(tree_frame, text="Arborescence")
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        
+        self.disk_tree = ttk.Treeview(tree_frame, columns=('size', 'allocated', 'files', 'percent'),
+                                      show='tree headings', height=12)
+        self.disk_tree.heading('#0', text='Dossier')
+        self.disk_tree.heading('size', text='Taille')
+        self.disk_tree.heading('allocated', text='Sur le disque')
+        self.disk_tree.heading('files', text='Fichiers')
+        self.disk_tree.heading('percent', text='% du parent')
+        
+        self.disk_tree.column('#0', width=400)
+        self.disk_tree.column('size', width=100)
+        self.disk_tree.column('allocated', width=100)
+        self.disk_tree.column('files', width=90)
+        self.disk_tree.column('percent', width=90)
+        
+        disk_tree_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.disk_tree.yview)
+        self.disk_tree.configure(yscrollcommand=disk_tree_scrollbar.set)
+        self.disk_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        disk_tree_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.disk_tree.bind('<<TreeviewOpen>>', self.on_disk_tree_open)
+        
+        # Treemap: clic gauche pour entrer dans un dossier, clic droit pour remonter
+        treemap_frame = ttk.Frame(self.disk_views)
+        self.disk_views.add(treemap_frame, text="Treemap")
+        
+        treemap_toolbar = ttk.Frame(treemap_frame)
+        treemap_toolbar.pack(fill=tk.X, pady=(5, 5))
+        ttk.Button(treemap_toolbar, text="Remonter",
+                   command=self.disk_treemap_up).pack(side=tk.LEFT, padx=(0, 10))
+        self.disk_treemap_info_var = tk.StringVar(value="Lancez une analyse pour afficher la treemap")
+        ttk.Label(treemap_toolbar, textvariable=self.disk_treemap_info_var).pack(side=tk.LEFT)
+        
+        self.disk_treemap_fig = Figure(figsize=(10, 5), dpi=100)
+        self.disk_treemap_ax = self.disk_treemap_fig.add_axes([0, 0, 1, 1])
+        self.disk_treemap_ax.set_axis_off()
+        self.disk_treemap_canvas = FigureCanvasTkAgg(self.disk_treemap_fig, treemap_frame)
+        self.disk_treemap_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.disk_treemap_canvas.mpl_connect('button_press_event', self.on_disk_treemap_click)
+        self.disk_treemap_canvas.mpl_connect('motion_notify_event', self.on_disk_treemap_motion)
+        self.disk_treemap_canvas.get_tk_widget().bind('<Configure>', self.on_disk_treemap_resize)
+        
+        self.disk_treemap_path = None
+        self.disk_treemap = None
+        self.disk_treemap_redraw = None
+        
+        # Plus gros fichiers, relevés pendant le parcours de l'analyse
+        largest_frame = ttk.Frame(self.disk_views)
+        self.disk_views.add(largest_frame, text="Plus gros fichiers")
+        
+        largest_toolbar = ttk.Frame(largest_frame)
+        largest_toolbar.pack(fill=tk.X, pady=(5, 5))
+        ttk.Label(largest_toolbar, text="Catégorie:").pack(side=tk.LEFT, padx=(0, 10))
+        self.largest_category_var = tk.StringVar(value="Toutes")
+        self.largest_category_combo = ttk.Combobox(largest_toolbar, textvariable=self.largest_category_var,
+                                                   values=["Toutes"], state="readonly", width=15)
+        self.largest_category_combo.pack(side=tk.LEFT)
+        self.largest_category_combo.bind('<<ComboboxSelected>>', lambda event: self._show_largest_files())
+        
+        largest_tree_frame = ttk.Frame(largest_frame)
+        largest_tree_frame.pack(fill=tk.BOTH, expand=True)
+        largest_tree_frame.columnconfigure(0, weight=1)
+        largest_tree_frame.rowconfigure(0, weight=1)
+        
+        # Un clic sur un en-tête trie la liste selon cette colonne
+        self.largest_tree = ttk.Treeview(largest_tree_frame, columns=('name', 'size', 'category', 'folder'),
+                                         show='headings', height=12)
+        for column, title, width in (('name', 'Fichier', 250), ('size', 'Taille', 100),
+                                     ('category', 'Catégorie', 100), ('folder', 'Dossier', 400)):
+            self.largest_tree.heading(column, text=title,
+                                      command=lambda column=column: self.sort_largest_files(column))
+            self.largest_tree.column(column, width=width)
+        
+        largest_scrollbar = ttk.Scrollbar(largest_tree_frame, orient=tk.VERTICAL, command=self.largest_tree.yview)
+        self.largest_tree.configure(yscrollcommand=largest_scrollbar.set)
+        self.largest_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        largest_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        
+        self.largest_sort_column = 'size'
+        self.largest_sort_reverse = True
+        
         # Résultats de l'analyse
-        self.disk_results = tk.Text(tab_frame, height=15, wrap=tk.WORD)
+        self.disk_results = tk.Text(tab_frame, height=8, wrap=tk.WORD)
         disk_scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=self.disk_results.yview)
         self.disk_results.configure(yscrollcommand=disk_scrollbar.set)
         
@@ -325,6 +518,9 @@ class PCOptimizerSuite:
         ttk.Button(action_frame, text="Nettoyer", 
                   command=self.clean_browser_cache).pack(side=tk.LEFT)
         
+        self.browser_progress_var = tk.StringVar(value="")
+        ttk.Label(action_frame, textvariable=self.browser_progress_var).pack(side=tk.LEFT, padx=(20, 0))
+        
         # Résultats
         self.browser_results = tk.Text(tab_frame, height=12, wrap=tk.WORD)
         browser_scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=self.browser_results.yview)
@@ -348,10 +544,117 @@ class PCOptimizerSuite:
         self.duplicate_folder_var = tk.StringVar(value=str(Path.home()))
         ttk.Entry(folder_frame, textvariable=self.duplicate_folder_var, state="readonly").pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         ttk.Button(folder_frame, text="Parcourir", command=self.select_duplicate_folder).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(folder_frame, text="Rechercher", command=self.find_duplicates).pack(side=tk.LEFT)
+        ttk.Button(folder_frame, text="Rechercher", command=self.find_duplicates).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Button(folder_frame, text="Annuler", command=self.cancel_duplicate_search).pack(side=tk.LEFT)
         
-        # Résultats
-        self.duplicate_results = tk.Text(tab_frame, height=15, wrap=tk.WORD)
+        # Options de la recherche
+        options_frame = ttk.LabelFrame(tab_frame, text="Options", padding="10")
+        options_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(options_frame, text="Algorithme de hash:").pack(side=tk.LEFT, padx=(0, 10))
+        self.duplicate_algorithm_var = tk.StringVar(value=DEFAULT_ALGORITHM)
+        ttk.Combobox(options_frame, textvariable=self.duplicate_algorithm_var,
+                     values=HASH_ALGORITHMS, state="readonly", width=10).pack(side=tk.LEFT)
+        
+        self.duplicate_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Utiliser le cache de hash",
+                        variable=self.duplicate_cache_var).pack(side=tk.LEFT, padx=(20, 0))
+        
+        # Pool de calcul des hash (0 worker = choix automatique selon la machine)
+        ttk.Label(options_frame, text="Workers (0 = auto):").pack(side=tk.LEFT, padx=(20, 5))
+        self.duplicate_workers_var = tk.StringVar(value="0")
+        ttk.Spinbox(options_frame, from_=0, to=64, width=5,
+                    textvariable=self.duplicate_workers_var).pack(side=tk.LEFT)
+        self.duplicate_executor_var = tk.StringVar(value=DEFAULT_EXECUTOR)
+        ttk.Combobox(options_frame, textvariable=self.duplicate_executor_var,
+                     values=EXECUTORS, state="readonly", width=8).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Comparaison octet par octet (mmap) des groupes avant de les afficher
+        self.duplicate_verify_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Vérifier octet par octet",
+                        variable=self.duplicate_verify_var).pack(side=tk.LEFT, padx=(20, 0))
+        
+        # Recherche d'images quasi identiques (redimensionnées, recompressées...)
+        similar_frame = ttk.LabelFrame(tab_frame, text="Images similaires", padding="10")
+        similar_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.similar_images_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(similar_frame, text="Rechercher aussi les images similaires",
+                        variable=self.similar_images_var).pack(side=tk.LEFT)
+        
+        ttk.Label(similar_frame, text="Méthode:").pack(side=tk.LEFT, padx=(20, 5))
+        self.similar_method_var = tk.StringVar(value='dhash')
+        ttk.Combobox(similar_frame, textvariable=self.similar_method_var,
+                     values=('ahash', 'dhash', 'phash'), state="readonly", width=8).pack(side=tk.LEFT)
+        
+        ttk.Label(similar_frame, text="Distance max (bits):").pack(side=tk.LEFT, padx=(20, 5))
+        self.similar_threshold_var = tk.StringVar(value="6")
+        ttk.Spinbox(similar_frame, from_=0, to=20, width=5,
+                    textvariable=self.similar_threshold_var).pack(side=tk.LEFT)
+        
+        # Action sur les doublons trouvés
+        action_frame = ttk.Frame(tab_frame)
+        action_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(action_frame, text="Remplacer les doublons par:").pack(side=tk.LEFT, padx=(0, 10))
+        self.duplicate_reclaim_mode_var = tk.StringVar(value='hardlink')
+        ttk.Combobox(action_frame, textvariable=self.duplicate_reclaim_mode_var,
+                     values=RECLAIM_MODES, state="readonly", width=10).pack(side=tk.LEFT, padx=(0, 10))
+        self.duplicate_reclaim_btn = ttk.Button(action_frame, text="Récupérer l'espace",
+                                                command=self.reclaim_duplicates)
+        self.duplicate_reclaim_btn.pack(side=tk.LEFT)
+        
+        # Progression de la recherche en cours
+        progress_frame = ttk.Frame(tab_frame)
+        progress_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.duplicate_progress = ttk.Progressbar(progress_frame, mode='determinate', maximum=100)
+        self.duplicate_progress.pack(fill=tk.X)
+        self.duplicate_status_var = tk.StringVar(value="")
+        ttk.Label(progress_frame, textvariable=self.duplicate_status_var).pack(anchor=tk.W, pady=(5, 0))
+        
+        # Résultats de la dernière recherche
+        self.duplicate_finder = None
+        self.duplicate_groups = []
+        self.duplicate_queue = queue.Queue()
+        self.duplicate_scan_running = False
+        self.duplicate_reclaim_running = False
+        # Annulation de la recherche d'images similaires (après celle des doublons)
+        self.duplicate_cancel_event = threading.Event()
+        
+        # Groupes de doublons: une ligne par groupe, triée par espace récupérable,
+        # les fichiers ne sont ajoutés qu'à l'ouverture du groupe
+        tree_frame = ttk.Frame(tab_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        tree_frame.columnconfigure(0, weight=1)
+        tree_frame.rowconfigure(0, weight=1)
+        
+        self.duplicate_tree = ttk.Treeview(tree_frame, columns=('files', 'size', 'reclaimable'),
+                                           show='tree headings', height=10)
+        self.duplicate_tree.heading('#0', text='Groupe / Fichier')
+        self.duplicate_tree.heading('files', text='Fichiers')
+        self.duplicate_tree.heading('size', text='Taille')
+        self.duplicate_tree.heading('reclaimable', text='Récupérable')
+        
+        self.duplicate_tree.column('#0', width=450)
+        self.duplicate_tree.column('files', width=70)
+        self.duplicate_tree.column('size', width=90)
+        self.duplicate_tree.column('reclaimable', width=100)
+        
+        duplicate_tree_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.duplicate_tree.yview)
+        self.duplicate_tree.configure(yscrollcommand=duplicate_tree_scrollbar.set)
+        
+        self.duplicate_tree.grid(row=0, column=0, sticky='nsew')
+        duplicate_tree_scrollbar.grid(row=0, column=1, sticky='ns')
+        
+        self.duplicate_tree.bind('<<TreeviewOpen>>', self.on_duplicate_group_open)
+        
+        # Clés de tri des lignes affichées et groupes associés aux lignes
+        self.duplicate_sort_keys = []
+        self.duplicate_item_groups = {}
+        
+        # Résumé de l'analyse
+        self.duplicate_results = tk.Text(tab_frame, height=8, wrap=tk.WORD)
         duplicate_scrollbar = ttk.Scrollbar(tab_frame, orient=tk.VERTICAL, command=self.duplicate_results.yview)
         self.duplicate_results.configure(yscrollcommand=duplicate_scrollbar.set)
         
@@ -464,11 +767,17 @@ class PCOptimizerSuite:
         self.backup_folder = str(Path.home() / "Documents" / "XTri_Registry_Backups")
         
     # Méthodes pour l'organisation des fichiers (reprises de la version précédente)
-    def get_file_category(self, file_path):
+    def get_file_category(self, file_path, detected_extension=None):
         extension = Path(file_path).suffix.lower()
-        for category, extensions in self.categories.items():
-            if extension in extensions:
-                return category
+        candidates = [extension]
+        # Le type détecté ne l'emporte que si l'extension manque ou est contredite par le
+        # contenu (pas quand il n'en est que le conteneur: zip pour un .xlsx...)
+        if content_overrides(extension, detected_extension):
+            candidates.insert(0, detected_extension)
+        for candidate in candidates:
+            for category, extensions in self.categories.items():
+                if candidate in extensions:
+                    return category
         return 'Autres'
     
     def format_file_size(self, size_bytes):
@@ -490,6 +799,10 @@ class PCOptimizerSuite:
             self.current_folder = folder
             self.folder_var.set(folder)
             self.scan_folder()
+            if self.watch_var.get():
+                # La surveillance suit le dossier sélectionné
+                self.stop_watch()
+                self.start_watch()
     
     def scan_folder(self):
         if not os.path.exists(self.current_folder):
@@ -500,40 +813,120 @@ class PCOptimizerSuite:
             self.tree.delete(item)
         
         self.files_data = []
+        self.file_index = {}
         self.selected_files = set()
         
+        # Parcours et lecture des en-têtes hors du thread de l'interface; seul le
+        # dernier scan lancé est affiché
+        self.scan_generation += 1
+        thread = threading.Thread(target=self._scan_folder_thread,
+                                  args=(self.scan_generation, self.current_folder,
+                                        self.recursive_var.get(), self.sniff_content))
+        thread.daemon = True
+        thread.start()
+    
+    def _scan_folder_thread(self, generation, folder, recursive, sniff_content):
         try:
-            files = [f for f in os.listdir(self.current_folder) 
-                    if os.path.isfile(os.path.join(self.current_folder, f))]
-            
-            for filename in files:
-                file_path = os.path.join(self.current_folder, filename)
-                file_size = os.path.getsize(file_path)
-                category = self.get_file_category(file_path)
-                destination = os.path.join(self.current_folder, category)
-                
-                file_data = {
-                    'filename': filename,
-                    'path': file_path,
-                    'size': file_size,
-                    'category': category,
-                    'destination': destination
-                }
-                
-                self.files_data.append(file_data)
-                
-                item_id = self.tree.insert('', 'end', values=(
-                    '☐',
-                    filename,
-                    self.format_file_size(file_size),
-                    category,
-                    category
-                ))
-                
-            self.update_count_label()
-            
+            if recursive:
+                # Dossiers de catégorie exclus: les fichiers déjà rangés ne sont pas repris
+                files = list(walk_tree_files(folder, set(self.categories) | {'Autres'}))
+            else:
+                with os.scandir(folder) as entries:
+                    files = [(entry.path, entry.stat()) for entry in entries if entry.is_file()]
+            # Lecture des premiers octets seulement, en parallèle et jamais deux fois par fichier
+            detected = self.sniffer.sniff_many(files) if sniff_content else {}
+            self.root.after(0, self._show_scan_results, generation, folder, files, detected)
         except Exception as e:
-            messagebox.showerror("Erreur", f"Erreur lors du scan: {str(e)}")
+            error_msg = f"Erreur lors du scan: {str(e)}"
+            self.root.after(0, self._show_scan_error, generation, error_msg)
+    
+    def _show_scan_error(self, generation, error_msg):
+        if generation == self.scan_generation:
+            messagebox.showerror("Erreur", error_msg)
+    
+    def _show_scan_results(self, generation, folder, files, detected):
+        if generation != self.scan_generation:
+            return
+        
+        for file_path, file_stat in files:
+            filename = os.path.basename(file_path)
+            file_size = file_stat.st_size
+            category = self.get_file_category(file_path, detected.get(file_path))
+            destination = os.path.join(folder, category)
+            
+            file_data = {
+                'filename': filename,
+                'path': file_path,
+                'size': file_size,
+                'mtime_ns': file_stat.st_mtime_ns,
+                'category': category,
+                'destination': destination
+            }
+            
+            self.files_data.append(file_data)
+            
+            item_id = self.tree.insert('', 'end', values=(
+                '☐',
+                os.path.relpath(file_path, folder),
+                self.format_file_size(file_size),
+                category,
+                category
+            ))
+            file_data['item'] = item_id
+            self.file_index[item_id] = file_data
+            
+        self.update_count_label()
+    
+    def toggle_sniff(self):
+        # Copie lue aussi par le thread de surveillance (pas d'accès Tk hors du thread principal)
+        self.sniff_content = self.sniff_var.get()
+        self.scan_folder()
+    
+    def toggle_watch(self):
+        if self.watch_var.get():
+            self.start_watch()
+        else:
+            self.stop_watch()
+    
+    def start_watch(self):
+        if self.replaying_journal:
+            # Démarrée à la fin de la reprise ou de l'annulation en cours
+            return
+        try:
+            self.watcher = FolderWatcher(self.current_folder, self._organize_watched_file,
+                                         on_error=self._on_watch_error)
+            self.watcher.start()
+        except OSError as e:
+            self.watcher = None
+            self.watch_var.set(False)
+            messagebox.showerror("Erreur", f"Impossible de surveiller le dossier: {str(e)}")
+            return
+        self.watch_status_var.set(f"Surveillance active ({self.watcher.backend}): {self.current_folder}")
+    
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.watch_status_var.set("Surveillance arrêtée")
+    
+    def _on_watch_error(self, error):
+        if self.watcher is not None and self.watcher.stopped:
+            # Dossier supprimé: la surveillance est arrêtée depuis le thread de l'interface
+            self.root.after(0, self.watch_var.set, False)
+            self.root.after(0, self.stop_watch)
+        message = f"Surveillance: {str(error)}"
+        self.root.after(0, self.watch_status_var.set, message)
+    
+    def _organize_watched_file(self, file_path):
+        filename = os.path.basename(file_path)
+        detected = self.sniffer.sniff(file_path) if self.sniff_content else None
+        category = self.get_file_category(file_path, detected)
+        destination = os.path.join(os.path.dirname(file_path), category)
+        os.makedirs(destination, exist_ok=True)
+        
+        move_to_folder(file_path, destination, filename)
+        message = f"✓ {filename} → {category} (automatique)"
+        self.root.after(0, self.watch_status_var.set, message)
     
     def on_tree_click(self, event):
         region = self.tree.identify_region(event.x, event.y)
@@ -577,91 +970,261 @@ class PCOptimizerSuite:
             messagebox.showwarning("Attention", "Aucun fichier sélectionné.")
             return
         
+        if self.organizing or self.replaying_journal:
+            messagebox.showwarning("Attention", "Un rangement est déjà en cours.")
+            return
+        
+        # Un rangement interrompu doit d'abord être terminé ou annulé: son journal serait écrasé
+        journal = unfinished_journal(self._organize_journal_path())
+        if journal is not None:
+            if messagebox.askyesno(
+                "Rangement interrompu",
+                f"Le rangement de {journal['folder']} n'a été ni terminé ni annulé.\n\n"
+                "Voulez-vous le terminer maintenant?\n"
+                "(Sinon, annulez-le avec « Annuler le dernier rangement » avant d'en commencer un autre.)"
+            ):
+                self._start_journal_replay(resume_moves)
+            return
+        
         result = messagebox.askyesno(
             "Confirmation",
             f"Voulez-vous organiser {len(self.selected_files)} fichiers sélectionnés?"
         )
         
         if result:
+            self.organizing = True
             thread = threading.Thread(target=self._organize_files_thread)
             thread.daemon = True
             thread.start()
     
     def _organize_files_thread(self):
         try:
-            selected_items = list(self.selected_files)
-            moved_count = 0
+            # Enregistrements pris dans l'index des éléments: aucune recherche dans la liste
+            records = [self.file_index[item] for item in list(self.selected_files) if item in self.file_index]
+            total_files = len(records)
+            moved_items = []
             
-            for item in selected_items:
-                filename = self.tree.set(item, 'filename')
-                file_data = next((f for f in self.files_data if f['filename'] == filename), None)
-                
-                if file_data:
-                    try:
-                        if not os.path.exists(file_data['destination']):
-                            os.makedirs(file_data['destination'])
-                        
-                        destination_path = os.path.join(file_data['destination'], filename)
-                        counter = 1
-                        original_destination = destination_path
-                        while os.path.exists(destination_path):
-                            name, ext = os.path.splitext(original_destination)
-                            destination_path = f"{name}_{counter}{ext}"
-                            counter += 1
-                        
-                        shutil.move(file_data['path'], destination_path)
-                        moved_count += 1
-                        
-                        self.tree.delete(item)
-                        self.selected_files.remove(item)
-                        
-                    except Exception as e:
-                        print(f"Erreur avec {filename}: {str(e)}")
+            def on_moved(record, destination_path):
+                moved_items.append(record['item'])
+            
+            def on_error(record, error):
+                print(f"Erreur avec {record['filename']}: {str(error)}")
+            
+            def on_progress(progress):
+                message = (f"{progress['moved'] + progress['errors']}/{total_files} fichiers "
+                           f"({self._format_organize_rate(progress)})")
+                self.root.after(0, self.organize_progress_var.set, message)
+            
+            # Chaque lot de déplacements est inscrit au journal avant d'être exécuté
+            journal = MoveJournal(self._organize_journal_path())
+            journal.start(self.current_folder)
+            try:
+                stats = organize_records(records, on_moved, on_error, on_progress, journal=journal)
+                journal.finish(stats)
+            finally:
+                journal.close()
+            self.root.after(0, self._finish_organize, moved_items, stats)
+            
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Erreur", f"Erreur générale: {str(e)}"))
+        finally:
+            self.root.after(0, self._end_organize)
+    
+    def _end_organize(self):
+        self.organizing = False
+    
+    def _finish_organize(self, moved_items, stats):
+        # Les fichiers rangés sont retirés de la liste en une fois
+        if moved_items:
+            self.tree.delete(*moved_items)
+        moved = set(moved_items)
+        self.selected_files -= moved
+        for item in moved_items:
+            self.file_index.pop(item, None)
+        self.files_data = [record for record in self.files_data if record['item'] not in moved]
+        self.update_count_label()
+        self.organize_progress_var.set("")
+        messagebox.showinfo("Terminé", f"{stats['moved']} fichiers ont été organisés avec succès !\n"
+                                       f"Durée: {stats['elapsed']:.1f} s ({self._format_organize_rate(stats)})")
+    
+    def _organize_journal_path(self):
+        return os.path.join(get_data_dir(), ORGANIZE_JOURNAL_FILENAME)
+    
+    def check_interrupted_organize(self):
+        """Propose de terminer un rangement interrompu lors de la dernière session"""
+        journal = read_journal(self._organize_journal_path())
+        if journal is None or journal['complete'] or journal['undone']:
+            return
+        
+        resume = messagebox.askyesno(
+            "Rangement interrompu",
+            f"Le rangement de {journal['folder']} a été interrompu "
+            f"({len(journal['entries'])} déplacements inscrits au journal).\n\n"
+            "Voulez-vous le terminer?\n"
+            "(Il peut aussi être annulé avec « Annuler le dernier rangement ».)"
+        )
+        if resume:
+            self._start_journal_replay(resume_moves)
+    
+    def undo_last_organize(self):
+        if self.organizing or self.replaying_journal:
+            messagebox.showwarning("Attention", "Attendez la fin du rangement en cours.")
+            return
+        journal = read_journal(self._organize_journal_path())
+        if journal is None or not journal['entries']:
+            messagebox.showinfo("Information", "Aucun rangement à annuler.")
+            return
+        if journal['undone']:
+            messagebox.showinfo("Information", "Le dernier rangement a déjà été annulé.")
+            return
+        
+        result = messagebox.askyesno(
+            "Confirmation",
+            f"Voulez-vous annuler le rangement de {journal['folder']} "
+            f"({len(journal['entries'])} fichiers déplacés)?"
+        )
+        if result:
+            self._start_journal_replay(undo_moves)
+    
+    def _start_journal_replay(self, replay):
+        # Surveillance suspendue: elle rangerait aussitôt, sans journal, les fichiers remis
+        # dans le dossier et défairait l'annulation
+        self.replaying_journal = True
+        self.stop_watch()
+        thread = threading.Thread(target=self._replay_journal_thread, args=(replay,))
+        thread.daemon = True
+        thread.start()
+    
+    def _end_journal_replay(self):
+        self.replaying_journal = False
+        if self.watch_var.get():
+            # Les fichiers déjà présents au démarrage ne sont pas rangés
+            self.start_watch()
+    
+    def _replay_journal_thread(self, replay):
+        try:
+            def on_progress(progress):
+                done = progress['restored'] + progress['moved'] + progress['skipped'] + progress['errors']
+                message = f"{done}/{progress['total']} fichiers ({progress['rate']:.0f} fichiers/s)"
+                self.root.after(0, self.organize_progress_var.set, message)
             
-            self.root.after(0, self.update_count_label)
-            messagebox.showinfo("Terminé", f"{moved_count} fichiers ont été organisés avec succès !")
+            stats = replay(self._organize_journal_path(), on_progress)
+            self.root.after(0, self._finish_replay, replay, stats)
             
         except Exception as e:
-            messagebox.showerror("Erreur", f"Erreur générale: {str(e)}")
+            self.root.after(0, lambda: messagebox.showerror("Erreur", f"Erreur générale: {str(e)}"))
+        finally:
+            self.root.after(0, self._end_journal_replay)
+    
+    def _finish_replay(self, replay, stats):
+        self.organize_progress_var.set("")
+        if stats is None:
+            messagebox.showerror("Erreur", "Journal du rangement illisible.")
+            return
+        if replay is undo_moves:
+            message = f"{stats['restored']} fichiers remis à leur place d'origine."
+        else:
+            message = f"{stats['moved']} fichiers rangés."
+        messagebox.showinfo("Terminé", f"{message}\n"
+                                       f"Ignorés (absents ou modifiés): {stats['skipped']}\n"
+                                       f"Erreurs: {stats['errors']}\n"
+                                       f"Durée: {stats['elapsed']:.1f} s ({stats['rate']:.0f} fichiers/s)")
+        self.scan_folder()
+    
+    def _format_organize_rate(self, stats):
+        """Débit d'un rangement en fichiers/s et octets/s"""
+        return f"{stats['rate']:.0f} fichiers/s, {self.format_file_size(int(stats['byte_rate']))}/s"
     
     # Nouvelles méthodes pour l'optimisation PC
+    def _temp_retention_policy(self):
+        """Règles de conservation saisies dans l'onglet, ou None si elles sont désactivées"""
+        if not self.temp_retention_var.get():
+            return None
+        
+        try:
+            min_age_days = float(self.temp_min_age_var.get())
+        except ValueError:
+            min_age_days = 7
+        try:
+            min_size = int(float(self.temp_min_size_var.get()) * 1024 * 1024)
+        except ValueError:
+            min_size = 0
+        try:
+            keep_newest = int(self.temp_keep_newest_var.get())
+        except ValueError:
+            keep_newest = 0
+        
+        return RetentionPolicy(min_age_days=min_age_days, age_field=self.temp_age_field_var.get(),
+                               min_size=min_size, keep_newest=keep_newest)
+    
     def analyze_temp_files(self):
         """Analyse les fichiers temporaires"""
         self.temp_results.delete(1.0, tk.END)
         self.temp_results.insert(tk.END, "Analyse des fichiers temporaires...\n\n")
         
-        thread = threading.Thread(target=self._analyze_temp_files_thread)
+        thread = threading.Thread(target=self._analyze_temp_files_thread,
+                                  args=(self._temp_retention_policy(),))
         thread.daemon = True
         thread.start()
     
-    def _analyze_temp_files_thread(self):
-        total_size = 0
-        file_count = 0
-        
+    def _temp_roots(self):
+        """Dossiers temporaires existants"""
         temp_dirs = [
             tempfile.gettempdir(),
             os.path.expandvars(r'%LOCALAPPDATA%\Temp'),
             os.path.expandvars(r'%TEMP%')
         ]
         
+        # Un même dossier peut apparaître sous plusieurs noms: il n'est parcouru qu'une fois
+        roots = []
         for temp_dir in temp_dirs:
-            if os.path.exists(temp_dir):
-                try:
-                    for root, dirs, files in os.walk(temp_dir):
-                        for file in files:
-                            try:
-                                file_path = os.path.join(root, file)
-                                size = os.path.getsize(file_path)
-                                total_size += size
-                                file_count += 1
-                            except:
-                                continue
-                except:
-                    continue
+            if os.path.exists(temp_dir) and os.path.realpath(temp_dir) not in roots:
+                roots.append(os.path.realpath(temp_dir))
+        return roots
+    
+    def _temp_plan_options(self, roots, policy):
+        """Options dont dépend un plan de nettoyage temporaire"""
+        return {'roots': roots, 'policy': policy.options() if policy is not None else None}
+    
+    def _cleanup_plan_path(self, filename):
+        return os.path.join(get_data_dir(), filename)
+    
+    def _usable_cleanup_plan(self, plan, filename, options):
+        """Plan de la dernière analyse s'il correspond aux options et est assez récent, sinon None"""
+        if plan is None:
+            # Analyse faite lors d'une session précédente
+            plan = CleanupPlan.load(self._cleanup_plan_path(filename))
+        if plan is None or plan.options != options or plan.age() > CLEANUP_PLAN_MAX_AGE:
+            return None
+        return plan
+    
+    def _discard_cleanup_plan(self, filename):
+        """Un plan appliqué n'est plus valable"""
+        try:
+            os.remove(self._cleanup_plan_path(filename))
+        except OSError:
+            pass
+    
+    def _analyze_temp_files_thread(self, policy):
+        roots = self._temp_roots()
+        
+        # L'analyse produit le plan exécuté tel quel par le nettoyage (un seul parcours)
+        plan = build_plan(roots, policy, options=self._temp_plan_options(roots, policy))
+        file_count = sum(totals['files'] for totals in plan.totals.values())
+        total_size = sum(totals['size'] for totals in plan.totals.values())
+        self.temp_plan = plan
+        try:
+            plan.save(self._cleanup_plan_path(TEMP_PLAN_FILENAME))
+        except OSError:
+            pass
         
         result = f"Analyse terminée:\n"
         result += f"Fichiers temporaires trouvés: {file_count}\n"
-        result += f"Espace total utilisé: {self.format_file_size(total_size)}\n\n"
+        result += f"Espace total utilisé: {self.format_file_size(total_size)}\n"
+        if policy is not None:
+            result += f"Supprimables selon les règles: {plan.file_count} fichiers "
+            result += f"({self.format_file_size(plan.total_size)})\n"
+        result += "Le nettoyage appliquera ce plan (fichiers modifiés depuis ignorés).\n\n"
         
         self.root.after(0, lambda: self.temp_results.insert(tk.END, result))
     
@@ -673,35 +1236,47 @@ class PCOptimizerSuite:
         )
         
         if result:
-            thread = threading.Thread(target=self._clean_temp_files_thread)
+            thread = threading.Thread(target=self._clean_temp_files_thread,
+                                      args=(self._temp_retention_policy(),))
             thread.daemon = True
             thread.start()
     
-    def _clean_temp_files_thread(self):
-        deleted_count = 0
-        freed_space = 0
-        
-        temp_dirs = [tempfile.gettempdir()]
-        
-        for temp_dir in temp_dirs:
-            if os.path.exists(temp_dir):
-                try:
-                    for root, dirs, files in os.walk(temp_dir):
-                        for file in files:
-                            try:
-                                file_path = os.path.join(root, file)
-                                size = os.path.getsize(file_path)
-                                os.remove(file_path)
-                                deleted_count += 1
-                                freed_space += size
-                            except:
-                                continue
-                except:
-                    continue
+    def _format_delete_progress(self, stats):
+        """Progression d'une suppression: fichiers, débit et espace libéré"""
+        return (f"{stats['files_deleted']} fichiers supprimés ({stats['rate']:.0f} fichiers/s), "
+                f"{self.format_file_size(stats['bytes_freed'])} libérés "
+                f"({self.format_file_size(stats['byte_rate'])}/s)")
+    
+    def _clean_temp_files_thread(self, policy):
+        roots = self._temp_roots()
+        on_progress = lambda progress: self.root.after(
+            0, self.temp_progress_var.set, self._format_delete_progress(progress))
+        
+        plan = self._usable_cleanup_plan(self.temp_plan, TEMP_PLAN_FILENAME,
+                                         self._temp_plan_options(roots, policy))
+        if plan is not None:
+            # Exécution du plan de l'analyse, sans nouveau parcours
+            stats = apply_plan(plan, on_progress=on_progress)
+            self.temp_plan = None
+            self._discard_cleanup_plan(TEMP_PLAN_FILENAME)
+        else:
+            # Suppression parallèle: les sous-dossiers vidés sont retirés, les dossiers temporaires conservés
+            stats = delete_tree(roots, policy=policy, on_progress=on_progress)
+        deleted_count = stats['files_deleted']
+        freed_space = stats['bytes_freed']
         
-        result = f"Nettoyage terminé:\n"
+        source = " (plan de l'analyse)" if plan is not None else ""
+        result = f"Nettoyage terminé{source}:\n"
         result += f"Fichiers supprimés: {deleted_count}\n"
-        result += f"Espace libéré: {self.format_file_size(freed_space)}\n\n"
+        result += f"Dossiers vides supprimés: {stats['dirs_removed']}\n"
+        if plan is not None:
+            result += f"Fichiers modifiés depuis l'analyse (conservés): {stats['skipped']}\n"
+        elif policy is not None:
+            result += f"Fichiers conservés par les règles: {stats['files_kept']} "
+            result += f"({self.format_file_size(stats['bytes_kept'])})\n"
+        result += f"Éléments non supprimés (en cours d'utilisation): {stats['failed']}\n"
+        result += f"Espace libéré: {self.format_file_size(freed_space)}\n"
+        result += f"Durée: {stats['elapsed']:.1f} s ({stats['rate']:.0f} fichiers/s)\n\n"
         
         self.root.after(0, lambda: [
             self.temp_results.insert(tk.END, result),
@@ -832,11 +1407,12 @@ class PCOptimizerSuite:
         self.disk_results.delete(1.0, tk.END)
         self.disk_results.insert(tk.END, f"Analyse de l'espace disque {selected_disk}...\n\n")
         
-        thread = threading.Thread(target=self._analyze_disk_space_thread, args=(selected_disk,))
+        thread = threading.Thread(target=self._analyze_disk_space_thread,
+                                  args=(selected_disk, self.disk_full_scan_var.get()))
         thread.daemon = True
         thread.start()
     
-    def _analyze_disk_space_thread(self, disk):
+    def _analyze_disk_space_thread(self, disk, full_scan=False):
         try:
             usage = psutil.disk_usage(disk)
             
@@ -849,33 +1425,217 @@ class PCOptimizerSuite:
             # Analyser les dossiers les plus volumineux
             result += "=== DOSSIERS LES PLUS VOLUMINEUX ===\n\n"
             
-            folder_sizes = []
+            size_tree = None
+            disk_index = None
             try:
-                for item in os.listdir(disk):
-                    item_path = os.path.join(disk, item)
-                    if os.path.isdir(item_path):
-                        try:
-                            size = sum(os.path.getsize(os.path.join(dirpath, filename))
-                                     for dirpath, dirnames, filenames in os.walk(item_path)
-                                     for filename in filenames)
-                            folder_sizes.append((item, size))
-                        except:
-                            continue
+                # L'index de l'analyse précédente évite de relister les dossiers inchangés
+                disk_index = DiskIndex()
+                previous = None if full_scan else disk_index.load(disk)
+                if previous is not None and not previous.largest.heaps[ALL_FILES]:
+                    # Index sans liste des plus gros fichiers: elle ne peut être complétée qu'en relistant tout
+                    previous = None
+                last_scan = disk_index.last_scan(disk)
+                
+                # Un seul parcours construit l'arbre complet des tailles et relève les plus gros fichiers
+                largest = LargestFiles(DEFAULT_TOP_K, self.categories)
+                size_tree = SizeTree(disk).scan(previous=previous, largest=largest)
+                disk_index.save(size_tree)
+                
+                for folder, node in size_tree.children(size_tree.root)[:10]:
+                    result += (f"{folder}: {self.format_file_size(node.size)} "
+                               f"({self.format_file_size(node.allocated)} sur le disque)\n")
                 
-                folder_sizes.sort(key=lambda x: x[1], reverse=True)
+                result += f"\nFichiers analysés: {size_tree.total_files} dans {len(size_tree.nodes)} dossiers\n"
+                result += f"Taille apparente: {self.format_file_size(size_tree.total_size)}\n"
+                result += f"Espace alloué: {self.format_file_size(size_tree.total_allocated)}\n"
+                if size_tree.hardlinks_skipped:
+                    result += f"Liens physiques comptés une seule fois: {size_tree.hardlinks_skipped}\n"
+                if size_tree.errors:
+                    result += f"Dossiers inaccessibles: {size_tree.errors}\n"
                 
-                for folder, size in folder_sizes[:10]:
-                    result += f"{folder}: {self.format_file_size(size)}\n"
+                result += f"Durée de l'analyse: {size_tree.duration:.1f} s "
+                result += f"({size_tree.dirs_listed} dossiers listés, "
+                result += f"{size_tree.dirs_skipped} inchangés repris de l'index)\n"
+                if last_scan is not None:
+                    scanned_at = datetime.fromtimestamp(last_scan['scanned_at']).strftime("%Y-%m-%d %H:%M")
+                    result += f"Analyse précédente: {scanned_at}, {last_scan['duration']:.1f} s\n"
                     
             except Exception as e:
                 result += f"Erreur lors de l'analyse des dossiers: {str(e)}\n"
+            finally:
+                if disk_index is not None:
+                    disk_index.close()
             
-            self.root.after(0, lambda: self.disk_results.insert(tk.END, result))
+            self.root.after(0, lambda: [
+                self.disk_results.insert(tk.END, result),
+                self._show_disk_tree(size_tree),
+                self._show_largest_files()
+            ])
             
         except Exception as e:
             error_msg = f"Erreur lors de l'analyse: {str(e)}\n"
             self.root.after(0, lambda: self.disk_results.insert(tk.END, error_msg))
     
+    def _show_disk_tree(self, size_tree):
+        """Affiche le premier niveau de l'arbre des tailles"""
+        self.disk_tree.delete(*self.disk_tree.get_children())
+        self.disk_unexpanded = {}
+        self.disk_size_tree = size_tree
+        if size_tree is None:
+            return
+        
+        self.disk_treemap_path = size_tree.root
+        self._draw_disk_treemap()
+        
+        root_node = size_tree.node(size_tree.root)
+        item = self.disk_tree.insert('', 'end', text=size_tree.root, open=True, values=(
+            self.format_file_size(root_node.size), self.format_file_size(root_node.allocated),
+            root_node.files, "100.0%"
+        ))
+        self._insert_disk_children(item, size_tree.root)
+    
+    def _insert_disk_children(self, item, path):
+        """Ajoute sous un élément les sous-dossiers d'un dossier, du plus gros au plus petit"""
+        parent_node = self.disk_size_tree.node(path)
+        parent_size = parent_node.size or 1
+        
+        for name, node in self.disk_size_tree.children(path):
+            child = self.disk_tree.insert(item, 'end', text=name, values=(
+                self.format_file_size(node.size), self.format_file_size(node.allocated), node.files,
+                f"{node.size / parent_size * 100:.1f}%"
+            ))
+            if node.subdirs:
+                # Enfant factice pour afficher la flèche d'ouverture
+                self.disk_tree.insert(child, 'end', text='...')
+                self.disk_unexpanded[child] = os.path.join(path, name)
+        
+        # Fichiers placés directement dans le dossier
+        if parent_node.own_files:
+            self.disk_tree.insert(item, 'end', text="[fichiers]", values=(
+                self.format_file_size(parent_node.files_size), self.format_file_size(parent_node.files_allocated),
+                parent_node.own_files,
+                f"{parent_node.files_size / parent_size * 100:.1f}%"
+            ))
+    
+    def _show_largest_files(self):
+        """Affiche les plus gros fichiers de la catégorie choisie, dans l'ordre de tri courant"""
+        self.largest_tree.delete(*self.largest_tree.get_children())
+        if self.disk_size_tree is None or self.disk_size_tree.largest is None:
+            return
+        
+        largest = self.disk_size_tree.largest
+        self.largest_category_combo['values'] = ["Toutes"] + largest.categories()
+        selected = self.largest_category_var.get()
+        category = ALL_FILES if selected == "Toutes" else selected
+        
+        rows = []
+        for path, size in largest.results(category):
+            folder, name = os.path.split(path)
+            rows.append({'name': name, 'size': size, 'category': largest.category(name), 'folder': folder})
+        
+        rows.sort(key=lambda row: row[self.largest_sort_column], reverse=self.largest_sort_reverse)
+        for row in rows:
+            self.largest_tree.insert('', 'end', values=(
+                row['name'], self.format_file_size(row['size']), row['category'], row['folder']
+            ))
+    
+    def sort_largest_files(self, column):
+        """Trie la liste des plus gros fichiers (second clic: ordre inverse)"""
+        if column == self.largest_sort_column:
+            self.largest_sort_reverse = not self.largest_sort_reverse
+        else:
+            self.largest_sort_column = column
+            # Les tailles sont d'abord triées de la plus grande à la plus petite
+            self.largest_sort_reverse = column == 'size'
+        self._show_largest_files()
+    
+    def _draw_disk_treemap(self):
+        """Dispose et dessine la treemap du dossier courant (niveau de zoom visible uniquement)"""
+        if self.disk_size_tree is None or self.disk_treemap_path is None:
+            return
+        
+        widget = self.disk_treemap_canvas.get_tk_widget()
+        width = max(widget.winfo_width(), 100)
+        height = max(widget.winfo_height(), 100)
+        
+        layout = treemap.layout(self.disk_size_tree, self.disk_treemap_path, width, height)
+        self.disk_treemap = layout
+        
+        # Une couleur par dossier de premier niveau, plus claire en profondeur; regroupements en gris
+        palette = plt.get_cmap('tab20')
+        colors = palette(layout['groups'] % 20)
+        colors[:, :3] += (1 - colors[:, :3]) * np.minimum(layout['levels'], 3)[:, None] * 0.25
+        colors[layout['grouped']] = (0.75, 0.75, 0.75, 1.0)
+        
+        ax = self.disk_treemap_ax
+        ax.clear()
+        ax.set_axis_off()
+        ax.add_collection(PolyCollection(treemap.polygons(layout['rects']), facecolors=colors,
+                                         edgecolors='white', linewidths=0.5))
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)
+        
+        # Libellés des dossiers de premier niveau assez grands pour être lisibles
+        rects = layout['rects']
+        labelled = np.flatnonzero((layout['levels'] == 0) & (rects[:, 2] > 60) & (rects[:, 3] > 20))
+        for index in labelled[:50]:
+            x, y, w, h = rects[index]
+            ax.text(x + 4, y + 4, f"{layout['labels'][index]}\n{self.format_file_size(layout['sizes'][index])}",
+                    fontsize=8, va='top', ha='left', clip_on=True)
+        
+        node = self.disk_size_tree.node(self.disk_treemap_path)
+        self.disk_treemap_info_var.set(f"{self.disk_treemap_path} - {self.format_file_size(node.size)}, "
+                                       f"{node.files} fichiers")
+        self.disk_treemap_canvas.draw_idle()
+    
+    def on_disk_treemap_click(self, event):
+        """Entre dans le dossier cliqué (clic gauche) ou remonte d'un niveau (clic droit)"""
+        if self.disk_treemap is None or event.xdata is None:
+            return
+        if event.button == 3:
+            self.disk_treemap_up()
+            return
+        
+        # On entre dans le dossier de premier niveau qui contient le point
+        index = treemap.hit_test(self.disk_treemap, event.xdata, event.ydata, level=0)
+        if index is None or self.disk_treemap['paths'][index] is None:
+            return
+        self.disk_treemap_path = self.disk_treemap['paths'][index]
+        self._draw_disk_treemap()
+    
+    def on_disk_treemap_motion(self, event):
+        """Affiche le dossier survolé et sa taille"""
+        if self.disk_treemap is None or event.xdata is None:
+            return
+        index = treemap.hit_test(self.disk_treemap, event.xdata, event.ydata)
+        if index is None:
+            return
+        label = self.disk_treemap['paths'][index] or self.disk_treemap['labels'][index]
+        self.disk_treemap_info_var.set(f"{label} - {self.format_file_size(self.disk_treemap['sizes'][index])}")
+    
+    def on_disk_treemap_resize(self, event):
+        """Redessine la treemap à la nouvelle taille, une fois le redimensionnement terminé"""
+        if self.disk_treemap_redraw is not None:
+            self.root.after_cancel(self.disk_treemap_redraw)
+        self.disk_treemap_redraw = self.root.after(200, self._draw_disk_treemap)
+    
+    def disk_treemap_up(self):
+        """Remonte la treemap au dossier parent"""
+        if self.disk_size_tree is None or self.disk_treemap_path in (None, self.disk_size_tree.root):
+            return
+        self.disk_treemap_path = os.path.dirname(self.disk_treemap_path)
+        self._draw_disk_treemap()
+    
+    def on_disk_tree_open(self, event):
+        """Explore un sous-dossier à partir de l'arbre en mémoire, sans nouvelle analyse"""
+        item = self.disk_tree.focus()
+        path = self.disk_unexpanded.pop(item, None)
+        if path is None:
+            return
+        
+        self.disk_tree.delete(*self.disk_tree.get_children(item))
+        self._insert_disk_children(item, path)
+    
     def select_duplicate_folder(self):
         """Sélectionne le dossier pour la recherche de doublons"""
         folder = filedialog.askdirectory(
@@ -892,55 +1652,302 @@ class PCOptimizerSuite:
             messagebox.showerror("Erreur", "Le dossier sélectionné n'existe pas.")
             return
         
+        if self.duplicate_scan_running:
+            messagebox.showwarning("Attention", "Une recherche est déjà en cours.")
+            return
+        
+        if self.duplicate_reclaim_running:
+            messagebox.showwarning("Attention", "Attendez la fin de la récupération en cours.")
+            return
+        
         self.duplicate_results.delete(1.0, tk.END)
         self.duplicate_results.insert(tk.END, f"Recherche de doublons dans {folder}...\n\n")
         
-        thread = threading.Thread(target=self._find_duplicates_thread, args=(folder,))
+        # Vider les résultats précédents
+        for item in self.duplicate_tree.get_children():
+            self.duplicate_tree.delete(item)
+        self.duplicate_sort_keys = []
+        self.duplicate_item_groups = {}
+        self.duplicate_groups = []
+        self.duplicate_queue = queue.Queue()
+        
+        try:
+            workers = int(self.duplicate_workers_var.get()) or None
+        except ValueError:
+            workers = None
+        
+        try:
+            similar_threshold = int(self.similar_threshold_var.get())
+        except ValueError:
+            similar_threshold = 6
+        
+        options = {
+            'algorithm': self.duplicate_algorithm_var.get(),
+            'use_cache': self.duplicate_cache_var.get(),
+            'similar_images': self.similar_images_var.get(),
+            'similar_method': self.similar_method_var.get(),
+            'similar_threshold': similar_threshold
+        }
+        
+        # Le moteur est créé ici pour que "Annuler" fonctionne dès le lancement
+        self.duplicate_finder = DuplicateFinder(options['algorithm'], workers=workers,
+                                                executor=self.duplicate_executor_var.get(),
+                                                verify=self.duplicate_verify_var.get())
+        self.duplicate_progress['value'] = 0
+        self.duplicate_status_var.set("Recherche des fichiers...")
+        
+        self.duplicate_scan_running = True
+        self.duplicate_cancel_event.clear()
+        self.duplicate_reclaim_btn.config(state='disabled')
+        thread = threading.Thread(target=self._find_duplicates_thread,
+                                  args=(folder, options, self.duplicate_queue))
         thread.daemon = True
         thread.start()
+        
+        self.root.after(DUPLICATE_POLL_INTERVAL, self._poll_duplicate_queue, self.duplicate_queue)
+    
+    def cancel_duplicate_search(self):
+        """Demande l'arrêt de la recherche de doublons en cours"""
+        if not self.duplicate_scan_running or self.duplicate_finder is None:
+            return
+        self.duplicate_finder.cancel()
+        self.duplicate_cancel_event.set()
+        self.duplicate_status_var.set("Annulation en cours...")
+    
+    def _update_duplicate_progress(self, progress):
+        """Met à jour la barre et le texte de progression de la recherche"""
+        phase_names = {
+            'discover': "Recherche des fichiers",
+            'partial': "Hash partiel",
+            'full': "Hash complet",
+            'done': "Terminé",
+            'cancelled': "Annulé"
+        }
+        if progress['bytes_total']:
+            self.duplicate_progress['value'] = 100 * progress['bytes_hashed'] / progress['bytes_total']
+        
+        status = (f"{phase_names.get(progress['phase'], progress['phase'])} - "
+                  f"{progress['files_discovered']} fichiers trouvés, "
+                  f"{self.format_file_size(progress['bytes_hashed'])} / "
+                  f"{self.format_file_size(progress['bytes_total'])} lus, "
+                  f"{self.format_file_size(progress['rate'])}/s")
+        if progress['eta'] is not None:
+            status += f", reste environ {int(progress['eta'])} s"
+        status += f" - {progress['groups']} groupes"
+        self.duplicate_status_var.set(status)
+    
+    def _poll_duplicate_queue(self, groups_queue):
+        """Ajoute à l'affichage les groupes confirmés, par lots"""
+        finished = False
+        for _ in range(DUPLICATE_BATCH_SIZE):
+            try:
+                group = groups_queue.get_nowait()
+            except queue.Empty:
+                break
+            if group is None:
+                finished = True
+                break
+            self._insert_duplicate_group(group)
+        
+        if finished:
+            # Fin de la recherche signalée ici, une fois tous les groupes affichés
+            self.duplicate_scan_running = False
+            self.duplicate_reclaim_btn.config(state='normal')
+        elif groups_queue is self.duplicate_queue:
+            self.root.after(DUPLICATE_POLL_INTERVAL, self._poll_duplicate_queue, groups_queue)
+    
+    def _insert_duplicate_group(self, group):
+        """Insère une ligne de groupe à sa place selon l'espace récupérable"""
+        self.duplicate_groups.append(group)
+        reclaimable = group['size'] * (len(group['paths']) - 1)
+        
+        # Les clés sont négatives pour un tri décroissant
+        index = bisect.bisect_right(self.duplicate_sort_keys, -reclaimable)
+        self.duplicate_sort_keys.insert(index, -reclaimable)
+        
+        label = os.path.basename(group['paths'][0]) or group['paths'][0]
+        item = self.duplicate_tree.insert('', index, text=label, values=(
+            len(group['paths']),
+            self.format_file_size(group['size']),
+            self.format_file_size(reclaimable)
+        ))
+        # Enfant factice pour afficher la flèche d'ouverture
+        self.duplicate_tree.insert(item, 'end', text='...')
+        self.duplicate_item_groups[item] = group
+    
+    def on_duplicate_group_open(self, event):
+        """Crée les lignes des fichiers d'un groupe lors de sa première ouverture"""
+        item = self.duplicate_tree.focus()
+        group = self.duplicate_item_groups.pop(item, None)
+        if group is None:
+            return
+        
+        self.duplicate_tree.delete(*self.duplicate_tree.get_children(item))
+        for path in group['paths']:
+            self.duplicate_tree.insert(item, 'end', text=path, values=(
+                '', self.format_file_size(group['size']), ''
+            ))
     
-    def _find_duplicates_thread(self, folder):
+    def _find_duplicates_thread(self, folder, options, groups_queue):
+        cache = None
         try:
-            file_hashes = defaultdict(list)
-            
-            # Calculer les hash des fichiers
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'rb') as f:
-                            file_hash = hashlib.md5(f.read()).hexdigest()
-                            file_hashes[file_hash].append(file_path)
-                    except:
-                        continue
-            
-            # Trouver les doublons
-            duplicates = {hash_val: paths for hash_val, paths in file_hashes.items() if len(paths) > 1}
+            finder = self.duplicate_finder
+            # La connexion SQLite doit être ouverte dans le thread qui l'utilise
+            if options['use_cache']:
+                cache = HashCache(options['algorithm'], PARTIAL_HASH_SIZE)
+            finder.cache = cache
+            duplicates = finder.find(
+                folder, on_group=groups_queue.put,
+                on_progress=lambda progress: self.root.after(0, self._update_duplicate_progress, progress)
+            )
             
             result = f"=== RÉSULTATS DE LA RECHERCHE ===\n\n"
+            if finder.cancelled:
+                result += "Recherche annulée : les résultats ci-dessous sont partiels.\n\n"
+            
+            # Compteurs de chaque étape du pipeline
+            stage_names = {
+                'size': "Taille",
+                'partial': "Hash partiel",
+                'full': "Hash complet",
+                'verify': "Vérification octet par octet"
+            }
+            result += "--- Étapes de l'analyse ---\n"
+            for stage, stats in finder.stats.items():
+                if stage == 'verify' and not finder.verify:
+                    continue
+                result += (f"  {stage_names[stage]}: {stats['candidates']} fichiers, "
+                           f"{stats['eliminated']} écartés, "
+                           f"{self.format_file_size(stats['bytes_read'])} lus\n")
+            if finder.verify:
+                result += (f"  Débit de la vérification: "
+                           f"{self.format_file_size(finder.verify_throughput())}/s\n")
+            if cache is not None:
+                result += (f"  Cache: {cache.hits} hits, {cache.misses} misses, "
+                           f"{cache.evicted} entrées obsolètes supprimées\n")
+            if finder.hardlinks:
+                hardlink_count = sum(len(links) for links in finder.hardlinks.values())
+                result += f"  Liens physiques regroupés (non comptés comme doublons): {hardlink_count}\n"
+            result += "\n"
             
             if duplicates:
-                total_duplicates = sum(len(paths) - 1 for paths in duplicates.values())
+                total_duplicates = sum(len(group['paths']) - 1 for group in duplicates)
+                total_reclaimable = sum(group['size'] * (len(group['paths']) - 1) for group in duplicates)
                 result += f"Groupes de doublons trouvés: {len(duplicates)}\n"
-                result += f"Fichiers doublons: {total_duplicates}\n\n"
-                
-                for i, (hash_val, paths) in enumerate(duplicates.items(), 1):
-                    result += f"--- Groupe {i} ---\n"
-                    for path in paths:
-                        try:
-                            size = os.path.getsize(path)
-                            result += f"  {path} ({self.format_file_size(size)})\n"
-                        except:
-                            result += f"  {path} (taille inconnue)\n"
-                    result += "\n"
+                result += f"Fichiers doublons: {total_duplicates}\n"
+                result += f"Espace récupérable: {self.format_file_size(total_reclaimable)}\n"
             else:
                 result += "Aucun doublon trouvé !\n"
             
+            if options['similar_images'] and not finder.cancelled:
+                result += self._find_similar_images(folder, options)
+            
             self.root.after(0, lambda: self.duplicate_results.insert(tk.END, result))
             
         except Exception as e:
             error_msg = f"Erreur lors de la recherche: {str(e)}\n"
             self.root.after(0, lambda: self.duplicate_results.insert(tk.END, error_msg))
+        finally:
+            if cache is not None:
+                cache.close()
+            groups_queue.put(None)
+    
+    def _find_similar_images(self, folder, options):
+        """Recherche les images quasi identiques et retourne le texte du rapport"""
+        try:
+            from image_similarity import find_similar_images
+        except ImportError:
+            return "\nRecherche d'images similaires indisponible: installez numpy et Pillow.\n"
+        
+        groups = find_similar_images(folder, self.categories['Images'],
+                                     options['similar_method'], options['similar_threshold'],
+                                     cancel_event=self.duplicate_cancel_event)
+        
+        result = f"\n=== IMAGES SIMILAIRES ({options['similar_method']}, "
+        result += f"distance <= {options['similar_threshold']}) ===\n\n"
+        if self.duplicate_cancel_event.is_set():
+            return result + "Recherche annulée.\n"
+        if not groups:
+            return result + "Aucune image similaire trouvée.\n"
+        
+        result += f"Groupes d'images similaires: {len(groups)}\n\n"
+        for i, paths in enumerate(groups, 1):
+            result += f"--- Groupe similaire {i} ---\n"
+            for path in paths:
+                result += f"  {path}\n"
+            result += "\n"
+        return result
+    
+    def reclaim_duplicates(self):
+        """Remplace les doublons trouvés par des liens vers un seul exemplaire"""
+        if self.duplicate_scan_running:
+            messagebox.showwarning("Attention", "Attendez la fin de la recherche en cours.")
+            return
+        
+        if self.duplicate_reclaim_running:
+            messagebox.showwarning("Attention", "Une récupération est déjà en cours.")
+            return
+        
+        if not self.duplicate_groups:
+            messagebox.showwarning("Attention", "Aucun doublon à traiter. Lancez d'abord une recherche.")
+            return
+        
+        mode = self.duplicate_reclaim_mode_var.get()
+        mode_names = {'hardlink': "des liens physiques", 'reflink': "des clones reflink"}
+        file_count = sum(len(group['paths']) - 1 for group in self.duplicate_groups)
+        
+        result = messagebox.askyesno(
+            "Confirmation",
+            f"Voulez-vous remplacer {file_count} doublons par {mode_names[mode]} ?\n\n"
+            "Le premier fichier de chaque groupe est conservé."
+        )
+        
+        if result:
+            # Les mêmes fichiers ne doivent pas être remplacés par deux threads à la fois
+            self.duplicate_reclaim_running = True
+            self.duplicate_reclaim_btn.config(state='disabled')
+            thread = threading.Thread(target=self._reclaim_duplicates_thread, args=(mode,))
+            thread.daemon = True
+            thread.start()
+    
+    def _reclaim_duplicates_thread(self, mode):
+        try:
+            total_reclaimed = 0
+            total_replaced = 0
+            all_errors = []
+            
+            for group in self.duplicate_groups:
+                reclaimed, replaced, errors = self.duplicate_finder.reclaim(group, mode)
+                total_reclaimed += reclaimed
+                total_replaced += replaced
+                all_errors.extend(errors)
+            
+            result = f"\n=== RÉCUPÉRATION DE L'ESPACE ({mode}) ===\n\n"
+            result += f"Fichiers remplacés: {total_replaced}\n"
+            result += f"Espace réellement récupéré: {self.format_file_size(total_reclaimed)}\n"
+            if all_errors:
+                result += f"Erreurs: {len(all_errors)}\n"
+                for path, error in all_errors[:20]:
+                    result += f"  {path}: {error}\n"
+            
+            # Les groupes traités ne doivent pas être remplacés une seconde fois
+            self.duplicate_groups = []
+            
+            self.root.after(0, lambda: [
+                self.duplicate_results.insert(tk.END, result),
+                messagebox.showinfo("Terminé", f"{total_replaced} doublons remplacés\n"
+                                    f"Espace récupéré: {self.format_file_size(total_reclaimed)}")
+            ])
+            
+        except Exception as e:
+            error_msg = f"Erreur lors de la récupération: {str(e)}\n"
+            self.root.after(0, lambda: self.duplicate_results.insert(tk.END, error_msg))
+        finally:
+            self.root.after(0, self._end_duplicate_reclaim)
+    
+    def _end_duplicate_reclaim(self):
+        self.duplicate_reclaim_running = False
+        self.duplicate_reclaim_btn.config(state='normal')
     
     def analyze_browser_cache(self):
         """Analyse le cache des navigateurs"""
@@ -958,6 +1965,15 @@ class PCOptimizerSuite:
             
             browser_paths = self._get_browser_cache_paths()
             
+            # Un seul parcours produit les totaux et le plan exécuté par le nettoyage
+            roots = self._browser_roots(browser_paths)
+            plan = build_plan(roots, options={'roots': roots})
+            self.browser_plan = plan
+            try:
+                plan.save(self._cleanup_plan_path(BROWSER_PLAN_FILENAME))
+            except OSError:
+                pass
+            
             result = "=== ANALYSE DU CACHE NAVIGATEUR ===\n\n"
             
             for browser_name, paths in browser_paths.items():
@@ -970,21 +1986,12 @@ class PCOptimizerSuite:
                     path = path_info['path']
                     name = path_info['name']
                     
-                    if os.path.exists(path):
-                        try:
-                            for root, dirs, files in os.walk(path):
-                                for file in files:
-                                    try:
-                                        file_path = os.path.join(root, file)
-                                        size = os.path.getsize(file_path)
-                                        browser_size += size
-                                        browser_files += 1
-                                    except:
-                                        continue
-                            
-                            result += f"  {name}: {self.format_file_size(browser_size)} ({browser_files} fichiers)\n"
-                        except Exception as e:
-                            result += f"  {name}: Erreur d'accès\n"
+                    if path in plan.totals:
+                        totals = plan.totals[path]
+                        browser_size += totals['size']
+                        browser_files += totals['files']
+                        
+                        result += f"  {name}: {self.format_file_size(totals['size'])} ({totals['files']} fichiers)\n"
                     else:
                         result += f"  {name}: Non trouvé\n"
                 
@@ -1016,12 +2023,28 @@ class PCOptimizerSuite:
             thread.daemon = True
             thread.start()
     
+    def _browser_roots(self, browser_paths):
+        """Dossiers de cache existants de tous les navigateurs"""
+        roots = []
+        for paths in browser_paths.values():
+            for path_info in paths:
+                if os.path.exists(path_info['path']) and path_info['path'] not in roots:
+                    roots.append(path_info['path'])
+        return roots
+    
     def _clean_browser_cache_thread(self):
         try:
             deleted_files = 0
             freed_space = 0
+            skipped_files = 0
             
             browser_paths = self._get_browser_cache_paths()
+            on_progress = lambda progress: self.root.after(
+                0, self.browser_progress_var.set, self._format_delete_progress(progress))
+            
+            # Le plan de l'analyse couvre tous les navigateurs: seuls les cochés sont appliqués
+            roots = self._browser_roots(browser_paths)
+            plan = self._usable_cleanup_plan(self.browser_plan, BROWSER_PLAN_FILENAME, {'roots': roots})
             
             result = "=== NETTOYAGE DU CACHE NAVIGATEUR ===\n\n"
             
@@ -1040,27 +2063,18 @@ class PCOptimizerSuite:
                     
                     if os.path.exists(path):
                         try:
-                            for root, dirs, files in os.walk(path, topdown=False):
-                                for file in files:
-                                    try:
-                                        file_path = os.path.join(root, file)
-                                        size = os.path.getsize(file_path)
-                                        os.remove(file_path)
-                                        browser_deleted += 1
-                                        browser_freed += size
-                                    except:
-                                        continue
-                                
-                                # Supprimer les dossiers vides
-                                for dir in dirs:
-                                    try:
-                                        dir_path = os.path.join(root, dir)
-                                        if not os.listdir(dir_path):
-                                            os.rmdir(dir_path)
-                                    except:
-                                        continue
+                            if plan is not None:
+                                stats = apply_plan(plan, roots=[path], on_progress=on_progress)
+                            else:
+                                # Les dossiers vidés sont retirés de bas en haut, le dossier de cache est conservé
+                                stats = delete_tree(path, on_progress=on_progress)
+                            browser_deleted += stats['files_deleted']
+                            browser_freed += stats['bytes_freed']
+                            skipped_files += stats['skipped']
                             
-                            result += f"  {name}: {browser_deleted} fichiers supprimés, {self.format_file_size(browser_freed)} libérés\n"
+                            result += (f"  {name}: {stats['files_deleted']} fichiers supprimés, "
+                                       f"{self.format_file_size(stats['bytes_freed'])} libérés "
+                                       f"({stats['rate']:.0f} fichiers/s)\n")
                         except Exception as e:
                             result += f"  {name}: Erreur lors du nettoyage\n"
                 
@@ -1068,8 +2082,14 @@ class PCOptimizerSuite:
                 freed_space += browser_freed
                 result += f"  Total {browser_name}: {self.format_file_size(browser_freed)}\n\n"
             
+            if plan is not None:
+                self.browser_plan = None
+                self._discard_cleanup_plan(BROWSER_PLAN_FILENAME)
+            
             result += f"=== RÉSUMÉ GLOBAL ===\n"
             result += f"Fichiers supprimés: {deleted_files}\n"
+            if plan is not None:
+                result += f"Fichiers modifiés depuis l'analyse (conservés): {skipped_files}\n"
             result += f"Espace libéré: {self.format_file_size(freed_space)}\n"
             
             self.root.after(0, lambda: [
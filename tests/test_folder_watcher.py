@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests de la surveillance de dossier (inotify et scrutation)"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_watcher import FolderWatcher, inotify_available
+
+BACKENDS = [pytest.param(True, marks=pytest.mark.skipif(not inotify_available(), reason="inotify indisponible")),
+            False]
+
+
+def _watch(folder, use_inotify):
+    found = []
+    event = threading.Event()
+
+    def on_file(path):
+        found.append(path)
+        event.set()
+
+    watcher = FolderWatcher(str(folder), on_file, debounce=0.2, poll_interval=0.1, use_inotify=use_inotify)
+    watcher.start()
+    return watcher, found, event
+
+
+@pytest.mark.parametrize('use_inotify', BACKENDS)
+def test_new_file_is_dispatched(tmp_path, use_inotify):
+    watcher, found, event = _watch(tmp_path, use_inotify)
+    try:
+        (tmp_path / 'new.txt').write_text('nouveau')
+        assert event.wait(5)
+        assert found == [str(tmp_path / 'new.txt')]
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.parametrize('use_inotify', BACKENDS)
+def test_modified_existing_file_is_not_dispatched(tmp_path, use_inotify):
+    old = tmp_path / 'old.txt'
+    old.write_text('avant')
+    watcher, found, event = _watch(tmp_path, use_inotify)
+    try:
+        time.sleep(0.3)
+        with open(old, 'a') as f:
+            f.write(' modifié')
+        os.utime(old)
+        # Un nouveau fichier sert de témoin: une fois signalé, old.txt l'aurait été aussi
+        (tmp_path / 'new.txt').write_text('nouveau')
+        assert event.wait(5)
+        time.sleep(0.5)
+        assert found == [str(tmp_path / 'new.txt')]
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.parametrize('use_inotify', BACKENDS)
+def test_replaced_existing_file_is_dispatched(tmp_path, use_inotify):
+    (tmp_path / 'doc.txt').write_text('avant')
+    watcher, found, event = _watch(tmp_path, use_inotify)
+    try:
+        os.remove(tmp_path / 'doc.txt')
+        time.sleep(0.3)
+        (tmp_path / 'doc.txt').write_text('nouveau document')
+        assert event.wait(5)
+        assert found == [str(tmp_path / 'doc.txt')]
+    finally:
+        watcher.stop()
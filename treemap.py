@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Treemap de l'occupation disque
+Auteur: Zx
+Description: Disposition « squarified » (Bruls, Huizing, van Wijk) calculée avec NumPy
+             pour un niveau de zoom de l'arbre des tailles: seuls les dossiers visibles
+             sont disposés et les rectangles trop petits sont regroupés
+"""
+
+import os
+
+import numpy as np
+
+# Surface minimale (en pixels²) d'un rectangle affiché: les plus petits sont regroupés
+MIN_RECT_AREA = 64
+
+# Nombre maximal d'éléments examinés pour composer une rangée
+MAX_ROW_LENGTH = 512
+
+# Profondeur affichée sous le dossier courant
+DEFAULT_DEPTH = 2
+
+# Marge intérieure (pixels) entre un dossier et ses sous-dossiers
+PADDING = 2
+
+
+def squarify(sizes, x, y, width, height):
+    """Dispose des tailles triées par ordre décroissant dans le rectangle donné
+
+    Retourne un tableau (n, 4) de rectangles (x, y, largeur, hauteur). Chaque rangée
+    grandit tant que le pire rapport largeur/hauteur de ses rectangles ne se dégrade pas.
+    """
+    sizes = np.asarray(sizes, dtype=np.float64)
+    count = len(sizes)
+    rects = np.zeros((count, 4))
+    if count == 0 or width <= 0 or height <= 0:
+        return rects
+
+    # Les tailles deviennent des surfaces
+    areas = sizes * (width * height / sizes.sum())
+    start = 0
+    while start < count:
+        short_side = min(width, height)
+        window = areas[start:start + MAX_ROW_LENGTH]
+        sums = np.cumsum(window)
+        # Pire rapport de la rangée [start, start + k] pour chaque k (le plus grand
+        # élément est le premier, le plus petit le dernier)
+        worst = np.maximum(short_side ** 2 * window[0] / sums ** 2,
+                           sums ** 2 / (short_side ** 2 * window))
+        degrades = np.flatnonzero(worst[1:] > worst[:-1])
+        length = degrades[0] + 1 if len(degrades) else len(window)
+
+        row = window[:length]
+        row_area = sums[length - 1]
+        end = start + length
+        if end == count:
+            # Dernière rangée: elle occupe tout l'espace restant (erreurs d'arrondi)
+            row_area = width * height
+            row = row * (row_area / sums[length - 1])
+
+        if width >= height:
+            # Rangée verticale le long du bord gauche
+            row_width = row_area / height
+            heights = row / row_width
+            rects[start:end, 0] = x
+            rects[start:end, 1] = y + np.concatenate(([0.0], np.cumsum(heights)[:-1]))
+            rects[start:end, 2] = row_width
+            rects[start:end, 3] = heights
+            x += row_width
+            width -= row_width
+        else:
+            # Rangée horizontale le long du bord supérieur
+            row_height = row_area / width
+            widths = row / row_height
+            rects[start:end, 0] = x + np.concatenate(([0.0], np.cumsum(widths)[:-1]))
+            rects[start:end, 1] = y
+            rects[start:end, 2] = widths
+            rects[start:end, 3] = row_height
+            y += row_height
+            height -= row_height
+        start = end
+    return rects
+
+
+def _items(size_tree, path):
+    """Éléments d'un dossier: noms (None pour ses fichiers directs) et tailles non nulles"""
+    node = size_tree.node(path)
+    if node is None:
+        return [], np.empty(0)
+    prefix = os.path.join(path, '')
+    names = []
+    sizes = []
+    for name in node.subdirs:
+        child = size_tree.nodes.get(prefix + name)
+        if child is not None and child.size > 0:
+            names.append(name)
+            sizes.append(child.size)
+    if node.files_size > 0:
+        names.append(None)
+        sizes.append(node.files_size)
+    return names, np.array(sizes, dtype=np.float64)
+
+
+def layout(size_tree, path, width, height, depth=DEFAULT_DEPTH, min_area=MIN_RECT_AREA):
+    """Calcule la treemap du dossier path sur depth niveaux
+
+    Retourne un dict de tableaux alignés: 'rects' (n, 4), 'sizes', 'levels', 'groups'
+    (indice du dossier de premier niveau, pour la couleur), 'grouped' (petits éléments
+    regroupés) et les listes 'labels' et 'paths' (None pour les fichiers directs et
+    les regroupements).
+    """
+    rects = []
+    sizes = []
+    levels = []
+    groups = []
+    grouped = []
+    labels = []
+    paths = []
+
+    # Chaque dossier visible est disposé dans le rectangle de son parent (dessiné avant lui)
+    pending = [(path, (0.0, 0.0, float(width), float(height)), 0, -1)]
+    while pending:
+        current, (x, y, w, h), level, group = pending.pop()
+        names, item_sizes = _items(size_tree, current)
+        if not names or w * h < min_area:
+            continue
+
+        # Seuls les éléments assez grands sont disposés, le reste forme un seul rectangle
+        order = np.argsort(-item_sizes, kind='stable')
+        item_sizes = item_sizes[order]
+        item_areas = item_sizes * (w * h / item_sizes.sum())
+        visible = int(np.searchsorted(-item_areas, -min_area, side='right'))
+        items = []
+        for index in order[:visible]:
+            name = names[index]
+            if name is None:
+                items.append(("[fichiers]", None, False))
+            else:
+                items.append((name, os.path.join(current, name), False))
+        if visible < len(names):
+            hidden = len(names) - visible
+            rest = item_sizes[visible:].sum()
+            # Le regroupement est inséré à sa place pour garder l'ordre décroissant
+            position = int(np.searchsorted(-item_sizes[:visible], -rest, side='right'))
+            items.insert(position, (f"({hidden} autres)", None, True))
+            item_sizes = np.insert(item_sizes[:visible], position, rest)
+
+        item_rects = squarify(item_sizes, x, y, w, h)
+        for index, ((label, item_path, is_grouped), rect) in enumerate(zip(items, item_rects)):
+            item_group = index if level == 0 else group
+            rects.append(rect)
+            sizes.append(item_sizes[index])
+            levels.append(level)
+            groups.append(item_group)
+            grouped.append(is_grouped)
+            labels.append(label)
+            paths.append(item_path)
+
+            if item_path is not None and level + 1 < depth:
+                inner = (rect[0] + PADDING, rect[1] + PADDING,
+                         rect[2] - 2 * PADDING, rect[3] - 2 * PADDING)
+                if inner[2] > 0 and inner[3] > 0:
+                    pending.append((item_path, inner, level + 1, item_group))
+
+    return {
+        'rects': np.array(rects).reshape(-1, 4),
+        'sizes': np.array(sizes, dtype=np.float64),
+        'levels': np.array(levels, dtype=np.int32),
+        'groups': np.array(groups, dtype=np.int32),
+        'grouped': np.array(grouped, dtype=bool),
+        'labels': labels,
+        'paths': paths
+    }
+
+
+def hit_test(treemap, x, y, level=None):
+    """Indice du rectangle le plus profond (ou du niveau donné) contenant le point (x, y), ou None"""
+    rects = treemap['rects']
+    if len(rects) == 0:
+        return None
+    inside = ((rects[:, 0] <= x) & (x < rects[:, 0] + rects[:, 2]) &
+              (rects[:, 1] <= y) & (y < rects[:, 1] + rects[:, 3]))
+    if level is not None:
+        inside &= treemap['levels'] == level
+    candidates = np.flatnonzero(inside)
+    if len(candidates) == 0:
+        return None
+    return int(candidates[np.argmax(treemap['levels'][candidates])])
+
+
+def polygons(rects):
+    """Sommets (n, 4, 2) des rectangles, pour une PolyCollection matplotlib"""
+    x, y, w, h = rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+    return np.stack([
+        np.stack([x, y], axis=1),
+        np.stack([x + w, y], axis=1),
+        np.stack([x + w, y + h], axis=1),
+        np.stack([x, y + h], axis=1)
+    ], axis=1)